@@ -7,7 +7,7 @@ from dotenv import load_dotenv
 import disnake
 
 from timeclock import database, log
-from timeclock.bot import TimeClockBot
+from timeclock.bot import TimeClockBot, create_bot
 
 # Load environment variables
 load_dotenv()
@@ -25,7 +25,7 @@ _intents.members = True
 async def main() -> None:
     """Create and run the bot"""
 
-    bot: TimeClockBot = TimeClockBot(intents=_intents)
+    bot: TimeClockBot = create_bot(intents=_intents)
     await check_database(bot)
 
     try:
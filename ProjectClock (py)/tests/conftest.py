@@ -0,0 +1,32 @@
+import contextlib
+import os
+import uuid
+
+import pytest
+
+from timeclock.database.mongodb import MongoDB
+
+
+@pytest.fixture
+def mongodb():
+    """Connects a `MongoDB` to a throwaway database of the mongod at TIMECLOCK_TEST_MONGODB_URI
+
+    Use it as `async with mongodb() as db:` inside the test's event loop. Tests using it are
+    skipped when the variable isn't set.
+    """
+    uri = os.getenv("TIMECLOCK_TEST_MONGODB_URI")
+    if not uri:
+        pytest.skip("TIMECLOCK_TEST_MONGODB_URI is not set")
+
+    @contextlib.asynccontextmanager
+    async def connect():
+        db = MongoDB(uri)
+        name = f"timeclock_test_{uuid.uuid4().hex}"
+        db.db = db.client[name]
+        try:
+            yield db
+        finally:
+            await db.client.drop_database(name)
+            db.client.close()
+
+    return connect
@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from timeclock.calendar_sync import CONFLICT, CalendarSync, parse_datetime
+from timeclock.cogs.schedule import Schedule
+
+GUILD_ID = 1
+MEMBER_ID = 2
+
+
+class FakeRequest:
+    def __init__(self, execute) -> None:
+        self.execute = execute
+
+
+class FakeBatch:
+    """Runs each request in turn and reports it to the callback, like `BatchHttpRequest`"""
+
+    def __init__(self, callback) -> None:
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class FakeEvents:
+    """The `events()` resource of a Calendar service, keeping events in a dict"""
+
+    def __init__(self) -> None:
+        self.events = {}
+        self.inserts = 0
+
+    def insert(self, calendarId, body):
+        def execute():
+            self.inserts += 1
+            event_id = body.get("id") or f"generated{self.inserts}"
+            if event_id in self.events:
+                raise HttpError(httplib2.Response({"status": CONFLICT}), b"duplicate")
+            self.events[event_id] = dict(body, id=event_id)
+            return self.events[event_id]
+
+        return FakeRequest(execute)
+
+    def patch(self, calendarId, eventId, body):
+        def execute():
+            self.events[eventId].update(body)
+            return self.events[eventId]
+
+        return FakeRequest(execute)
+
+
+class FakeDB:
+    def __init__(self, times) -> None:
+        self.times = times
+        self.watermark = None
+        self.events = {}
+
+    async def get_calendar_watermark(self, guild_id, member_id):
+        return self.watermark
+
+    async def iter_member_times(self, guild_id, member_ids, *, start=None):
+        for time in self.times:
+            if start is None or time["punch_in"] >= start:
+                yield dict(time, member_id=MEMBER_ID)
+
+    async def get_calendar_events(self, guild_id, member_id, since=None):
+        return {
+            punch_in: event
+            for punch_in, event in self.events.items()
+            if since is None or punch_in >= since
+        }
+
+    async def save_calendar_events(self, guild_id, member_id, events, watermark):
+        for event in events:
+            self.events[event["punch_in"]] = event
+        if watermark is not None:
+            self.watermark = max(watermark, self.watermark or watermark)
+
+
+class FakeInteraction:
+    def __init__(self) -> None:
+        self.guild = SimpleNamespace(id=GUILD_ID, name="Guild")
+        self.author = SimpleNamespace(id=MEMBER_ID)
+        self.response = SimpleNamespace(defer=self._defer)
+        self.content = None
+
+    async def _defer(self):
+        pass
+
+    async def edit_original_response(self, content=None, **kwargs):
+        self.content = content
+
+
+def make_cog(times):
+    db = FakeDB(times)
+    cog = Schedule(SimpleNamespace(executor=None, db=db))
+
+    service = FakeEvents()
+    calendar = cog.calendar
+    calendar.service = SimpleNamespace(events=lambda: service)
+    calendar.authenticate = lambda: True
+    calendar._new_batch = FakeBatch
+    calendar._http = lambda: None
+
+    async def aauthenticate():
+        return True
+
+    calendar.aauthenticate = aauthenticate
+    return cog, db, service
+
+
+def sync(cog):
+    inter = FakeInteraction()
+    asyncio.run(Schedule.sync_calendar.callback(cog, inter))
+    return inter.content
+
+
+def test_aadd_work_schedules_passes_event_ids():
+    cog, _, service = make_cog([])
+    spans = [(None, None, "a"), (None, None, "b")]
+    calendar: CalendarSync = cog.calendar
+    calendar._event_body = lambda start, end, description, timezone_str: {"summary": description}
+
+    ids = asyncio.run(calendar.aadd_work_schedules(spans, event_ids=["x1", "x2"]))
+    assert ids == ["x1", "x2"]
+    # inserting the same IDs again conflicts, which counts as added
+    assert asyncio.run(calendar.aadd_work_schedules(spans, event_ids=["x1", "x2"])) == ids
+    assert sorted(service.events) == ["x1", "x2"]
+
+
+def test_first_sync_inserts_closed_sessions():
+    times = [
+        {"punch_in": 1000.0, "punch_out": 2000.0},
+        {"punch_in": 3000.0, "punch_out": 4000.0},
+        {"punch_in": 5000.0, "punch_out": None},
+    ]
+    cog, db, service = make_cog(times)
+
+    assert "2" in sync(cog)
+    expected = {CalendarSync.event_id(GUILD_ID, MEMBER_ID, t["punch_in"]) for t in times[:2]}
+    assert set(service.events) == expected
+    assert {event["event_id"] for event in db.events.values()} == expected
+    # the open session is retried next time
+    assert db.watermark == 3000.0
+
+
+def test_sync_is_idempotent():
+    times = [{"punch_in": 1000.0, "punch_out": 2000.0}]
+    cog, db, service = make_cog(times)
+    sync(cog)
+
+    assert sync(cog) == "✅ تقويم Google محدث بالفعل."
+    assert len(service.events) == 1
+
+    # the stored mapping is lost: the insert is repeated, but can't duplicate the event
+    db.events.clear()
+    db.watermark = None
+    sync(cog)
+    assert len(service.events) == 1
+    assert len(db.events) == 1
+
+
+def test_sync_patches_changed_sessions():
+    times = [{"punch_in": 1000.0, "punch_out": 2000.0}]
+    cog, db, service = make_cog(times)
+    sync(cog)
+
+    times[0]["punch_out"] = 2500.0
+    sync(cog)
+    (event,) = service.events.values()
+    assert event["end"]["dateTime"].startswith("1970-01-01T00:41:40")
+    assert db.events[1000.0]["punch_out"] == 2500.0
+
+
+def test_parse_datetime():
+    utc = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+    assert parse_datetime("2024-05-01T08:30:00Z") == utc
+    assert parse_datetime("2024-05-01T11:30:00+03:00") == utc
+    assert parse_datetime("2024-05-01T08:30:00.000Z") == utc
+
+
+def test_get_work_schedules_in_start_order():
+    def event(event_id, start, end, summary="Work Schedule"):
+        return {
+            "id": event_id,
+            "summary": summary,
+            "start": {"dateTime": start},
+            "end": {"dateTime": end},
+        }
+
+    calendar = CalendarSync()
+    calendar.authenticate = lambda: True
+    calendar._sync_events = lambda: None
+    calendar._events = {
+        e["id"]: e
+        for e in [
+            event("late", "2024-05-02T09:00:00+03:00", "2024-05-02T17:00:00+03:00"),
+            event("early", "2024-05-01T06:00:00Z", "2024-05-01T14:00:00Z"),
+            event("other", "2024-05-01T07:00:00Z", "2024-05-01T08:00:00Z", summary="Lunch"),
+            event("before", "2024-04-20T06:00:00Z", "2024-04-20T14:00:00Z"),
+            {"id": "all-day", "summary": "Work Schedule", "start": {"date": "2024-05-01"}},
+        ]
+    }
+
+    events = calendar.get_work_schedules(
+        datetime(2024, 5, 1, tzinfo=timezone.utc), datetime(2024, 5, 8, tzinfo=timezone.utc)
+    )
+    assert [event["id"] for event in events] == ["early", "late"]
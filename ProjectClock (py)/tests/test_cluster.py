@@ -0,0 +1,190 @@
+import asyncio
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from timeclock.cluster import Cluster, FileLease, Lease, MongoLease
+
+TTL = 1.0
+RENEW = 0.1
+
+
+class FlakyLease(Lease):
+    """Always free to take; setting `fail` to "error" or "hang" makes renewals do that"""
+
+    def __init__(self) -> None:
+        self.fail = None
+        self.renewed = None
+
+    async def acquire(self) -> bool:
+        if self.fail == "hang":
+            await asyncio.sleep(3600)
+        if self.fail == "error":
+            raise ConnectionError("database unreachable")
+        self.renewed = time.monotonic()
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+def cluster(lease: Lease) -> Cluster:
+    return Cluster(lease, ttl=TTL, renew=RENEW)
+
+
+async def wait_for_leader(clusters, within: float) -> Cluster:
+    deadline = time.monotonic() + within
+    while time.monotonic() < deadline:
+        leaders = [c for c in clusters if c.is_leader]
+        if leaders:
+            assert len(leaders) == 1
+            return leaders[0]
+        await asyncio.sleep(RENEW / 4)
+    raise AssertionError(f"no leader within {within}s")
+
+
+async def check_single_leader(clusters, duration: float) -> None:
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        assert sum(c.is_leader for c in clusters) == 1
+        await asyncio.sleep(RENEW / 4)
+
+
+def test_lease_is_abstract():
+    with pytest.raises(TypeError):
+        Lease()
+
+
+def test_single_leader_and_failover_on_release(tmp_path):
+    path = str(tmp_path / "leader.lock")
+
+    async def main():
+        elected = []
+        clusters = [cluster(FileLease(path)) for _ in range(2)]
+        for n, c in enumerate(clusters):
+
+            async def on_elected(n=n):
+                elected.append(n)
+
+            c.on_elected(on_elected)
+            await c.start()
+        try:
+            leader = await wait_for_leader(clusters, RENEW)
+            await check_single_leader(clusters, 5 * RENEW)
+
+            await leader.close()
+            follower = next(c for c in clusters if c is not leader)
+            started = time.monotonic()
+            await wait_for_leader([follower], TTL)
+            assert time.monotonic() - started < TTL
+            await asyncio.sleep(RENEW)
+            assert elected == [clusters.index(leader), clusters.index(follower)]
+        finally:
+            for c in clusters:
+                await c.close()
+
+    asyncio.run(main())
+
+
+def test_failover_when_the_holder_dies(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            textwrap.dedent(
+                f"""
+                import fcntl, time
+                file = open({path!r}, "a")
+                fcntl.flock(file, fcntl.LOCK_EX)
+                print("held", flush=True)
+                time.sleep(60)
+                """
+            ),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "held"
+
+        async def main():
+            c = cluster(FileLease(path))
+            await c.start()
+            try:
+                await asyncio.sleep(3 * RENEW)
+                assert not c.is_leader
+
+                holder.kill()
+                started = time.monotonic()
+                await wait_for_leader([c], TTL)
+                assert time.monotonic() - started < TTL
+            finally:
+                await c.close()
+
+        asyncio.run(main())
+    finally:
+        holder.kill()
+        holder.wait()
+
+
+@pytest.mark.parametrize("fail", ["error", "hang"])
+def test_leader_steps_down_when_renewals_fail(fail):
+    async def main():
+        lease = FlakyLease()
+        c = cluster(lease)
+        await c.start()
+        try:
+            assert c.is_leader
+            await asyncio.sleep(2 * RENEW)
+
+            lease.fail = fail
+            while c.is_leader:
+                await asyncio.sleep(RENEW / 4)
+            # stepped down while the lease it last renewed was surely still its own
+            assert time.monotonic() - lease.renewed < TTL
+            assert c.metrics.snapshot()["counters"]["cluster.deposed"] == 1
+
+            lease.fail = None
+            await wait_for_leader([c], 2 * RENEW)
+        finally:
+            await c.close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.mongod
+def test_mongo_lease(mongodb):
+    async def main():
+        async with mongodb() as db:
+            clusters = [
+                cluster(MongoLease(db.db.leases, "leader", f"process-{n}", TTL)) for n in range(3)
+            ]
+            for c in clusters:
+                await c.start()
+            try:
+                leader = await wait_for_leader(clusters, RENEW)
+                await check_single_leader(clusters, 5 * RENEW)
+
+                # handed over on release
+                await leader.close()
+                clusters.remove(leader)
+                started = time.monotonic()
+                leader = await wait_for_leader(clusters, TTL)
+                assert time.monotonic() - started < TTL
+
+                # the holder dies without releasing: taken over once the lease expires
+                leader._task.cancel()
+                clusters.remove(leader)
+                started = time.monotonic()
+                await wait_for_leader(clusters, TTL + 2 * RENEW)
+                assert time.monotonic() - started < TTL + 2 * RENEW
+                await check_single_leader(clusters, 3 * RENEW)
+            finally:
+                for c in clusters:
+                    await c.close()
+
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+
+from timeclock.analytics import ComplianceEngine
+from timeclock.database.config import GuildConfig
+
+MONDAY = date(2024, 5, 6)
+SEEDS = range(100)
+
+
+def at(day: date, hour: float) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc) + timedelta(hours=hour)
+
+
+def ts(day: date, hour: float) -> float:
+    return at(day, hour).timestamp()
+
+
+def engine(hours) -> ComplianceEngine:
+    """`hours` maps a weekday to its (start hour, end hour)"""
+    config = GuildConfig(1)
+    for weekday, (start, end) in hours.items():
+        config.set_work_hours(weekday, time(start), time(end))
+    return ComplianceEngine(config)
+
+
+def test_overnight_windows_end_the_next_day():
+    windows = engine({0: (22, 6), 1: (9, 17)}).build_windows(
+        at(MONDAY, 0), at(MONDAY + timedelta(days=7), 0)
+    )
+    tuesday = MONDAY + timedelta(days=1)
+    assert windows == [
+        (ts(MONDAY, 22), ts(tuesday, 6), MONDAY),
+        (ts(tuesday, 9), ts(tuesday, 17), tuesday),
+    ]
+
+
+def test_windows_are_clipped_to_the_period():
+    sunday = MONDAY - timedelta(days=1)
+    hours = engine({6: (22, 6), 0: (9, 17)})
+
+    # the shift that began the day before the period is kept, from the period's start
+    assert hours.build_windows(at(MONDAY, 0), at(MONDAY, 24)) == [
+        (ts(MONDAY, 0), ts(MONDAY, 6), sunday),
+        (ts(MONDAY, 9), ts(MONDAY, 17), MONDAY),
+    ]
+    assert hours.build_windows(at(MONDAY, 12), at(MONDAY, 15)) == [
+        (ts(MONDAY, 12), ts(MONDAY, 15), MONDAY)
+    ]
+    assert hours.build_windows(at(MONDAY, 18), at(MONDAY, 21)) == []
+
+
+def test_overnight_shift_is_attributed_to_its_first_day():
+    tuesday = MONDAY + timedelta(days=1)
+    results = engine({0: (22, 6)}).analyze_guild(
+        {7: [(ts(MONDAY, 23), ts(tuesday, 5))]}, at(MONDAY, 0), at(tuesday, 24)
+    )
+
+    [entry] = results[7]
+    assert entry.day == MONDAY
+    assert entry.scheduled_minutes == 8 * 60
+    assert entry.covered_minutes == 6 * 60
+    assert entry.late_minutes == entry.early_minutes == 60
+    assert entry.overtime_minutes == 0
+    assert not entry.absent
+
+
+def test_sessions_are_clipped_to_the_period():
+    # worked 08:00 - 18:00 of a 09:00 - 17:00 day, reported over 12:00 - 15:00 only
+    results = engine({0: (9, 17)}).analyze_guild(
+        {7: [(ts(MONDAY, 8), ts(MONDAY, 18))]}, at(MONDAY, 12), at(MONDAY, 15)
+    )
+
+    [entry] = results[7]
+    assert entry.scheduled_minutes == entry.covered_minutes == 3 * 60
+    assert entry.late_minutes == entry.early_minutes == entry.overtime_minutes == 0
+
+
+def test_skip_days():
+    tuesday = MONDAY + timedelta(days=1)
+    hours = engine({0: (9, 17), 1: (9, 17), 2: (9, 17)})
+    sessions = {7: [(ts(tuesday, 9), ts(tuesday, 12))]}
+    start, end = at(MONDAY, 0), at(MONDAY, 72)
+
+    results = hours.analyze_guild(sessions, start, end)
+    assert [(e.day, e.absent) for e in results[7]] == [
+        (MONDAY, True),
+        (tuesday, False),
+        (tuesday + timedelta(days=1), True),
+    ]
+
+    # on leave Monday and Tuesday: neither is scheduled, and Tuesday's work is overtime
+    results = hours.analyze_guild(sessions, start, end, skip_days={7: [MONDAY, tuesday]})
+    by_day = {entry.day: entry for entry in results[7]}
+    assert MONDAY not in by_day
+    assert by_day[tuesday].scheduled_minutes == 0
+    assert by_day[tuesday].overtime_minutes == 3 * 60
+    assert not by_day[tuesday].absent
+    assert by_day[tuesday + timedelta(days=1)].absent
+
+    summary = hours.summarize(results)
+    assert summary.scheduled_hours == 8
+    assert summary.absences == 1
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_worked_time_is_covered_or_overtime(seed):
+    rng = random.Random(seed)
+    # shifts start from 06:00 and end by 06:00 the next day, so no two overlap
+    hours = {}
+    for weekday in range(7):
+        if rng.random() < 0.7:
+            start_hour = rng.randrange(6, 24)
+            hours[weekday] = (start_hour, (start_hour + rng.randint(1, 30 - start_hour)) % 24)
+    start = at(MONDAY, rng.uniform(0, 48))
+    end = start + timedelta(hours=rng.uniform(1, 24 * 10))
+    sessions = []
+    for _ in range(rng.randint(0, 30)):
+        punch_in = ts(MONDAY, rng.uniform(-24, 24 * 13))
+        sessions.append((punch_in, punch_in + rng.uniform(0, 3600 * 14)))
+    skip = {MONDAY + timedelta(days=rng.randrange(12)) for _ in range(rng.randint(0, 3))}
+
+    compliance = engine(hours)
+    entries = compliance.analyze_guild({7: sessions}, start, end, skip_days={7: skip})[7]
+
+    # every worked minute inside the period is counted once, in or out of schedule
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    worked = sorted(
+        (max(p_in, start_ts), min(p_out, end_ts))
+        for p_in, p_out in sessions
+        if p_out > start_ts and p_in < end_ts
+    )
+    total, reach = 0.0, start_ts
+    for s_start, s_end in worked:
+        total += max(0.0, s_end - max(s_start, reach))
+        reach = max(reach, s_end)
+    assert sum(e.covered_minutes + e.overtime_minutes for e in entries) == pytest.approx(total / 60)
+
+    windows = [w for w in compliance.build_windows(start, end) if w[2] not in skip]
+    assert sum(e.scheduled_minutes for e in entries) == pytest.approx(
+        sum(w_end - w_start for w_start, w_end, _ in windows) / 60
+    )
+    for entry in entries:
+        assert entry.day not in skip or entry.scheduled_minutes == 0
+        assert 0 <= entry.covered_minutes <= entry.scheduled_minutes + 1e-6
+        assert entry.absent == (entry.scheduled_minutes > 0 and entry.covered_minutes == 0)
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import disnake
+import pytest
+
+from timeclock.bot import create_bot
+from timeclock.cache.duty import OnDutyIndex
+from timeclock.database.mongodb import MongoDB
+
+
+class FakeCursor:
+    def __init__(self, documents) -> None:
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeMembers:
+    """The `members` collection, for equality queries and the projections the loaders use"""
+
+    def __init__(self, documents) -> None:
+        self.documents = documents
+
+    def _matching(self, query):
+        return [doc for doc in self.documents if all(doc.get(k) == v for k, v in query.items())]
+
+    def find(self, query, projection):
+        found = []
+        for doc in self._matching(query):
+            projected = {key: doc[key] for key in projection if key in doc}
+            if projection.get("times") == {"$slice": -1}:
+                projected["times"] = doc["times"][-1:]
+            found.append(projected)
+        return FakeCursor(found)
+
+    async def distinct(self, key, query):
+        return list(dict.fromkeys(doc[key] for doc in self._matching(query)))
+
+
+MEMBERS = [
+    {
+        "id": 10,
+        "guild_id": 1,
+        "on_duty": True,
+        "times": [{"punch_in": 100.0, "punch_out": 200.0}, {"punch_in": 300.0}],
+    },
+    {
+        "id": 11,
+        "guild_id": 1,
+        "on_duty": False,
+        "times": [{"punch_in": 100.0, "punch_out": 150.0}],
+    },
+    {"id": 12, "guild_id": 2, "on_duty": True, "times": [{"punch_in": 50.0}]},
+    # on duty without a session: nothing to load
+    {"id": 13, "guild_id": 2, "on_duty": True, "times": []},
+]
+
+
+def fake_mongodb() -> MongoDB:
+    db = MongoDB.__new__(MongoDB)
+    db.db = SimpleNamespace(members=FakeMembers(MEMBERS))
+    return db
+
+
+def test_on_duty_loaders():
+    db = fake_mongodb()
+
+    assert asyncio.run(db.get_on_duty(1)) == {10: 300.0}
+    assert asyncio.run(db.get_on_duty(3)) == {}
+    assert asyncio.run(db.get_all_on_duty()) == {1: {10: 300.0}, 2: {12: 50.0}}
+    assert sorted(asyncio.run(db.get_member_ids(1))) == [10, 11]
+
+
+def test_index_loads_through_mongodb():
+    db = fake_mongodb()
+
+    async def main():
+        index = OnDutyIndex(db.get_on_duty)
+        # the first punch of a guild loads it: member 10 punches out of their open session
+        assert await index.toggle(1, 10, 400.0) == 300.0
+        assert await index.toggle(1, 11, 400.0) is None
+        assert await index.get(1) == {11: 400.0}
+
+        await index.preload(db.get_all_on_duty, [1, 2])
+        # the loaded guild keeps its newer punches
+        assert await index.get(1) == {11: 400.0}
+        assert await index.get(2) == {12: 50.0}
+
+    asyncio.run(main())
+
+
+def test_bot_loads_from_mongodb():
+    async def main():
+        bot = create_bot(intents=disnake.Intents.default())
+        try:
+            bot.db.db = fake_mongodb().db
+            assert await bot.on_duty.toggle(1, 10, 400.0) == 300.0
+            await bot.on_duty.preload(bot.db.get_all_on_duty, [2])
+            assert await bot.on_duty.get(2) == {12: 50.0}
+
+            guild = SimpleNamespace(id=1, get_member=lambda member_id: None)
+            await bot.member_names._ensure_loaded(guild)
+            assert bot.member_names._records[1] == {10, 11}
+        finally:
+            await bot.close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.mongod
+def test_on_duty_loaders_on_mongod(mongodb):
+    async def main():
+        async with mongodb() as db:
+            await db.init_collections()
+            await db.add_punch(1, 10, 100.0)
+            await db.add_punch(1, 10, 200.0)
+            await db.add_punch(1, 10, 300.0)
+            await db.add_punch(1, 11, 100.0)
+            await db.add_punch(1, 11, 150.0)
+            await db.add_punch(2, 12, 50.0)
+            await db.ensure_member(2, 13)
+
+            assert await db.get_on_duty(1) == {10: 300.0}
+            assert await db.get_all_on_duty() == {1: {10: 300.0}, 2: {12: 50.0}}
+            assert sorted(await db.get_member_ids(2)) == [12, 13]
+
+            index = OnDutyIndex(db.get_on_duty)
+            assert await index.toggle(1, 10, 400.0) == 300.0
+
+    asyncio.run(main())
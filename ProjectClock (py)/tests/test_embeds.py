@@ -0,0 +1,114 @@
+import random
+
+import disnake
+import pytest
+
+from timeclock import embeds as limits
+from timeclock.embeds import CONTINUED, EmbedLayout, pack_lines, pack_messages, truncate
+
+ALPHABET = "abc دخول"
+SEEDS = range(200)
+
+
+def text(rng: random.Random, longest: int) -> str:
+    return "".join(rng.choices(ALPHABET, k=rng.randint(0, longest)))
+
+
+def check_limits(embed: disnake.Embed) -> None:
+    assert len(embed.title or "") <= limits.TITLE
+    assert len(embed.description or "") <= limits.DESCRIPTION
+    assert len(embed.fields) <= limits.FIELDS
+    for field in embed.fields:
+        assert 0 < len(field.name) <= limits.FIELD_NAME
+        assert 0 < len(field.value) <= limits.FIELD_VALUE
+    assert len(embed.footer.text or "") <= limits.FOOTER
+    assert len(embed) <= limits.TOTAL
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_pack_lines(seed):
+    rng = random.Random(seed)
+    limit = rng.randint(5, 300)
+    oversized = rng.random() < 0.2
+    rows = [text(rng, limit * 2 if oversized else limit) for _ in range(rng.randint(0, 40))]
+
+    chunks = pack_lines(rows, limit)
+
+    assert all(len(chunk) <= limit for chunk in chunks)
+    if all(len(row) <= limit for row in rows):
+        assert "\n".join(chunks) == "\n".join(rows)
+        # next-fit: no chunk could also have held the first row of the next one
+        for chunk, following in zip(chunks, chunks[1:]):
+            assert len(chunk) + 1 + len(following.split("\n")[0]) > limit
+    else:
+        # rows that don't fit are cut up, but nothing is lost or reordered
+        assert "".join(chunks).replace("\n", "") == "".join(rows)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_layout_within_limits_and_keeps_content(seed):
+    rng = random.Random(seed)
+    layout = EmbedLayout(
+        text(rng, 400) or "title",
+        continued_title=text(rng, 300) or None,
+        footer=text(rng, 2500) or None,
+    )
+    lines = [text(rng, 5000 if rng.random() < 0.2 else 200) for _ in range(rng.randint(0, 40))]
+    fields = [
+        (
+            text(rng, 300) or "name",
+            "\n".join(text(rng, 500) for _ in range(rng.randint(0, 6))),
+            bool(rng.getrandbits(1)),
+        )
+        for _ in range(rng.randint(0, 60))
+    ]
+    footer = (text(rng, 2500) or None) if rng.random() < 0.5 else None
+
+    embeds = layout.build(lines, fields, footer=footer)
+
+    for embed in embeds:
+        check_limits(embed)
+
+    # descriptions come first and hold the rows in order
+    descriptions = [embed.description for embed in embeds if embed.description]
+    assert [embed.description for embed in embeds[: len(descriptions)]] == descriptions
+    assert "".join(descriptions).replace("\n", "") == "".join(lines)
+    # rows are only cut up when they don't fit next to the longest title and footer
+    if all(len(line) <= limits.TOTAL - limits.TITLE - limits.FOOTER for line in lines):
+        assert "\n".join(descriptions) == "\n".join(lines)
+
+    # then the fields, a long value continuing in fields named CONTINUED
+    laid_out = []
+    for field in (field for embed in embeds for field in embed.fields):
+        value = "" if field.value == CONTINUED else field.value
+        if field.name == CONTINUED:
+            name, previous, inline = laid_out[-1]
+            laid_out[-1] = (name, previous + "\n" + value, inline)
+        else:
+            laid_out.append((field.name, value, field.inline))
+    assert laid_out == [
+        (truncate(name, limits.FIELD_NAME), "\n".join(value.splitlines()), inline)
+        for name, value, inline in fields
+    ]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_pack_messages(seed):
+    rng = random.Random(seed)
+    embeds = [
+        disnake.Embed(title=text(rng, 256), description=text(rng, 4096))
+        for _ in range(rng.randint(0, 40))
+    ]
+
+    messages = pack_messages(embeds)
+
+    assert [embed for message in messages for embed in message] == embeds
+    for message in messages:
+        assert 1 <= len(message) <= limits.EMBEDS_PER_MESSAGE
+        assert sum(len(embed) for embed in message) <= limits.TOTAL
+    # greedy: a message is only closed when the next embed doesn't fit in it
+    for message, following in zip(messages, messages[1:]):
+        assert (
+            len(message) == limits.EMBEDS_PER_MESSAGE
+            or sum(len(embed) for embed in message) + len(following[0]) > limits.TOTAL
+        )
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+
+from timeclock.executor import ExecutorBusy, ExecutorService
+
+
+def test_full_pool_rejects_or_waits():
+    release = threading.Event()
+
+    async def main():
+        executor = ExecutorService(io_workers=1, max_queued=1)
+        try:
+            blocked = [asyncio.create_task(executor.run_io(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            assert executor.io.pending == 2
+
+            with pytest.raises(ExecutorBusy):
+                await executor.run_io(sum, [1, 2])
+
+            waiting = asyncio.create_task(executor.run_io(sum, [1, 2], wait=True))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+
+            release.set()
+            assert await asyncio.wait_for(waiting, 5) == 3
+            await asyncio.gather(*blocked)
+            assert executor.io.pending == 0
+            assert executor.metrics.snapshot()["counters"]["executor.io.waited"] == 1
+        finally:
+            release.set()
+            executor.shutdown()
+
+    asyncio.run(main())
+
+
+def test_waiters_all_run():
+    async def main():
+        executor = ExecutorService(io_workers=2, max_queued=0)
+        try:
+            results = await asyncio.gather(
+                *(executor.run_io(pow, n, 2, wait=True) for n in range(50))
+            )
+            assert results == [n * n for n in range(50)]
+            assert executor.io.pending == 0
+        finally:
+            executor.shutdown()
+
+    asyncio.run(main())
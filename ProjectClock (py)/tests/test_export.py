@@ -0,0 +1,108 @@
+import asyncio
+import csv
+import io
+import json
+import threading
+
+import pytest
+
+from timeclock import export
+from timeclock.executor import ExecutorService
+from timeclock.export import FORMATS, ExportWriter, open_writer
+
+ROWS = [
+    ("Team", 1, "Ahmed", 3600.0, 7200.0),
+    ("Team", 2, "سارة", 3600.0, None),
+]
+
+
+def test_writers_are_abstract():
+    with pytest.raises(TypeError):
+        ExportWriter()
+    if export.pa is not None:
+        with pytest.raises(TypeError):
+            export._ArrowExportWriter()
+
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_every_format_writes(format):
+    writer = open_writer(format)
+    writer.write_rows(ROWS)
+    with writer.close() as output:
+        data = output.read()
+    assert data
+    assert writer.rows == len(ROWS)
+
+
+def test_csv_and_json_content():
+    writer = open_writer("csv")
+    writer.write_rows(ROWS)
+    with writer.close() as output:
+        rows = list(csv.reader(io.TextIOWrapper(output, encoding="utf-8")))
+    assert rows[0] == list(export.FIELDNAMES)
+    assert [row[1] for row in rows[1:]] == ["Ahmed", "سارة"]
+
+    writer = open_writer("json")
+    writer.write_rows(ROWS)
+    with writer.close() as output:
+        items = json.load(output)
+    assert [item["duration"] for item in items] == [1.0, None]
+
+
+@pytest.mark.parametrize("format", FORMATS)
+@pytest.mark.parametrize("rows", [[], ROWS])
+def test_abort(format, rows):
+    writer = open_writer(format)
+    writer.write_rows(rows)
+    writer.abort()
+    assert writer.file.closed
+    if format == "xlsx":
+        assert writer.workbook.fileclosed
+    # a second abort, or one after close, does nothing
+    writer.abort()
+
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_abort_after_close(format):
+    writer = open_writer(format)
+    writer.write_rows(ROWS)
+    writer.close()
+    writer.abort()
+    assert writer.file.closed
+
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_abort_waits_for_write_in_progress(format):
+    release = threading.Event()
+
+    def slow_rows():
+        yield ROWS[0]
+        release.wait()
+        yield ROWS[1]
+
+    async def main():
+        executor = ExecutorService(io_workers=2, max_queued=0)
+        writer = open_writer(format)
+        try:
+            write = asyncio.create_task(writer.awrite_rows(slow_rows(), executor))
+            await asyncio.sleep(0.05)
+            abort = asyncio.create_task(writer.aabort(executor))
+            await asyncio.sleep(0.05)
+            assert not abort.done() and not writer.file.closed
+
+            release.set()
+            await asyncio.wait_for(asyncio.gather(write, abort), 5)
+            assert writer.rows == len(ROWS)
+            assert writer.file.closed
+        finally:
+            release.set()
+            executor.shutdown()
+
+    asyncio.run(main())
+
+
+def test_write_after_abort_is_dropped():
+    writer = open_writer("csv")
+    writer.abort()
+    writer.write_rows(ROWS)
+    assert writer.rows == 0
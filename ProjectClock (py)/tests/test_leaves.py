@@ -0,0 +1,217 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from timeclock.cache.intervals import IntervalTree
+from timeclock.cache.leaves import LeaveCache
+from timeclock.database.leave import APPROVED, DENIED, PENDING
+
+SEEDS = range(200)
+GUILD_ID = 1
+
+
+def check_treap(node, low=None, high=None) -> int:
+    """Checks order, heap priorities and `max_end` below `node`; returns its size"""
+    if node is None:
+        return 0
+    assert (low is None or low < node.key) and (high is None or node.key < high)
+    max_end = node.key[1]
+    for child in (node.left, node.right):
+        if child is not None:
+            assert child.priority <= node.priority
+            max_end = max(max_end, child.max_end)
+    assert node.max_end == max_end
+    return 1 + check_treap(node.left, low, node.key) + check_treap(node.right, node.key, high)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_interval_tree_matches_brute_force(seed):
+    rng = random.Random(seed)
+    tree = IntervalTree()
+    intervals = {}  # value -> (start, end, insertion order)
+    added = 0
+
+    for _ in range(rng.randint(0, 300)):
+        value = rng.randrange(60)
+        if rng.random() < 0.3:
+            assert tree.remove(value) == (intervals.pop(value, None) is not None)
+        else:
+            start = rng.randrange(100)
+            end = start + rng.randint(0, 20)
+            added += 1
+            tree.add(start, end, value)
+            intervals[value] = (start, end, added)
+
+        if rng.random() < 0.2:
+            query_start = rng.randrange(-5, 120)
+            query_end = query_start + rng.randint(0, 30)
+            expected = sorted(
+                (key, value)
+                for value, key in intervals.items()
+                if key[0] < query_end and query_start < key[1]
+            )
+            assert tree.overlapping(query_start, query_end) == [value for _, value in expected]
+
+            point = rng.randrange(-5, 120)
+            assert sorted(tree.at(point)) == sorted(
+                value for value, (start, end, _) in intervals.items() if start <= point < end
+            )
+
+    assert len(tree) == len(intervals) == check_treap(tree._root)
+    assert all(value in tree for value in intervals)
+
+
+def test_interval_tree_stays_shallow():
+    rng = random.Random(0)
+    tree = IntervalTree()
+    # sorted inserts would make a plain search tree a list
+    for value in range(5000):
+        tree.add(value, value + 10, value)
+    for value in rng.sample(range(5000), 2500):
+        tree.remove(value)
+
+    def depth(node):
+        return 0 if node is None else 1 + max(depth(node.left), depth(node.right))
+
+    assert check_treap(tree._root) == 2500
+    assert depth(tree._root) < 60
+
+
+class FakeLeaveDB:
+    """The leave methods of `MongoDB`, over documents in memory"""
+
+    def __init__(self) -> None:
+        self.leaves = []
+        self.balances = {}  # (guild_id, member_id, year) -> used days
+
+    async def get_leaves(self, guild_id, statuses):
+        return [
+            dict(doc)
+            for doc in self.leaves
+            if doc["guild_id"] == guild_id and doc["status"] in statuses
+        ]
+
+    async def get_leave_balances(self, guild_id):
+        return [
+            {"guild_id": g, "member_id": member_id, "year": year, "used_days": days}
+            for (g, member_id, year), days in self.balances.items()
+            if g == guild_id
+        ]
+
+    async def create_leave(self, leave):
+        leave = {**leave, "id": len(self.leaves) + 1}
+        self.leaves.append(leave)
+        return dict(leave)
+
+    async def set_leave_status(self, guild_id, leave_id, status, decided_by, *, current):
+        for doc in self.leaves:
+            if doc["guild_id"] == guild_id and doc["id"] == leave_id and doc["status"] == current:
+                doc.update(status=status, decided_by=decided_by)
+                return dict(doc)
+        return None
+
+    async def add_leave_days(self, guild_id, member_id, days_per_year):
+        for year, days in days_per_year.items():
+            key = (guild_id, member_id, year)
+            self.balances[key] = self.balances.get(key, 0) + days
+
+
+def test_request_approve_and_deny():
+    db = FakeLeaveDB()
+    cache = LeaveCache(db)
+    start = date(2024, 12, 28)
+
+    async def main():
+        leave, conflicts = await cache.request(GUILD_ID, 7, start, start + timedelta(days=7))
+        assert leave.status == PENDING and not conflicts
+        assert await cache.pending(GUILD_ID, 7) == [leave]
+        # pending leaves aren't counted, nor taken by anyone
+        assert await cache.used_days(GUILD_ID, 7, 2024) == 0
+        assert await cache.on_leave(GUILD_ID, start) == set()
+
+        refused, conflicts = await cache.request(
+            GUILD_ID, 7, start + timedelta(days=6), start + timedelta(days=9)
+        )
+        assert refused is None and [c.id for c in conflicts] == [leave.id]
+        # other members' leaves don't conflict
+        other, _ = await cache.request(GUILD_ID, 8, start, start + timedelta(days=2))
+        assert other is not None
+
+        approved = await cache.decide(GUILD_ID, leave.id, APPROVED, 99)
+        assert approved.status == APPROVED and approved.decided_by == 99
+        # the leave crosses into the new year
+        assert await cache.used_days(GUILD_ID, 7, 2024) == 4
+        assert await cache.used_days(GUILD_ID, 7, 2025) == 3
+        assert await cache.on_leave(GUILD_ID, start) == {7}
+        # a leave is only decided once
+        assert await cache.decide(GUILD_ID, leave.id, DENIED, 99) is None
+        assert await cache.used_days(GUILD_ID, 7, 2024) == 4
+
+        denied = await cache.decide(GUILD_ID, other.id, DENIED, 99)
+        assert denied.status == DENIED
+        assert await cache.used_days(GUILD_ID, 8, 2024) == 0
+        assert await cache.pending(GUILD_ID, 8) == []
+        # the denied days are free to request again
+        again, _ = await cache.request(
+            GUILD_ID, 8, start, start + timedelta(days=2), approved_by=99
+        )
+        assert again.status == APPROVED
+        assert await cache.used_days(GUILD_ID, 8, 2024) == 2
+
+        assert await cache.leave_days(GUILD_ID, date(2025, 1, 1), date(2025, 2, 1)) == {
+            7: {date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)}
+        }
+
+        # a fresh cache loads the same state from the database
+        reloaded = LeaveCache(db)
+        for member_id, year in [(7, 2024), (7, 2025), (8, 2024)]:
+            assert await reloaded.used_days(GUILD_ID, member_id, year) == await cache.used_days(
+                GUILD_ID, member_id, year
+            )
+        assert await reloaded.on_leave(GUILD_ID, start) == {7, 8}
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_balances_match_approved_leaves(seed):
+    rng = random.Random(seed)
+    db = FakeLeaveDB()
+    cache = LeaveCache(db)
+
+    async def main():
+        for _ in range(rng.randint(1, 60)):
+            member_id = rng.randrange(4)
+            pending = await cache.pending(GUILD_ID, member_id)
+            if pending and rng.random() < 0.5:
+                status = rng.choice([APPROVED, DENIED])
+                await cache.decide(GUILD_ID, rng.choice(pending).id, status, 99)
+            else:
+                start = date(2024, 12, 1) + timedelta(days=rng.randrange(60))
+                end = start + timedelta(days=rng.randint(1, 10))
+                await cache.request(GUILD_ID, member_id, start, end)
+
+        approved = [doc for doc in db.leaves if doc["status"] == APPROVED]
+        for member_id in range(4):
+            for year in (2024, 2025):
+                expected = sum(
+                    (min(date.fromisoformat(doc["end"]), date(year + 1, 1, 1))
+                     - max(date.fromisoformat(doc["start"]), date(year, 1, 1))).days
+                    for doc in approved
+                    if doc["member_id"] == member_id
+                    and date.fromisoformat(doc["start"]) < date(year + 1, 1, 1)
+                    and date(year, 1, 1) < date.fromisoformat(doc["end"])
+                )
+                assert await cache.used_days(GUILD_ID, member_id, year) == expected
+
+            # no member holds two overlapping pending or approved leaves
+            held = sorted(
+                (doc["start"], doc["end"])
+                for doc in db.leaves
+                if doc["member_id"] == member_id and doc["status"] != DENIED
+            )
+            assert all(end <= following for (_, end), (following, _) in zip(held, held[1:]))
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import asyncio
+
+import disnake
+
+from timeclock.outbound import OutboundQueue, Priority
+
+
+class FakeChannel:
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.sent = []
+
+    async def send(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+def test_interactive_overtakes_queued_batch_messages():
+    async def main():
+        queue = OutboundQueue(channel_rate=1000.0, channel_burst=1)
+        channel = FakeChannel(1)
+        batch = [
+            queue.send(channel, content=f"report {i}", priority=Priority.BATCH) for i in range(5)
+        ]
+        await asyncio.sleep(0)  # the first report is sent
+        urgent = queue.send(channel, content="punch", priority=Priority.INTERACTIVE)
+        alert = queue.send(channel, content="alert", priority=Priority.ALERT)
+        await asyncio.gather(*batch, urgent, alert)
+        await queue.aclose()
+        return [kwargs["content"] for kwargs in channel.sent]
+
+    sent = asyncio.run(main())
+    assert sent == ["report 0", "punch", "alert"] + [f"report {i}" for i in range(1, 5)]
+
+
+def test_embeds_coalesce_in_priority_order():
+    async def main():
+        queue = OutboundQueue(channel_rate=1000.0, channel_burst=1)
+        channel = FakeChannel(1)
+        futures = [queue.send(channel, content="first")]
+        await asyncio.sleep(0)  # sent before the rest are queued
+        futures += [
+            queue.send(channel, embed=disnake.Embed(title=f"batch {i}"), priority=Priority.BATCH)
+            for i in range(3)
+        ]
+        futures.append(
+            queue.send(channel, embed=disnake.Embed(title="alert"), priority=Priority.ALERT)
+        )
+        await asyncio.gather(*futures)
+        await queue.aclose()
+        return channel.sent
+
+    sent = asyncio.run(main())
+    assert sent[0] == {"content": "first"}
+    titles = [embed.title for embed in sent[1]["embeds"]]
+    assert titles == ["alert", "batch 0", "batch 1", "batch 2"]
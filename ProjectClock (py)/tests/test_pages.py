@@ -0,0 +1,40 @@
+import asyncio
+
+import disnake
+import pytest
+
+from timeclock.components import ListPageSource, PageSource, RowPageSource
+
+
+def test_page_source_is_abstract():
+    with pytest.raises(TypeError):
+        PageSource()
+
+    class NoRender(PageSource):
+        page_count = 1
+
+    with pytest.raises(TypeError):
+        NoRender()
+
+
+@pytest.mark.parametrize("rows, pages", [(0, 1), (1, 1), (10, 1), (11, 2), (25, 3)])
+def test_row_pages(rows, pages):
+    source = RowPageSource(
+        list(range(rows)),
+        lambda rows, index: disnake.Embed(title=str(index), description=",".join(map(str, rows))),
+        per_page=10,
+    )
+    assert source.page_count == pages
+
+    embeds = [asyncio.run(source.render(index)) for index in range(source.page_count)]
+    assert [embed.title for embed in embeds] == [str(index) for index in range(pages)]
+    assert ",".join(embed.description for embed in embeds if embed.description) == ",".join(
+        map(str, range(rows))
+    )
+
+
+def test_list_pages():
+    embeds = [disnake.Embed(title=str(index)) for index in range(3)]
+    source = ListPageSource(embeds)
+    assert source.page_count == 3
+    assert asyncio.run(source.render(2)) is embeds[2]
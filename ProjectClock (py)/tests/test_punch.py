@@ -0,0 +1,240 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import disnake
+import pytest
+
+from timeclock.cache.duty import OnDutyIndex
+from timeclock.cogs.listener import Listeners
+from timeclock.constants import Punch
+from timeclock.metrics import Metrics
+
+GUILD_ID = 1
+
+
+class FakeStore:
+    """Members' sessions in memory, written the way the database does: read, then write"""
+
+    def __init__(self) -> None:
+        self.sessions = defaultdict(list)  # member ID -> [[punch_in, punch_out], ...]
+        self.writes = defaultdict(list)  # member ID -> timestamps, in the order written
+
+    async def add_punch(self, guild_id, member_id, timestamp):
+        sessions = self.sessions[member_id]
+        on_duty = bool(sessions) and sessions[-1][1] is None
+        # slower than the debounce window, so a member's writes would interleave here
+        await asyncio.sleep(random.random() * 0.1)
+        if on_duty:
+            sessions[-1][1] = timestamp
+        else:
+            sessions.append([timestamp, None])
+        self.writes[member_id].append(timestamp)
+        return SimpleNamespace(
+            on_duty=not on_duty,
+            times=[SimpleNamespace(punch_in=punch_in) for punch_in, _ in sessions],
+        )
+
+    def on_duty(self):
+        return {
+            member_id: sessions[-1][0]
+            for member_id, sessions in self.sessions.items()
+            if sessions and sessions[-1][1] is None
+        }
+
+
+class FakeResponse:
+    def __init__(self) -> None:
+        self.embeds = []
+
+    async def send_message(self, embed=None, **kwargs):
+        await asyncio.sleep(random.random() * 0.002)
+        self.embeds.append(embed)
+
+    # followups, sent when a write fails or the database disagrees
+    async def send(self, **kwargs):
+        self.embeds.append(kwargs.get("embed"))
+
+
+def click(member_id: int):
+    guild = SimpleNamespace(id=GUILD_ID)
+    author = SimpleNamespace(
+        id=member_id,
+        display_name=str(member_id),
+        display_avatar=None,
+        roles=[],
+        guild=guild,
+        guild_permissions=SimpleNamespace(administrator=True),
+    )
+    response = FakeResponse()
+    return SimpleNamespace(
+        guild=guild,
+        author=author,
+        response=response,
+        followup=response,
+        created_at=disnake.utils.utcnow(),
+    )
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    monkeypatch.setattr(Punch, "debounce_ms", 50)
+    store = FakeStore()
+
+    async def load(guild_id):
+        return {}
+
+    async def get_mod_role_ids(guild_id):
+        return frozenset()
+
+    bot = SimpleNamespace(
+        metrics=Metrics(),
+        on_duty=OnDutyIndex(load),
+        add_punch=store.add_punch,
+        get_mod_role_ids=get_mod_role_ids,
+        router=SimpleNamespace(register=lambda *args, **kwargs: None),
+    )
+
+    # punches in the order the listener decides them
+    decided = defaultdict(list)
+    toggle = bot.on_duty.toggle
+
+    async def record_toggle(guild_id, member_id, timestamp):
+        decided[member_id].append((time.monotonic(), timestamp))
+        return await toggle(guild_id, member_id, timestamp)
+
+    bot.on_duty.toggle = record_toggle
+    return Listeners(bot), store, decided
+
+
+async def settle(cog: Listeners) -> None:
+    while cog._pending:
+        await asyncio.gather(*list(cog._pending))
+
+
+def test_double_click_collapses(listener):
+    cog, store, decided = listener
+
+    async def main():
+        first, second = click(7), click(7)
+        await asyncio.gather(cog.punch_in_out_click(first), cog.punch_in_out_click(second))
+        await settle(cog)
+        # both clicks are answered with the same punch
+        assert first.response.embeds[0].description == second.response.embeds[0].description
+
+        await asyncio.sleep(cog.debounce)
+        await cog.punch_in_out_click(click(7))
+        await settle(cog)
+
+    asyncio.run(main())
+    assert len(store.writes[7]) == 2
+    assert store.on_duty() == {}
+    assert cog.bot.metrics.snapshot()["counters"]["punch.debounced"] == 1
+
+
+def test_concurrent_clicks(listener):
+    cog, store, decided = listener
+    members, clicks = 300, 5000
+
+    async def one_click(member_id):
+        await asyncio.sleep(random.random() * 0.5)
+        await cog.punch_in_out_click(click(member_id))
+
+    async def main():
+        await asyncio.gather(*(one_click(random.randrange(members)) for _ in range(clicks)))
+        await settle(cog)
+        return dict(await cog.bot.on_duty.get(GUILD_ID))
+
+    index = asyncio.run(main())
+    counters = cog.bot.metrics.snapshot()["counters"]
+
+    # every click is either a write or collapsed into one
+    writes = sum(len(timestamps) for timestamps in store.writes.values())
+    assert writes + counters.get("punch.debounced", 0) == clicks
+    assert counters.get("punch.confirmed", 0) == writes
+    assert not counters.get("punch.reconciled") and not counters.get("punch.failed")
+
+    for member_id, punches in decided.items():
+        # a member's writes ran in the order their punches were decided
+        assert store.writes[member_id] == [timestamp for _, timestamp in punches]
+        # no two punches of a member were decided within the debounce window
+        for (earlier, _), (later, _) in zip(punches, punches[1:]):
+            assert later - earlier >= cog.debounce
+
+        sessions = store.sessions[member_id]
+        for (punch_in, punch_out), following in zip(sessions, sessions[1:] + [None]):
+            assert punch_out is None or punch_in <= punch_out
+            if following is not None:
+                assert punch_out is not None and punch_out <= following[0]
+
+    assert index == store.on_duty()
+    assert not cog._writes
+
+
+def test_ack_is_sent_outside_the_lock(listener):
+    cog, store, decided = listener
+    release = asyncio.Event()
+
+    async def main():
+        first, second = click(7), click(7)
+        send_message = first.response.send_message
+
+        async def slow_ack(**kwargs):
+            await release.wait()
+            await send_message(**kwargs)
+
+        first.response.send_message = slow_ack
+        acking = asyncio.create_task(cog.punch_in_out_click(first))
+        await asyncio.sleep(0.01)
+        # the member's next click is answered while the first ack is still on its way
+        await asyncio.wait_for(cog.punch_in_out_click(second), 1)
+        assert not acking.done() and not store.writes[7]
+
+        release.set()
+        await acking
+        await settle(cog)
+        assert first.response.embeds[0].description == second.response.embeds[0].description
+
+    asyncio.run(main())
+    assert len(store.writes[7]) == 1
+
+
+@pytest.mark.parametrize("built_on", [False, True])
+def test_failed_ack(listener, monkeypatch, built_on):
+    cog, store, decided = listener
+    if built_on:
+        monkeypatch.setattr(cog, "debounce", 0)
+
+    async def main():
+        failing, later = click(7), click(7)
+        sent = asyncio.Event()
+
+        async def fail(**kwargs):
+            if built_on:
+                await sent.wait()
+            raise disnake.HTTPException(SimpleNamespace(status=500, reason="error"), "error")
+
+        failing.response.send_message = fail
+        acking = asyncio.create_task(cog.punch_in_out_click(failing))
+        await asyncio.sleep(0.01)
+        if built_on:
+            # a later punch was decided on top of the unacknowledged one
+            await cog.punch_in_out_click(later)
+            sent.set()
+        with pytest.raises(disnake.HTTPException):
+            await acking
+        await settle(cog)
+        return dict(await cog.bot.on_duty.get(GUILD_ID))
+
+    index = asyncio.run(main())
+    counters = cog.bot.metrics.snapshot()["counters"]
+    assert counters["punch.ack_failed"] == 1
+    if built_on:
+        # the later punch closed the failed one, so both are kept
+        assert len(store.writes[7]) == 2
+    else:
+        assert not store.writes[7]
+        assert not cog._recent
+    assert index == store.on_duty() == {}
@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from timeclock.cogs.schedule import Schedule
+from timeclock.ics import IcsFeed
+
+GUILD_ID = 1
+TEAM_ID = 5
+
+
+class FakeTeams:
+    def __init__(self, members) -> None:
+        self.team = SimpleNamespace(id=TEAM_ID, name="Team", members=set(members))
+
+    async def get_team(self, guild_id, team_id):
+        return self.team if team_id == TEAM_ID else None
+
+    async def members_of_team(self, guild_id, team_id):
+        return set(self.team.members) if team_id == TEAM_ID else set()
+
+
+class FakeInteraction:
+    def __init__(self, member_id: int, administrator: bool = False) -> None:
+        self.guild = SimpleNamespace(id=GUILD_ID)
+        self.author = SimpleNamespace(
+            id=member_id, guild_permissions=SimpleNamespace(administrator=administrator)
+        )
+        self.response = SimpleNamespace(defer=self._defer)
+        self.sent = None
+
+    async def _defer(self, **kwargs):
+        pass
+
+    async def edit_original_response(self, **kwargs):
+        self.sent = kwargs
+
+
+@pytest.fixture
+def cog(monkeypatch):
+    guild = SimpleNamespace(
+        id=GUILD_ID,
+        name="Guild",
+        get_member=lambda member_id: SimpleNamespace(display_name=str(member_id)),
+    )
+    bot = SimpleNamespace(
+        executor=None,
+        db=None,
+        team_cache=FakeTeams([10]),
+        get_guild=lambda guild_id: guild if guild_id == GUILD_ID else None,
+        get_guild_config=lambda guild_id: None,
+    )
+    cog = Schedule(bot)
+    cog.feed_server = None
+
+    async def get_feed(key, name, names, config):
+        return IcsFeed(name)
+
+    monkeypatch.setattr(cog.feeds, "get_feed", get_feed)
+    return cog
+
+
+def feed_for(cog: Schedule, inter: FakeInteraction, team_id=None) -> dict:
+    asyncio.run(cog.ics_feed.callback(cog, inter, team_id=team_id))
+    return inter.sent
+
+
+@pytest.mark.parametrize(
+    "member_id, administrator, allowed",
+    [(10, False, True), (11, True, True), (11, False, False)],
+)
+def test_team_feed_needs_membership_or_admin(cog, member_id, administrator, allowed):
+    sent = feed_for(cog, FakeInteraction(member_id, administrator), TEAM_ID)
+    assert ("file" in sent) == allowed
+
+
+def test_own_feed_needs_no_team(cog):
+    sent = feed_for(cog, FakeInteraction(11))
+    assert sent["file"].filename == "timeclock-member-11.ics"
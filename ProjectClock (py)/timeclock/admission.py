@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from datetime import timedelta
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import disnake
+
+from timeclock import log
+from timeclock.metrics import Metrics
+
+__all__ = ("AdmissionController", "Overloaded", "Workload")
+
+logger = log.get_logger(__name__)
+
+# Discord's window for the first response to an interaction
+RESPONSE_WINDOW = timedelta(seconds=3)
+
+BUSY_MESSAGE = "⏳ الخادم مشغول حالياً بسبب كثرة الطلبات، يرجى المحاولة بعد قليل"
+
+
+class Workload(IntEnum):
+    """Priority classes of interaction work; lower values are admitted first"""
+
+    PUNCH = 0  # punch button clicks
+    READ = 1  # commands and buttons that look data up
+    HEAVY = 2  # reports, exports, analyses
+
+
+class Overloaded(Exception):
+    """Raised when work can't be admitted before its deadline"""
+
+
+class AdmissionController:
+    """Decides when interaction work may start, so punches keep being answered under load
+
+    Punches are always admitted at once. Other work is capped per class, and all classes share
+    `capacity` slots that punches take first, so a surge of punches holds reads and heavy work
+    back instead of the other way round. Waiting work is admitted by class, then in arrival
+    order. It waits until its deadline, derived from the interaction's expiry, and is shed with
+    `Overloaded` as soon as the time its class usually takes to free a slot shows it would
+    miss it.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int,
+        limits: Dict[Workload, int],
+        max_wait: float,
+        margin: float,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.limits = limits
+        self.max_wait = max_wait
+        self.margin = margin
+        self.metrics = metrics or Metrics()
+        self._running: Dict[Workload, int] = {workload: 0 for workload in Workload}
+        self._waiting: Dict[Workload, Deque[asyncio.Future]] = {
+            workload: deque() for workload in Workload
+        }
+        # moving average of how long each class holds a slot, in seconds
+        self._service: Dict[Workload, Optional[float]] = {workload: None for workload in Workload}
+
+        for workload in Workload:
+            name = workload.name.lower()
+            self.metrics.gauge(f"admission.{name}.running", lambda w=workload: self._running[w])
+            self.metrics.gauge(
+                f"admission.{name}.waiting", lambda w=workload: len(self._waiting[w])
+            )
+
+    def _can_run(self, workload: Workload) -> bool:
+        if workload is Workload.PUNCH:
+            return True
+        return (
+            self._running[workload] < self.limits[workload]
+            and sum(self._running.values()) < self.capacity
+        )
+
+    def _estimate(self, workload: Workload) -> float:
+        """Seconds until a new `workload` job would be admitted, from how long jobs take"""
+        service = self._service[workload]
+        if service is None:
+            return 0.0
+        return (len(self._waiting[workload]) + 1) * service / self.limits[workload]
+
+    def deadline_of(self, inter: disnake.Interaction) -> float:
+        """`time.monotonic()` by which work for `inter` has to start: before its first response
+        is due, or its token expires once it has one, leaving `margin` to answer in"""
+        if inter.response.is_done():
+            expires = inter.expires_at
+        else:
+            expires = inter.created_at + RESPONSE_WINDOW
+        remaining = (expires - disnake.utils.utcnow()).total_seconds() - self.margin
+        return time.monotonic() + min(remaining, self.max_wait)
+
+    async def _acquire(self, workload: Workload, deadline: Optional[float]) -> None:
+        name = workload.name.lower()
+        if not self._waiting[workload] and self._can_run(workload):
+            self._running[workload] += 1
+            self.metrics.incr(f"admission.{name}.admitted")
+            return
+
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self._estimate(workload) > timeout:
+                self.metrics.incr(f"admission.{name}.shed")
+                raise Overloaded(f"{workload.name} work would not start before its deadline")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting[workload].append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.metrics.incr(f"admission.{name}.shed")
+            raise Overloaded(f"{workload.name} work waited past its deadline") from None
+        except asyncio.CancelledError:
+            # admitted just as the caller was cancelled: give the slot back
+            if waiter.done() and not waiter.cancelled():
+                self._release(workload, None)
+            raise
+        finally:
+            if waiter in self._waiting[workload]:
+                self._waiting[workload].remove(waiter)
+            self.metrics.observe(f"admission.{name}.wait", time.perf_counter() - started)
+        self.metrics.incr(f"admission.{name}.admitted")
+
+    def _release(self, workload: Workload, held: Optional[float]) -> None:
+        self._running[workload] -= 1
+        if held is not None:
+            service = self._service[workload]
+            self._service[workload] = held if service is None else 0.8 * service + 0.2 * held
+
+        for waiting in (Workload.READ, Workload.HEAVY):
+            queue = self._waiting[waiting]
+            while queue and self._can_run(waiting):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._running[waiting] += 1
+                    waiter.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self, workload: Workload, deadline: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """Hold a `workload` slot; waits for one until `deadline` (`time.monotonic()`), or for as
+        long as it takes when there is none"""
+        await self._acquire(workload, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(workload, time.monotonic() - started)
+
+    def admit(self, workload: Workload, inter: disnake.Interaction):
+        """`slot` with the deadline of `inter`"""
+        return self.slot(workload, self.deadline_of(inter))
+
+    async def shed(self, inter: disnake.Interaction) -> None:
+        """Tell the member their request was dropped because the bot is busy"""
+        logger.warning(f"Shed an interaction of {inter.author.id} in {inter.guild_id}: overloaded")
+        try:
+            if inter.response.is_done():
+                await inter.followup.send(BUSY_MESSAGE, ephemeral=True)
+            else:
+                await inter.response.send_message(BUSY_MESSAGE, ephemeral=True)
+        except disnake.HTTPException:
+            pass
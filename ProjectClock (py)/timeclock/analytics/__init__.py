@@ -1,3 +1,10 @@
+from .compliance import ComplianceEngine, ComplianceSummary, DailyCompliance
 from .patterns import AttendancePattern, PatternAnalyzer
 
-__all__ = ['AttendancePattern', 'PatternAnalyzer']
\ No newline at end of file
+__all__ = [
+    'AttendancePattern',
+    'ComplianceEngine',
+    'ComplianceSummary',
+    'DailyCompliance',
+    'PatternAnalyzer',
+]
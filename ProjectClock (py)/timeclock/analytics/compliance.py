@@ -0,0 +1,232 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from timeclock.database.config import GuildConfig
+
+Session = Tuple[float, Optional[float]]
+Window = Tuple[float, float, date]
+
+
+@dataclass
+class DailyCompliance:
+    """Schedule compliance figures for one member on one scheduled day
+
+    All durations are in minutes. `day` is the date the schedule window starts on,
+    so an overnight shift is attributed to the day it begins.
+    """
+    member_id: int
+    day: date
+    scheduled_minutes: float = 0.0
+    covered_minutes: float = 0.0  # time worked inside the scheduled window
+    late_minutes: float = 0.0  # window start -> first punch inside the window
+    early_minutes: float = 0.0  # last punch out inside the window -> window end
+    overtime_minutes: float = 0.0  # time worked outside of any scheduled window
+    absent: bool = False  # a window was scheduled but no time was worked in it
+
+
+@dataclass
+class ComplianceSummary:
+    """Guild-wide totals built from a list of `DailyCompliance` records"""
+    scheduled_hours: float
+    covered_hours: float
+    overtime_hours: float
+    late_minutes: float
+    early_minutes: float
+    absences: int
+
+    @property
+    def compliance_rate(self) -> float:
+        if self.scheduled_hours <= 0:
+            return 1.0
+        return min(self.covered_hours / self.scheduled_hours, 1.0)
+
+
+class ComplianceEngine:
+    """Intersects actual work sessions with a guild's scheduled work hours
+
+    Scheduled windows are built once per period from `GuildConfig.work_hours` and every
+    member's sessions are swept against them, which keeps a whole guild at O(n log n) in the
+    number of sessions (the only sort is of each member's sessions).
+    """
+
+    def __init__(self, config: GuildConfig, tz: tzinfo = timezone.utc):
+        self.config = config
+        self.tz = tz
+
+    def build_windows(self, start: datetime, end: datetime) -> List[Window]:
+        """Return the scheduled windows clipped to `start`..`end`, sorted by start.
+
+        An end time earlier than (or equal to) the start time is treated as an overnight shift
+        that finishes on the following day. The day before `start` is included so that an
+        overnight shift spilling into the period is not lost.
+        """
+        windows = []
+        day = start.astimezone(self.tz).date() - timedelta(days=1)
+        last_day = end.astimezone(self.tz).date()
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+
+        while day <= last_day:
+            hours = self.config.get_work_hours(day.weekday())
+            if hours:
+                open_at = datetime.combine(day, hours[0], tzinfo=self.tz)
+                close_at = datetime.combine(day, hours[1], tzinfo=self.tz)
+                if close_at <= open_at:
+                    close_at += timedelta(days=1)
+
+                w_start, w_end = open_at.timestamp(), close_at.timestamp()
+                if w_end > start_ts and w_start < end_ts:
+                    windows.append((max(w_start, start_ts), min(w_end, end_ts), day))
+            day += timedelta(days=1)
+
+        windows.sort()
+        return windows
+
+    def analyze_sessions(
+        self,
+        member_id: int,
+        sessions: Iterable[Session],
+        windows: Sequence[Window],
+        *,
+        skip_days: Optional[Iterable[date]] = None,
+    ) -> List[DailyCompliance]:
+        """Compute per-day compliance for one member against pre-built `windows`
+
+        Open sessions (no punch out) are ignored, matching how reports treat them.
+        Days listed in `skip_days` (for example days on leave) are not counted as scheduled.
+        """
+        merged = _merge([(p_in, p_out) for p_in, p_out in sessions if p_out is not None])
+        skip = set(skip_days or ())
+        days: Dict[date, DailyCompliance] = {}
+
+        def record(day: date) -> DailyCompliance:
+            if day not in days:
+                days[day] = DailyCompliance(member_id=member_id, day=day)
+            return days[day]
+
+        # in-schedule figures, one pass over windows with a monotonic lower bound on sessions
+        lower = 0
+        for w_start, w_end, day in windows:
+            if day in skip:
+                continue
+
+            while lower < len(merged) and merged[lower][1] <= w_start:
+                lower += 1
+
+            covered = 0.0
+            first_in = last_out = None
+            i = lower
+            while i < len(merged) and merged[i][0] < w_end:
+                s_start, s_end = merged[i]
+                overlap = min(s_end, w_end) - max(s_start, w_start)
+                if overlap > 0:
+                    covered += overlap
+                    first_in = max(s_start, w_start) if first_in is None else first_in
+                    last_out = min(s_end, w_end)
+                i += 1
+
+            entry = record(day)
+            entry.scheduled_minutes += (w_end - w_start) / 60
+            entry.covered_minutes += covered / 60
+            if first_in is None:
+                entry.absent = True
+            else:
+                entry.late_minutes += (first_in - w_start) / 60
+                entry.early_minutes += (w_end - last_out) / 60
+
+        # out-of-schedule time, swept against the union of all windows
+        union = _merge([(w_start, w_end) for w_start, w_end, day in windows if day not in skip])
+        union_starts = [w[0] for w in union]
+        for s_start, s_end in merged:
+            inside = 0.0
+            j = max(bisect_left(union_starts, s_start) - 1, 0)
+            while j < len(union) and union[j][0] < s_end:
+                inside += max(0.0, min(s_end, union[j][1]) - max(s_start, union[j][0]))
+                j += 1
+
+            outside = (s_end - s_start) - inside
+            if outside > 0:
+                day = datetime.fromtimestamp(s_start, tz=self.tz).date()
+                record(day).overtime_minutes += outside / 60
+
+        return sorted(days.values(), key=lambda entry: entry.day)
+
+    def analyze_guild(
+        self,
+        member_sessions: Mapping[int, Iterable[Session]],
+        start: datetime,
+        end: datetime,
+        *,
+        skip_days: Optional[Mapping[int, Iterable[date]]] = None,
+    ) -> Dict[int, List[DailyCompliance]]:
+        """Compute per-day compliance for every member of a guild over `start`..`end`
+
+        `member_sessions` maps a member ID to its `(punch_in, punch_out)` timestamps. Sessions
+        are clipped to the period so figures only cover `start`..`end`.
+        """
+        windows = self.build_windows(start, end)
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        skip_days = skip_days or {}
+
+        results = {}
+        for member_id, sessions in member_sessions.items():
+            clipped = [
+                (max(p_in, start_ts), min(p_out, end_ts))
+                for p_in, p_out in sessions
+                if p_out is not None and p_out > start_ts and p_in < end_ts
+            ]
+            results[member_id] = self.analyze_sessions(
+                member_id, clipped, windows, skip_days=skip_days.get(member_id)
+            )
+
+        return results
+
+    def summarize_guild(
+        self,
+        member_sessions: Mapping[int, Iterable[Session]],
+        start: datetime,
+        end: datetime,
+        *,
+        skip_days: Optional[Mapping[int, Iterable[date]]] = None,
+    ) -> ComplianceSummary:
+        """`analyze_guild` followed by `summarize`, so only the totals cross a process boundary"""
+        return self.summarize(self.analyze_guild(member_sessions, start, end, skip_days=skip_days))
+
+    @staticmethod
+    def summarize(results: Mapping[int, List[DailyCompliance]]) -> ComplianceSummary:
+        """Reduce per-member results from `analyze_guild` to guild-wide totals"""
+        scheduled = covered = overtime = late = early = 0.0
+        absences = 0
+
+        for entries in results.values():
+            for entry in entries:
+                scheduled += entry.scheduled_minutes
+                covered += entry.covered_minutes
+                overtime += entry.overtime_minutes
+                late += entry.late_minutes
+                early += entry.early_minutes
+                absences += entry.absent
+
+        return ComplianceSummary(
+            scheduled_hours=scheduled / 60,
+            covered_hours=covered / 60,
+            overtime_hours=overtime / 60,
+            late_minutes=late,
+            early_minutes=early,
+            absences=absences,
+        )
+
+
+def _merge(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Sort and merge overlapping `(start, end)` intervals"""
+    merged: List[Tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
@@ -1,7 +1,7 @@
 import os
 from datetime import datetime
 from sys import version as sys_version
-from typing import Sequence, Union, overload
+from typing import Callable, Sequence, Union, overload
 
 import disnake
 from disnake import __version__ as disnake_version
@@ -11,11 +11,36 @@ from sqlalchemy import select
 
 from timeclock import __version__ as bot_version
 from timeclock import log
-from timeclock.constants import Database
+from timeclock.admission import AdmissionController, Overloaded, Workload
+from timeclock.cache import (
+    ChannelCache,
+    LeaveCache,
+    MemberNameCache,
+    NameIndex,
+    OnDutyIndex,
+    TeamCache,
+)
+from timeclock.cluster import Cluster, FileLease, Lease, MongoLease, process_id
+from timeclock.constants import (
+    Admission,
+    Database,
+    Executor,
+    Leader,
+    Leaves,
+    Roster,
+    Sharding,
+)
+from timeclock.database.config import GuildConfig
 from timeclock.database.mongodb import MongoDB
 from timeclock.database import Guild, Role, Member, Time
+from timeclock.executor import ExecutorService
+from timeclock.metrics import Metrics
+from timeclock.outbound import OutboundQueue
+from timeclock.roster import LiveRoster
+from timeclock.router import ComponentRouter
+from timeclock.shards import ShardTracker
 
-__all__ = ("TimeClockBot",)
+__all__ = ("TimeClockBot", "ShardedTimeClockBot", "create_bot")
 
 logger = log.get_logger(__name__)
 
@@ -23,12 +48,53 @@ logger = log.get_logger(__name__)
 class TimeClockBot(commands.InteractionBot):
     """Base bot instance"""
 
+    sharded = False
+
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
         self.db = MongoDB(Database.mongodb_uri)
+        self.guild_configs: dict[int, GuildConfig] = {}
+        self.team_cache = TeamCache(self.db)
+        self.leave_cache = LeaveCache(self.db, annual_days=Leaves.annual_days)
+        self.channel_cache = ChannelCache(self.db)
+        # configured role ID -> role name, per guild, for role autocompletes
+        self.role_names: dict[int, NameIndex[int]] = {}
+        self.member_names = MemberNameCache(self.db.get_member_ids)
+        # guild_id -> IDs of the mod roles, which may punch and manage the bot
+        self.mod_roles: dict[int, frozenset[int]] = {}
+        self.metrics = Metrics()
+        self.shard_tracker = ShardTracker(self)
+        self.cluster = Cluster(
+            self._create_lease(), ttl=Leader.ttl, renew=Leader.ttl / 4, metrics=self.metrics
+        )
+        # index builds are left to one process of the cluster
+        self.cluster.on_elected(self.db.init_collections)
+        self.roster = LiveRoster(self, interval=Roster.interval)
+        self.on_duty = OnDutyIndex(self.db.get_on_duty, on_change=self.roster.touch)
+        self.executor = ExecutorService(
+            cpu_workers=Executor.cpu_workers,
+            io_workers=Executor.io_workers,
+            max_queued=Executor.max_queued,
+            metrics=self.metrics,
+        )
+        self.outbound = OutboundQueue(metrics=self.metrics)
+        self.admission = AdmissionController(
+            capacity=Admission.capacity,
+            limits={Workload.READ: Admission.read_limit, Workload.HEAVY: Admission.heavy_limit},
+            max_wait=Admission.max_wait,
+            margin=Admission.margin_ms / 1000,
+            metrics=self.metrics,
+        )
+        # page kind -> async (inter, params) -> PageSource, for stateless page buttons
+        self.page_sources: dict[str, Callable] = {}
+        self.router = ComponentRouter(self.metrics, self.admission)
 
     async def on_ready(self) -> None:
-        await self.db.init_collections()
+        if not self.sharded:
+            self.shard_tracker.connected(0)
+        # only the guilds that aren't loaded yet, so a reconnect costs nothing
+        await self.on_duty.preload(self.db.get_all_on_duty, (guild.id for guild in self.guilds))
+        await self.roster.load()
         logger.info(
             "----------------------------------------------------------------------\n"
             f'Bot started at: {datetime.now().strftime("%m/%d/%Y - %H:%M:%S")}\n'
@@ -39,6 +105,147 @@ class TimeClockBot(commands.InteractionBot):
             "----------------------------------------------------------------------\n"
         )
 
+    # an unsharded bot is shard 0; a sharded one reports each shard, below
+    async def on_disconnect(self) -> None:
+        if not self.sharded:
+            self.shard_tracker.disconnected(0)
+
+    async def on_resumed(self) -> None:
+        if not self.sharded:
+            self.shard_tracker.connected(0)
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        self.shard_tracker.connected(shard_id)
+
+    async def on_shard_resumed(self, shard_id: int) -> None:
+        self.shard_tracker.connected(shard_id)
+
+    async def on_shard_disconnect(self, shard_id: int) -> None:
+        self.shard_tracker.disconnected(shard_id)
+
+    async def on_application_command(self, inter: disnake.ApplicationCommandInteraction) -> None:
+        try:
+            async with self.admission.admit(self.get_workload(inter), inter):
+                await self.process_application_commands(inter)
+        except Overloaded:
+            await self.admission.shed(inter)
+
+    def get_workload(self, inter: disnake.ApplicationCommandInteraction) -> Workload:
+        """The admission class of the invoked slash command
+
+        Set with `extras={"workload": ...}` on the command or sub-command, either a `Workload`
+        or a function of the interaction returning one; READ by default.
+        """
+        command = self.all_slash_commands.get(inter.data.name)
+        if command is None or inter.data.type is not disnake.ApplicationCommandType.chat_input:
+            return Workload.READ
+
+        # the invoked sub-command's setting wins over its group's and command's
+        workload = command.extras.get("workload", Workload.READ)
+        options = inter.data.options
+        while options and options[0].type in (
+            disnake.OptionType.sub_command,
+            disnake.OptionType.sub_command_group,
+        ):
+            command = command.children.get(options[0].name)
+            if command is None:
+                break
+            workload = command.extras.get("workload", workload)
+            options = options[0].options
+
+        return workload(inter) if callable(workload) else workload
+
+    async def on_button_click(self, inter: disnake.MessageInteraction) -> None:
+        await self.router.dispatch(inter)
+
+    # anything that can change which channels the bot may post in drops the guild's channel cache
+    async def on_guild_channel_delete(self, channel: disnake.abc.GuildChannel) -> None:
+        self.channel_cache.invalidate(channel.guild.id)
+
+    async def on_guild_channel_update(
+        self, before: disnake.abc.GuildChannel, after: disnake.abc.GuildChannel
+    ) -> None:
+        self.channel_cache.invalidate(after.guild.id)
+
+    async def on_guild_channel_create(self, channel: disnake.abc.GuildChannel) -> None:
+        self.channel_cache.invalidate(channel.guild.id)
+
+    async def on_guild_role_update(self, before: disnake.Role, after: disnake.Role) -> None:
+        self.channel_cache.invalidate(after.guild.id)
+        role_names = self.role_names.get(after.guild.id)
+        if role_names is not None and after.id in role_names:
+            role_names.set(after.id, after.name)
+
+    async def on_guild_role_delete(self, role: disnake.Role) -> None:
+        self.channel_cache.invalidate(role.guild.id)
+        role_names = self.role_names.get(role.guild.id)
+        if role_names is not None:
+            role_names.remove(role.id)
+
+    async def on_member_update(self, before: disnake.Member, after: disnake.Member) -> None:
+        if after.id == self.user.id:
+            self.channel_cache.invalidate(after.guild.id)
+        if before.display_name != after.display_name:
+            self.member_names.update(after)
+
+    async def on_user_update(self, before: disnake.User, after: disnake.User) -> None:
+        if before.name == after.name and before.global_name == after.global_name:
+            return
+        for guild in after.mutual_guilds:
+            if (member := guild.get_member(after.id)) is not None:
+                self.member_names.update(member)
+
+    async def on_member_join(self, member: disnake.Member) -> None:
+        self.member_names.update(member)
+
+    async def on_member_remove(self, member: disnake.Member) -> None:
+        self.member_names.remove(member.guild.id, member.id)
+
+    async def on_guild_remove(self, guild: disnake.Guild) -> None:
+        self.channel_cache.forget(guild.id)
+        self.role_names.pop(guild.id, None)
+        self.member_names.forget(guild.id)
+        self.mod_roles.pop(guild.id, None)
+        self.on_duty.forget(guild.id)
+        self.roster.forget(guild.id)
+
+    async def on_slash_command_error(
+        self, inter: disnake.ApplicationCommandInteraction, error: commands.CommandError
+    ) -> None:
+        # raised by the member option converter
+        if isinstance(error, commands.MemberNotFound) and not inter.response.is_done():
+            await inter.response.send_message(
+                f"❌ لم يتم العثور على العضو `{error.argument}`", ephemeral=True
+            )
+            return
+        await super().on_slash_command_error(inter, error)
+
+    def _create_lease(self) -> Lease | None:
+        if Leader.lease == "mongo":
+            return MongoLease(self.db.db.leases, "leader", process_id(), Leader.ttl)
+        if Leader.lease == "file":
+            return FileLease(Leader.lock_file)
+        if Leader.lease:
+            raise ValueError(f"Unknown TIMECLOCK_CLUSTER_LEASE `{Leader.lease}`, use mongo or file")
+        return None
+
+    async def login(self, token: str) -> None:
+        await super().login(token)
+        await self.cluster.start()
+
+    async def close(self) -> None:
+        await self.cluster.close()
+        self.roster.close()
+        await self.outbound.aclose()
+        self.executor.shutdown()
+        await super().close()
+
+    def get_guild_config(self, guild_id: int) -> GuildConfig:
+        """Return the guild's config, shared by every cog that reads or edits it"""
+        if guild_id not in self.guild_configs:
+            self.guild_configs[guild_id] = GuildConfig(guild_id)
+        return self.guild_configs[guild_id]
+
     def load_extensions(self) -> None:
         """Load all extensions available in 'cogs' directory"""
         try:
@@ -99,6 +306,23 @@ class TimeClockBot(commands.InteractionBot):
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    async def get_mod_role_ids(self, guild_id: int) -> frozenset[int]:
+        """IDs of the guild's mod roles; queried once, then kept until a role is added or removed"""
+        if guild_id not in self.mod_roles:
+            roles = await self.get_guild_roles(guild_id, is_mod=True)
+            self.mod_roles[guild_id] = frozenset(role.id for role in roles)
+        return self.mod_roles[guild_id]
+
+    async def get_role_names(self, guild: disnake.Guild) -> NameIndex[int]:
+        """The guild's configured roles that still exist, by name; loaded from the database once"""
+        if guild.id not in self.role_names:
+            role_names = NameIndex()
+            for role in await self.get_guild_roles(guild.id):
+                if (guild_role := guild.get_role(role.id)) is not None:
+                    role_names.set(role.id, guild_role.name)
+            self.role_names[guild.id] = role_names
+        return self.role_names[guild.id]
+
     async def add_role(
         self,
         role_id: int,
@@ -125,7 +349,12 @@ class TimeClockBot(commands.InteractionBot):
 
             await trans.commit()
 
-            return role
+        self.mod_roles.pop(guild_id, None)
+        role_names = self.role_names.get(guild_id)
+        guild = self.get_guild(guild_id)
+        if role_names is not None and guild and (guild_role := guild.get_role(role_id)):
+            role_names.set(role_id, guild_role.name)
+        return role
 
     async def delete_role(self, role_id: int) -> None:
         session = self.db()
@@ -141,6 +370,10 @@ class TimeClockBot(commands.InteractionBot):
             await session.delete(role)
             await trans.commit()
 
+        self.mod_roles.pop(role.guild_id, None)
+        if role.guild_id in self.role_names:
+            self.role_names[role.guild_id].remove(role_id)
+
     async def ensure_member(self, guild_id: int, member_id: int, session: AsyncSession) -> Member:
         result = await session.execute(select(Member).where(Member.id == member_id))
         member = result.scalar_one_or_none()
@@ -151,6 +384,10 @@ class TimeClockBot(commands.InteractionBot):
             await session.flush()
             await session.refresh(member)
 
+        self.team_cache.invalidate_member(guild_id, member_id)
+        guild = self.get_guild(guild_id)
+        if guild and (guild_member := guild.get_member(member_id)):
+            self.member_names.add(guild_member)
         return member
 
     async def add_punch(self, guild_id: int, member_id: int, timestamp: float) -> Member:
@@ -170,6 +407,10 @@ class TimeClockBot(commands.InteractionBot):
             await session.flush()
             await session.refresh(member)
 
+        self.team_cache.invalidate_member(guild_id, member_id)
+        guild = self.get_guild(guild_id)
+        if guild and (guild_member := guild.get_member(member_id)):
+            self.member_names.add(guild_member)
         return member
 
     @overload
@@ -194,3 +435,18 @@ class TimeClockBot(commands.InteractionBot):
                 return result.scalar_one_or_none()
 
             return result.scalars().all()
+
+
+class ShardedTimeClockBot(TimeClockBot, commands.AutoShardedInteractionBot):
+    """The bot over several gateway connections; background jobs run per shard"""
+
+    sharded = True
+
+
+def create_bot(**kwargs) -> TimeClockBot:
+    """The bot, auto-sharded when `TIMECLOCK_SHARDED` or `TIMECLOCK_SHARD_IDS` is set"""
+    if Sharding.enabled:
+        return ShardedTimeClockBot(
+            shard_count=Sharding.shard_count, shard_ids=Sharding.shard_ids, **kwargs
+        )
+    return TimeClockBot(**kwargs)
@@ -0,0 +1,19 @@
+from .channels import CHANNEL_KINDS, ChannelCache
+from .duty import OnDutyIndex
+from .intervals import IntervalTree
+from .leaves import LeaveCache
+from .members import MemberNameCache
+from .names import NameIndex
+from .teams import TeamAggregate, TeamCache
+
+__all__ = (
+    "CHANNEL_KINDS",
+    "ChannelCache",
+    "IntervalTree",
+    "LeaveCache",
+    "MemberNameCache",
+    "OnDutyIndex",
+    "NameIndex",
+    "TeamAggregate",
+    "TeamCache",
+)
@@ -0,0 +1,80 @@
+from typing import Dict, Optional, Tuple
+
+import disnake
+
+from timeclock.database.mongodb import MongoDB
+
+__all__ = ("CHANNEL_KINDS", "ChannelCache")
+
+# report: scheduled attendance reports, alert: overtime alerts, leave: leave requests for mods
+CHANNEL_KINDS = ("report", "alert", "leave")
+
+REQUIRED_PERMISSIONS = disnake.Permissions(view_channel=True, send_messages=True, embed_links=True)
+
+
+class ChannelCache:
+    """Resolves the channel each kind of bot message goes to, once per guild
+
+    A configured channel is used when the bot can post in it. Otherwise the old heuristic
+    applies: the first channel named like "admin"/"mod" for leave requests, the first postable
+    channel for everything else. Results, including "no channel", stay cached until a channel,
+    role or the bot's own member changes in that guild, so hot loops never scan
+    `guild.text_channels` or compute permissions.
+    """
+
+    def __init__(self, db: MongoDB) -> None:
+        self.db = db
+        self._configured: Dict[int, Dict[str, Optional[int]]] = {}
+        self._resolved: Dict[Tuple[int, str], Optional[disnake.TextChannel]] = {}
+
+    async def _get_configured(self, guild_id: int) -> Dict[str, Optional[int]]:
+        if guild_id not in self._configured:
+            doc = await self.db.get_guild(guild_id)
+            self._configured[guild_id] = dict((doc or {}).get("channels") or {})
+        return self._configured[guild_id]
+
+    async def configured(self, guild_id: int, kind: str) -> Optional[int]:
+        return (await self._get_configured(guild_id)).get(kind)
+
+    async def get(self, guild: disnake.Guild, kind: str) -> Optional[disnake.TextChannel]:
+        """The channel to send `kind` messages to, or None if the bot can't post anywhere"""
+        key = (guild.id, kind)
+        if key not in self._resolved:
+            self._resolved[key] = self._resolve(guild, kind, await self.configured(guild.id, kind))
+        return self._resolved[key]
+
+    @staticmethod
+    def _usable(guild: disnake.Guild, channel: Optional[disnake.abc.GuildChannel]) -> bool:
+        return (
+            isinstance(channel, disnake.TextChannel)
+            and channel.permissions_for(guild.me) >= REQUIRED_PERMISSIONS
+        )
+
+    def _resolve(
+        self, guild: disnake.Guild, kind: str, channel_id: Optional[int]
+    ) -> Optional[disnake.TextChannel]:
+        if channel_id:
+            channel = guild.get_channel(channel_id)
+            if self._usable(guild, channel):
+                return channel
+
+        for channel in guild.text_channels:
+            if not self._usable(guild, channel):
+                continue
+            if kind != "leave" or "admin" in channel.name.lower() or "mod" in channel.name.lower():
+                return channel
+        return None
+
+    async def set(self, guild_id: int, kind: str, channel_id: Optional[int]) -> None:
+        await self.db.set_guild_channel(guild_id, kind, channel_id)
+        (await self._get_configured(guild_id))[kind] = channel_id
+        self._resolved.pop((guild_id, kind), None)
+
+    def invalidate(self, guild_id: int) -> None:
+        """Forget the resolved channels of a guild; they are resolved again on next use"""
+        for kind in CHANNEL_KINDS:
+            self._resolved.pop((guild_id, kind), None)
+
+    def forget(self, guild_id: int) -> None:
+        self.invalidate(guild_id)
+        self._configured.pop(guild_id, None)
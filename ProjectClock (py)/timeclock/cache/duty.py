@@ -0,0 +1,88 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+__all__ = ("OnDutyIndex",)
+
+
+class OnDutyIndex:
+    """Who is on duty in each guild, and since when, kept in memory
+
+    Every guild is loaded at startup with `preload`, or on first use through `load` (member ID
+    -> open punch-in timestamp). A punch is then decided here, without waiting on the database;
+    the caller persists it afterwards and calls `set` to roll back or reconcile if the database
+    disagrees. `on_change(guild_id)` is called whenever a guild's roster changes.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[int], Awaitable[Dict[int, float]]],
+        *,
+        on_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self._load = load
+        self.on_change = on_change
+        self._guilds: Dict[int, Dict[int, float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _changed(self, guild_id: int) -> None:
+        if self.on_change is not None:
+            self.on_change(guild_id)
+
+    async def preload(
+        self,
+        load_all: Callable[[], Awaitable[Dict[int, Dict[int, float]]]],
+        guild_ids: Iterable[int],
+    ) -> None:
+        """Load every guild in `guild_ids` that isn't loaded yet with a single `load_all` query
+
+        Guilds loaded in the meantime keep their roster, which may already hold newer punches.
+        """
+        missing = [guild_id for guild_id in guild_ids if guild_id not in self._guilds]
+        if not missing:
+            return
+
+        rosters = await load_all()
+        for guild_id in missing:
+            self._guilds.setdefault(guild_id, dict(rosters.get(guild_id, {})))
+
+    async def get(self, guild_id: int) -> Dict[int, float]:
+        """Member ID -> punch-in timestamp of everyone on duty; don't modify it"""
+        if guild_id in self._guilds:
+            return self._guilds[guild_id]
+
+        async with self._locks.setdefault(guild_id, asyncio.Lock()):
+            if guild_id not in self._guilds:
+                self._guilds[guild_id] = dict(await self._load(guild_id))
+            return self._guilds[guild_id]
+
+    async def punch_in_of(self, guild_id: int, member_id: int) -> Optional[float]:
+        return (await self.get(guild_id)).get(member_id)
+
+    async def count(self, guild_id: int) -> int:
+        return len(await self.get(guild_id))
+
+    async def toggle(self, guild_id: int, member_id: int, timestamp: float) -> Optional[float]:
+        """Punch the member in or out at `timestamp`
+
+        Returns None if they are now punched in, otherwise the punch-in that was just closed.
+        """
+        on_duty = await self.get(guild_id)
+        punch_in = on_duty.pop(member_id, None)
+        if punch_in is None:
+            on_duty[member_id] = timestamp
+        self._changed(guild_id)
+        return punch_in
+
+    def set(self, guild_id: int, member_id: int, punch_in: Optional[float]) -> None:
+        """Record the member as on duty since `punch_in`, or off duty when it is None"""
+        on_duty = self._guilds.get(guild_id)
+        if on_duty is None or on_duty.get(member_id) == punch_in:
+            return
+        if punch_in is None:
+            on_duty.pop(member_id, None)
+        else:
+            on_duty[member_id] = punch_in
+        self._changed(guild_id)
+
+    def forget(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
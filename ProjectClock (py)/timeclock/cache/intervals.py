@@ -0,0 +1,125 @@
+import random
+from typing import Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+__all__ = ("IntervalTree",)
+
+T = TypeVar("T", bound=Hashable)
+
+# (start, end, insertion order), so equal intervals still have distinct keys
+_Key = Tuple[int, int, int]
+
+
+class _Node:
+    __slots__ = ("key", "value", "priority", "max_end", "left", "right")
+
+    def __init__(self, key: _Key, value) -> None:
+        self.key = key
+        self.value = value
+        self.priority = random.random()
+        self.max_end = key[1]
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+
+    def update(self) -> None:
+        max_end = self.key[1]
+        if self.left is not None and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+
+def _split(node: Optional[_Node], key: _Key) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Split into nodes with keys < `key` and nodes with keys >= `key`"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """Merge two treaps where every key in `left` is smaller than every key in `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+class IntervalTree(Generic[T]):
+    """Half-open integer intervals `[start, end)` with a value each
+
+    A treap ordered by start, where every node also stores the largest end in its subtree.
+    Updates are O(log n) expected and overlap queries O(log n + k) for k results: subtrees
+    whose largest end is before the query are skipped, and so is everything right of a node
+    that starts after the query ends.
+    """
+
+    def __init__(self) -> None:
+        self._root: Optional[_Node] = None
+        self._keys: Dict[T, _Key] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, value: T) -> bool:
+        return value in self._keys
+
+    def add(self, start: int, end: int, value: T) -> None:
+        """Add `value` over `[start, end)`, replacing its previous interval if it had one"""
+        self.remove(value)
+        self._counter += 1
+        key = (start, end, self._counter)
+        self._keys[value] = key
+
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, value)), right)
+
+    def remove(self, value: T) -> bool:
+        key = self._keys.pop(value, None)
+        if key is None:
+            return False
+
+        left, rest = _split(self._root, key)
+        _, right = _split(rest, (key[0], key[1], key[2] + 1))
+        self._root = _merge(left, right)
+        return True
+
+    def overlapping(self, start: int, end: int) -> List[T]:
+        """Values whose interval overlaps `[start, end)`, ordered by start"""
+        found = []
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            # go left as far as the left subtree can still reach past `start`
+            while node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+
+            node = stack.pop()
+            if node.key[0] >= end:
+                # this node and everything to its right start too late
+                break
+            if node.key[1] > start:
+                found.append(node.value)
+            node = node.right
+
+        return found
+
+    def at(self, point: int) -> List[T]:
+        """Values whose interval contains `point`"""
+        return self.overlapping(point, point + 1)
@@ -0,0 +1,149 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from timeclock.cache.intervals import IntervalTree
+from timeclock.database.leave import APPROVED, DENIED, PENDING, Leave
+from timeclock.database.mongodb import MongoDB
+
+__all__ = ("LeaveCache",)
+
+
+@dataclass
+class _GuildLeaves:
+    leaves: Dict[int, Leave] = field(default_factory=dict)
+    # pending and approved leaves, over day ordinals
+    tree: IntervalTree[int] = field(default_factory=IntervalTree)
+    # (member_id, year) -> approved leave days
+    used: Dict[Tuple[int, int], int] = field(default_factory=dict)
+
+
+class LeaveCache:
+    """Per-guild leave store backed by the `leaves` and `leave_balances` collections
+
+    Pending and approved leaves of a guild are loaded once into an interval tree, so "who is
+    on leave on this day" and "does this request overlap" are O(log n + k). Used days are a
+    per-member, per-year counter incremented when a leave is approved.
+    """
+
+    def __init__(self, db: MongoDB, *, annual_days: int = 30) -> None:
+        self.db = db
+        self.annual_days = annual_days
+        self._guilds: Dict[int, _GuildLeaves] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # serialises the overlap check and insert of requests within a guild
+        self._write_locks: Dict[int, asyncio.Lock] = {}
+
+    async def _ensure_loaded(self, guild_id: int) -> _GuildLeaves:
+        if guild_id in self._guilds:
+            return self._guilds[guild_id]
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            if guild_id in self._guilds:
+                return self._guilds[guild_id]
+
+            guild = _GuildLeaves()
+            for doc in await self.db.get_leaves(guild_id, (PENDING, APPROVED)):
+                self._index(guild, Leave.from_dict(doc))
+            for doc in await self.db.get_leave_balances(guild_id):
+                guild.used[(doc["member_id"], doc["year"])] = doc["used_days"]
+
+            self._guilds[guild_id] = guild
+            return guild
+
+    @staticmethod
+    def _index(guild: _GuildLeaves, leave: Leave) -> None:
+        guild.leaves[leave.id] = leave
+        guild.tree.add(leave.start.toordinal(), leave.end.toordinal(), leave.id)
+
+    @staticmethod
+    def _unindex(guild: _GuildLeaves, leave: Leave) -> None:
+        guild.leaves.pop(leave.id, None)
+        guild.tree.remove(leave.id)
+
+    async def overlapping(self, guild_id: int, start: date, end: date,
+                          *, member_id: Optional[int] = None,
+                          status: Optional[str] = None) -> List[Leave]:
+        """Pending and approved leaves overlapping `start`..`end` (exclusive)"""
+        guild = await self._ensure_loaded(guild_id)
+        leaves = [
+            guild.leaves[leave_id]
+            for leave_id in guild.tree.overlapping(start.toordinal(), end.toordinal())
+        ]
+        return [
+            leave for leave in leaves
+            if (member_id is None or leave.member_id == member_id)
+            and (status is None or leave.status == status)
+        ]
+
+    async def on_leave(self, guild_id: int, day: date) -> Set[int]:
+        """IDs of the members on approved leave on `day`"""
+        leaves = await self.overlapping(guild_id, day, day + timedelta(days=1), status=APPROVED)
+        return {leave.member_id for leave in leaves}
+
+    async def leave_days(self, guild_id: int, start: date, end: date) -> Dict[int, Set[date]]:
+        """Approved leave days within `start`..`end` (exclusive) for every member with any"""
+        days: Dict[int, Set[date]] = {}
+        for leave in await self.overlapping(guild_id, start, end, status=APPROVED):
+            member_days = days.setdefault(leave.member_id, set())
+            day = max(leave.start, start)
+            while day < min(leave.end, end):
+                member_days.add(day)
+                day += timedelta(days=1)
+        return days
+
+    async def pending(self, guild_id: int, member_id: int) -> List[Leave]:
+        guild = await self._ensure_loaded(guild_id)
+        return sorted(
+            (leave for leave in guild.leaves.values()
+             if leave.member_id == member_id and leave.status == PENDING),
+            key=lambda leave: leave.start
+        )
+
+    async def used_days(self, guild_id: int, member_id: int, year: int) -> int:
+        guild = await self._ensure_loaded(guild_id)
+        return guild.used.get((member_id, year), 0)
+
+    async def request(self, guild_id: int, member_id: int, start: date, end: date,
+                      reason: Optional[str] = None, *,
+                      approved_by: Optional[int] = None) -> Tuple[Optional[Leave], List[Leave]]:
+        """Store a new leave unless it overlaps one of the member's pending or approved leaves
+
+        With `approved_by` the leave is approved straight away. Returns the new leave (None if
+        refused) and the leaves it conflicts with.
+        """
+        guild = await self._ensure_loaded(guild_id)
+        async with self._write_locks.setdefault(guild_id, asyncio.Lock()):
+            conflicts = await self.overlapping(guild_id, start, end, member_id=member_id)
+            if conflicts:
+                return None, conflicts
+
+            leave = Leave(0, guild_id, member_id, start, end, reason)
+            leave.id = (await self.db.create_leave(leave.to_dict()))["id"]
+            self._index(guild, leave)
+
+        if approved_by is not None:
+            leave = await self.decide(guild_id, leave.id, APPROVED, approved_by)
+        return leave, []
+
+    async def decide(self, guild_id: int, leave_id: int, status: str, decided_by: int) -> Optional[Leave]:
+        """Approve or deny a pending leave; None if it isn't pending anymore"""
+        guild = await self._ensure_loaded(guild_id)
+        doc = await self.db.set_leave_status(guild_id, leave_id, status, decided_by, current=PENDING)
+        if doc is None:
+            return None
+
+        leave = Leave.from_dict(doc)
+        if status == DENIED:
+            self._unindex(guild, leave)
+            return leave
+
+        self._index(guild, leave)
+        days_per_year = leave.days_per_year()
+        await self.db.add_leave_days(guild_id, leave.member_id, days_per_year)
+        for year, days in days_per_year.items():
+            key = (leave.member_id, year)
+            guild.used[key] = guild.used.get(key, 0) + days
+        return leave
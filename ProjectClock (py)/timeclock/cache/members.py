@@ -0,0 +1,127 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import disnake
+from rapidfuzz import fuzz
+
+from timeclock.cache.names import NameIndex
+
+__all__ = ("MemberNameCache",)
+
+# display name, username and global name; nickname is the display name when set
+NAME_SLOTS = 3
+
+
+class MemberNameCache:
+    """Names of the members with timeclock records, per guild, for member autocompletes
+
+    A guild's member IDs are loaded once through `load_ids`; after that the index follows member
+    joins, leaves, renames and first punches, so an autocomplete never touches the database.
+    Every name is a separate entry keyed by `(member_id, slot)` and scored with `partial_ratio`,
+    which favours what users type (the start of any of the names) and stays cheap on large
+    guilds.
+    """
+
+    def __init__(self, load_ids: Callable[[int], Awaitable[Iterable[int]]]) -> None:
+        self._load_ids = load_ids
+        self._indexes: Dict[int, NameIndex[Tuple[int, int]]] = {}
+        # guild_id -> IDs of the members with records, including ones not in the guild anymore
+        self._records: Dict[int, Set[int]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def _ensure_loaded(self, guild: disnake.Guild) -> NameIndex[Tuple[int, int]]:
+        if guild.id in self._indexes:
+            return self._indexes[guild.id]
+
+        async with self._locks.setdefault(guild.id, asyncio.Lock()):
+            if guild.id in self._indexes:
+                return self._indexes[guild.id]
+
+            records = set(await self._load_ids(guild.id))
+            index = NameIndex(scorer=fuzz.partial_ratio)
+            for member_id in records:
+                if (member := guild.get_member(member_id)) is not None:
+                    self._set(index, member)
+
+            self._records[guild.id] = records
+            self._indexes[guild.id] = index
+            return index
+
+    @staticmethod
+    def _set(index: NameIndex[Tuple[int, int]], member: disnake.Member) -> None:
+        names = [
+            name
+            for name in dict.fromkeys((member.display_name, member.name, member.global_name))
+            if name
+        ]
+        for slot in range(NAME_SLOTS):
+            if slot < len(names):
+                index.set((member.id, slot), names[slot])
+            else:
+                index.remove((member.id, slot))
+
+    @staticmethod
+    def _unset(index: NameIndex[Tuple[int, int]], member_id: int) -> None:
+        for slot in range(NAME_SLOTS):
+            index.remove((member_id, slot))
+
+    def add(self, member: disnake.Member) -> None:
+        """Index a member who just got a timeclock record"""
+        index = self._indexes.get(member.guild.id)
+        if index is not None and member.id not in self._records[member.guild.id]:
+            self._records[member.guild.id].add(member.id)
+            self._set(index, member)
+
+    def update(self, member: disnake.Member) -> None:
+        """Reindex a member's names after a rename, or after they (re)joined"""
+        index = self._indexes.get(member.guild.id)
+        if index is not None and member.id in self._records[member.guild.id]:
+            self._set(index, member)
+
+    def remove(self, guild_id: int, member_id: int) -> None:
+        """Drop a member who left; they are indexed again if they rejoin"""
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            self._unset(index, member_id)
+
+    def forget(self, guild_id: int) -> None:
+        self._indexes.pop(guild_id, None)
+        self._records.pop(guild_id, None)
+
+    async def search(
+        self, guild: disnake.Guild, query: str, limit: int = 25
+    ) -> List[disnake.Member]:
+        """The members best matching `query` on any of their names, best first"""
+        index = await self._ensure_loaded(guild)
+
+        members: Dict[int, disnake.Member] = {}
+        for (member_id, _), _ in index.search(query, limit * NAME_SLOTS):
+            if member_id not in members and (member := guild.get_member(member_id)) is not None:
+                members[member_id] = member
+                if len(members) == limit:
+                    break
+        return list(members.values())
+
+    async def autocomplete(self, guild: disnake.Guild, query: str) -> Dict[str, str]:
+        """Autocomplete choices: "display name (username)" -> member ID"""
+        return {
+            f"{member.display_name} ({member.name})"[:100]: str(member.id)
+            for member in await self.search(guild, query)
+        }
+
+    async def resolve(self, guild: disnake.Guild, value: str) -> Optional[disnake.Member]:
+        """The member an autocompleted value (an ID), a mention or an exactly typed name refers to
+
+        Typed names have to match one of the member's names exactly (ignoring case); a fuzzy
+        guess could pick the wrong member.
+        """
+        value = value.strip()
+        member_id = value.strip("<@!>")
+        if member_id.isdigit():
+            return guild.get_member(int(member_id))
+
+        for member in await self.search(guild, value, limit=5):
+            names = (member.display_name, member.name, member.global_name)
+            if value.lower() in (name.lower() for name in names if name):
+                return member
+        return None
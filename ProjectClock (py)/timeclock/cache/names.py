@@ -0,0 +1,87 @@
+from typing import Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from rapidfuzz import fuzz, process, utils
+
+__all__ = ("NameIndex",)
+
+K = TypeVar("K", bound=Hashable)
+
+
+class NameIndex(Generic[K]):
+    """In-memory fuzzy lookup of names by key, for autocompletes
+
+    Names are preprocessed (lowercased, stripped of punctuation) once when they are set, so a
+    search is a single RapidFuzz `process.extract` over the stored strings, done in C. Keys and
+    names live in parallel lists; removal swaps the last entry into the gap, so updates are O(1).
+    """
+
+    def __init__(self, *, scorer=fuzz.WRatio) -> None:
+        self.scorer = scorer
+        self._keys: List[K] = []
+        self._names: List[str] = []
+        self._processed: List[str] = []
+        self._positions: Dict[K, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._positions
+
+    def get(self, key: K) -> Optional[str]:
+        position = self._positions.get(key)
+        return None if position is None else self._names[position]
+
+    def set(self, key: K, name: str) -> None:
+        """Add `key`, or rename it"""
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._names.append(name)
+            self._processed.append(utils.default_process(name))
+        else:
+            self._names[position] = name
+            self._processed[position] = utils.default_process(name)
+
+    def remove(self, key: K) -> bool:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return False
+
+        last = len(self._keys) - 1
+        if position != last:
+            self._keys[position] = self._keys[last]
+            self._names[position] = self._names[last]
+            self._processed[position] = self._processed[last]
+            self._positions[self._keys[position]] = position
+        self._keys.pop()
+        self._names.pop()
+        self._processed.pop()
+        return True
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._names.clear()
+        self._processed.clear()
+        self._positions.clear()
+
+    def search(self, query: str, limit: int = 25, score_cutoff: float = 0) -> List[Tuple[K, str]]:
+        """The `limit` best matching `(key, name)` pairs, best first
+
+        An empty query returns the first names in alphabetical order.
+        """
+        query = utils.default_process(query)
+        if not query:
+            order = sorted(range(len(self._names)), key=self._processed.__getitem__)
+            return [(self._keys[i], self._names[i]) for i in order[:limit]]
+
+        matches = process.extract(
+            query,
+            self._processed,
+            scorer=self.scorer,
+            processor=None,
+            limit=limit,
+            score_cutoff=score_cutoff,
+        )
+        return [(self._keys[i], self._names[i]) for _, _, i in matches]
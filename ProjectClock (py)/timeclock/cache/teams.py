@@ -0,0 +1,157 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from timeclock.cache.names import NameIndex
+from timeclock.database.mongodb import MongoDB
+from timeclock.database.team import Team
+
+__all__ = ("TeamAggregate", "TeamCache")
+
+
+@dataclass
+class TeamAggregate:
+    """Cached activity figures for a single team"""
+
+    member_count: int
+    on_duty: int
+    hours_this_week: float
+    computed_at: float
+
+
+class TeamCache:
+    """Per-guild team store backed by the `teams` and `team_members` collections
+
+    A guild's teams are loaded once, after which membership lookups in either direction are
+    served from memory through the `(guild_id, member_id)` index. Activity aggregates are
+    computed for all of a guild's teams in one query and kept until they expire or a member
+    of the team punches.
+    """
+
+    def __init__(self, db: MongoDB, *, aggregate_ttl: float = 60) -> None:
+        self.db = db
+        self.aggregate_ttl = aggregate_ttl
+        self._teams: Dict[int, Dict[int, Team]] = {}
+        self._names: Dict[int, NameIndex[int]] = {}
+        self._membership: Dict[Tuple[int, int], Set[int]] = {}
+        self._aggregates: Dict[Tuple[int, int], TeamAggregate] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def _ensure_loaded(self, guild_id: int) -> Dict[int, Team]:
+        if guild_id in self._teams:
+            return self._teams[guild_id]
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            if guild_id in self._teams:
+                return self._teams[guild_id]
+
+            teams = {doc["id"]: Team.from_dict(doc) for doc in await self.db.get_teams(guild_id)}
+            for doc in await self.db.get_team_members(guild_id):
+                team = teams.get(doc["team_id"])
+                if team is None:
+                    continue
+                team.add_member(doc["member_id"])
+                self._membership.setdefault((guild_id, doc["member_id"]), set()).add(team.id)
+
+            names = NameIndex()
+            for team in teams.values():
+                names.set(team.id, team.name)
+
+            self._names[guild_id] = names
+            self._teams[guild_id] = teams
+            return teams
+
+    async def get_teams(self, guild_id: int) -> List[Team]:
+        return list((await self._ensure_loaded(guild_id)).values())
+
+    async def get_team(self, guild_id: int, team_id: int) -> Optional[Team]:
+        return (await self._ensure_loaded(guild_id)).get(team_id)
+
+    async def create_team(self, guild_id: int, name: str, leader_id: Optional[int] = None) -> Team:
+        teams = await self._ensure_loaded(guild_id)
+        team = Team.from_dict(await self.db.create_team(guild_id, name, leader_id))
+        teams[team.id] = team
+        self._names[guild_id].set(team.id, team.name)
+        return team
+
+    async def names(self, guild_id: int) -> NameIndex[int]:
+        """Team ID -> name index of the guild, for team autocompletes"""
+        await self._ensure_loaded(guild_id)
+        return self._names[guild_id]
+
+    async def add_member(self, guild_id: int, team_id: int, member_id: int) -> bool:
+        """Add a member to a team. Returns False if they were already a member"""
+        team = await self.get_team(guild_id, team_id)
+        if team is None or member_id in team.members:
+            return False
+
+        await self.db.add_team_member(guild_id, team_id, member_id)
+        team.add_member(member_id)
+        self._membership.setdefault((guild_id, member_id), set()).add(team_id)
+        self._aggregates.pop((guild_id, team_id), None)
+        return True
+
+    async def remove_member(self, guild_id: int, team_id: int, member_id: int) -> bool:
+        """Remove a member from a team. Returns False if they were not a member"""
+        team = await self.get_team(guild_id, team_id)
+        if team is None or member_id not in team.members:
+            return False
+
+        await self.db.remove_team_member(guild_id, team_id, member_id)
+        team.remove_member(member_id)
+        self._membership.get((guild_id, member_id), set()).discard(team_id)
+        self._aggregates.pop((guild_id, team_id), None)
+        return True
+
+    async def teams_of_member(self, guild_id: int, member_id: int) -> List[Team]:
+        teams = await self._ensure_loaded(guild_id)
+        return [teams[t] for t in self._membership.get((guild_id, member_id), ()) if t in teams]
+
+    async def members_of_team(self, guild_id: int, team_id: int) -> Set[int]:
+        team = await self.get_team(guild_id, team_id)
+        return set(team.members) if team else set()
+
+    def invalidate_member(self, guild_id: int, member_id: int) -> None:
+        """Drop cached aggregates of every team the member belongs to, e.g. after a punch"""
+        for team_id in self._membership.get((guild_id, member_id), ()):
+            self._aggregates.pop((guild_id, team_id), None)
+
+    async def get_aggregates(self, guild_id: int) -> Dict[int, TeamAggregate]:
+        """Return aggregates for every team in the guild, refreshing stale ones in one query"""
+        teams = await self._ensure_loaded(guild_id)
+        now = time.time()
+
+        stale = [
+            team
+            for team in teams.values()
+            if (agg := self._aggregates.get((guild_id, team.id))) is None
+            or now - agg.computed_at > self.aggregate_ttl
+        ]
+
+        if stale:
+            week_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            week_start -= timedelta(days=week_start.weekday())
+            since = week_start.timestamp()
+
+            member_ids = list(set().union(*(team.members for team in stale)))
+            activity = {}
+            if member_ids:
+                for doc in await self.db.get_members_activity(guild_id, member_ids, since):
+                    seconds = sum(
+                        (t.get("punch_out") or now) - t["punch_in"] for t in doc.get("times", [])
+                    )
+                    activity[doc["id"]] = (doc.get("on_duty", False), seconds)
+
+            for team in stale:
+                member_activity = [activity[m] for m in team.members if m in activity]
+                self._aggregates[(guild_id, team.id)] = TeamAggregate(
+                    member_count=len(team.members),
+                    on_duty=sum(1 for on_duty, _ in member_activity if on_duty),
+                    hours_this_week=sum(seconds for _, seconds in member_activity) / 3600,
+                    computed_at=now,
+                )
+
+        return {team_id: self._aggregates[(guild_id, team_id)] for team_id in teams}
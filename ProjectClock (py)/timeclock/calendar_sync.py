@@ -1,37 +1,119 @@
-from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
 import json
 import os
+import random
+import threading
+import time
 
+import google_auth_httplib2
+import httplib2
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, HttpRequest
+
+from timeclock import log
+from timeclock.constants import Calendar
+
+if TYPE_CHECKING:
+    from timeclock.executor import ExecutorService
+
+logger = log.get_logger(__name__)
+
+T = TypeVar("T")
+
+# Google recommends no more than 50 calls per batch request for the Calendar API
+BATCH_SIZE = 50
+MAX_RETRIES = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CONFLICT = 409
+GONE = 410
+# credentials are refreshed this long before they expire, so no request goes out with a stale token
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def parse_datetime(value: str) -> datetime:
+    """An RFC 3339 timestamp from the Calendar API; `fromisoformat` only takes "Z" from 3.11"""
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
 
 class CalendarSync:
-    """Handles calendar integration and synchronization"""
+    """Handles calendar integration and synchronization
+
+    The Google client is blocking, so the `a`-prefixed coroutines run the matching method on
+    the executor's thread pool (or `asyncio.to_thread` without one) and never on the event loop.
+    """
 
     SCOPES = ['https://www.googleapis.com/auth/calendar']
     TOKEN_FILE = 'token.json'
     CREDENTIALS_FILE = 'credentials.json'
 
-    def __init__(self):
+    def __init__(self, executor: Optional["ExecutorService"] = None,
+                 api_endpoint: Optional[str] = Calendar.api_endpoint):
         self.creds = None
         self.service = None
+        self.executor = executor
+        self._auth_lock = threading.Lock()
+        # httplib2 connections are not thread safe, so each worker thread gets its own
+        self._local = threading.local()
+        self.api_endpoint = api_endpoint
+        # events of the calendar kept current with incremental `syncToken` listing
+        self._events: Dict[str, Dict[str, Any]] = {}
+        self._sync_token: Optional[str] = None
+        self._events_lock = threading.Lock()
+
+    @staticmethod
+    def event_id(guild_id: int, member_id: int, punch_in: float) -> str:
+        """Deterministic event ID for a session, so inserting it twice can't duplicate it
+
+        Google only accepts the base32hex alphabet (0-9, a-v) in client-supplied IDs.
+        """
+        return f"tc{guild_id}g{member_id}g{int(punch_in * 1000)}"
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.executor is not None:
+            return await self.executor.run_io(func, *args)
+        return await asyncio.to_thread(func, *args)
+
+    def _needs_refresh(self) -> bool:
+        if self.creds is None or not self.creds.token:
+            return True
+        # `expiry` is a naive UTC datetime, None for tokens that don't expire
+        expiry = self.creds.expiry
+        return expiry is not None and expiry - datetime.utcnow() < REFRESH_MARGIN
+
+    @property
+    def authenticated(self) -> bool:
+        """Whether the service is built and the credentials are not about to expire"""
+        return self.service is not None and not self._needs_refresh()
 
     def authenticate(self) -> bool:
-        """Authenticate with Google Calendar API"""
-        if os.path.exists(self.TOKEN_FILE):
-            with open(self.TOKEN_FILE, 'r') as token:
-                self.creds = Credentials.from_authorized_user_file(
-                    self.TOKEN_FILE, self.SCOPES
-                )
+        """Authenticate with Google Calendar API
+
+        Credentials and the service are built once and reused; later calls only refresh the
+        token when it is close to expiring. The lock makes concurrent callers wait for a
+        single refresh instead of each doing their own.
+        """
+        if self.authenticated:
+            return True
+
+        with self._auth_lock:
+            if self.authenticated:
+                return True
+
+            if self.creds is None and os.path.exists(self.TOKEN_FILE):
+                self.creds = Credentials.from_authorized_user_file(self.TOKEN_FILE, self.SCOPES)
 
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
+            if self.creds and self.creds.refresh_token and self._needs_refresh():
                 self.creds.refresh(Request())
-            else:
+                self._save_token()
+            elif not self.creds or not self.creds.valid:
                 if not os.path.exists(self.CREDENTIALS_FILE):
                     return False
 
@@ -39,56 +121,185 @@ class CalendarSync:
                     self.CREDENTIALS_FILE, self.SCOPES
                 )
                 self.creds = flow.run_local_server(port=0)
+                self._save_token()
+
+            self._build()
+            return True
+
+    def _save_token(self) -> None:
+        with open(self.TOKEN_FILE, 'w') as token:
+            token.write(self.creds.to_json())
+
+    def _build(self) -> None:
+        if self.service is not None:
+            # the service holds a reference to `self.creds`, which was refreshed in place
+            return
+
+        # the discovery document shipped with googleapiclient is used instead of fetching it
+        client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+        self.service = build('calendar', 'v3', credentials=self.creds,
+                             client_options=client_options,
+                             static_discovery=True, cache_discovery=False)
+
+    def _http(self) -> google_auth_httplib2.AuthorizedHttp:
+        """The calling thread's authorized HTTP connection"""
+        http = getattr(self._local, 'http', None)
+        if http is None or http.credentials is not self.creds:
+            http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    async def aauthenticate(self) -> bool:
+        if self.authenticated:
+            return True
+        return await self._run(self.authenticate)
+
+    def _new_batch(self, callback: Callable) -> BatchHttpRequest:
+        if self.api_endpoint:
+            batch_uri = f"{self.api_endpoint.rstrip('/')}/batch/calendar/v3"
+            return BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+        return self.service.new_batch_http_request(callback=callback)
+
+    def _execute_batch(self, requests: List[HttpRequest],
+                       accept: Tuple[int, ...] = ()) -> List[Optional[Dict[str, Any]]]:
+        """Send `requests` in batches of `BATCH_SIZE`, returning each response (or None) in order.
+
+        Sub-requests that fail with a rate limit or server error are retried in a new batch
+        with exponential backoff. Errors with a status in `accept` count as an empty response.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+
+        for offset in range(0, len(requests), BATCH_SIZE):
+            pending = list(range(offset, min(offset + BATCH_SIZE, len(requests))))
+
+            for attempt in range(MAX_RETRIES + 1):
+                retry = []
 
-            with open(self.TOKEN_FILE, 'w') as token:
-                token.write(self.creds.to_json())
+                def callback(request_id: str, response: Any, exception: Optional[HttpError]) -> None:
+                    index = int(request_id)
+                    if exception is None:
+                        results[index] = response
+                    elif isinstance(exception, HttpError) and exception.resp.status in accept:
+                        results[index] = {}
+                    elif isinstance(exception, HttpError) and exception.resp.status in RETRY_STATUSES:
+                        retry.append(index)
+                    else:
+                        logger.warning(f"Calendar request {index} failed: {exception}")
 
-        self.service = build('calendar', 'v3', credentials=self.creds)
-        return True
+                batch = self._new_batch(callback)
+                for index in pending:
+                    batch.add(requests[index], request_id=str(index))
+
+                try:
+                    batch.execute(http=self._http())
+                except HttpError as error:
+                    if error.resp.status not in RETRY_STATUSES:
+                        logger.error(f"Calendar batch request failed: {error}")
+                        break
+                    retry = pending
+
+                if not retry or attempt == MAX_RETRIES:
+                    break
+
+                pending = retry
+                time.sleep(min(2 ** attempt + random.random(), 32))
+
+        return results
+
+    def _event_body(self, start_time: datetime, end_time: datetime,
+                    description: str, timezone_str: str = 'UTC') -> Dict[str, Any]:
+        return {
+            'summary': 'Work Schedule',
+            'description': description,
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': timezone_str,
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': timezone_str,
+            },
+            'reminders': {
+                'useDefault': True
+            }
+        }
 
     def add_work_schedule(self, start_time: datetime, end_time: datetime,
                          description: str, timezone_str: str = 'UTC') -> Optional[str]:
         """Add a work schedule event to the calendar"""
         try:
-            if not self.service:
-                if not self.authenticate():
-                    return None
-
-            event = {
-                'summary': 'Work Schedule',
-                'description': description,
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': timezone_str,
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': timezone_str,
-                },
-                'reminders': {
-                    'useDefault': True
-                }
-            }
+            if not self.authenticate():
+                return None
 
+            event = self._event_body(start_time, end_time, description, timezone_str)
             event = self.service.events().insert(
-                calendarId='primary', body=event).execute()
+                calendarId='primary', body=event).execute(http=self._http(), num_retries=MAX_RETRIES)
             return event.get('id')
 
         except HttpError as error:
-            print(f'An error occurred: {error}')
+            logger.error(f'An error occurred: {error}')
             return None
 
+    def add_work_schedules(self, schedules: List[Tuple[datetime, datetime, str]],
+                           timezone_str: str = 'UTC',
+                           event_ids: Optional[List[str]] = None) -> List[Optional[str]]:
+        """Add many `(start_time, end_time, description)` events using batch requests
+
+        With `event_ids` the events are created with those IDs and an event that already
+        exists counts as added. Returns the event IDs in the same order, None for failures.
+        """
+        if not self.authenticate():
+            return [None] * len(schedules)
+
+        requests = []
+        for index, (start_time, end_time, description) in enumerate(schedules):
+            body = self._event_body(start_time, end_time, description, timezone_str)
+            if event_ids:
+                body['id'] = event_ids[index]
+            requests.append(self.service.events().insert(calendarId='primary', body=body))
+
+        responses = self._execute_batch(requests, accept=(CONFLICT,) if event_ids else ())
+        return [
+            None if event is None else event.get('id') or event_ids[index]
+            for index, event in enumerate(responses)
+        ]
+
+    async def aadd_work_schedules(self, schedules: List[Tuple[datetime, datetime, str]],
+                                  timezone_str: str = 'UTC',
+                                  event_ids: Optional[List[str]] = None) -> List[Optional[str]]:
+        return await self._run(self.add_work_schedules, schedules, timezone_str, event_ids)
+
+    def patch_work_schedules(self, patches: List[Tuple[str, datetime, datetime, str]],
+                             timezone_str: str = 'UTC') -> List[bool]:
+        """Patch the times and description of many `(event_id, start_time, end_time,
+        description)` events using batch requests"""
+        if not self.authenticate():
+            return [False] * len(patches)
+
+        requests = []
+        for event_id, start_time, end_time, description in patches:
+            body = self._event_body(start_time, end_time, description, timezone_str)
+            del body['summary'], body['reminders']
+            requests.append(self.service.events().patch(
+                calendarId='primary', eventId=event_id, body=body
+            ))
+
+        return [response is not None for response in self._execute_batch(requests)]
+
+    async def apatch_work_schedules(self, patches: List[Tuple[str, datetime, datetime, str]],
+                                    timezone_str: str = 'UTC') -> List[bool]:
+        return await self._run(self.patch_work_schedules, patches, timezone_str)
+
     def update_work_schedule(self, event_id: str, start_time: datetime,
                            end_time: datetime, description: str,
                            timezone_str: str = 'UTC') -> bool:
         """Update an existing work schedule event"""
         try:
-            if not self.service:
-                if not self.authenticate():
-                    return False
+            if not self.authenticate():
+                return False
 
             event = self.service.events().get(
-                calendarId='primary', eventId=event_id).execute()
+                calendarId='primary', eventId=event_id).execute(http=self._http(), num_retries=MAX_RETRIES)
 
             event['start'] = {
                 'dateTime': start_time.isoformat(),
@@ -104,7 +315,7 @@ class CalendarSync:
                 calendarId='primary',
                 eventId=event_id,
                 body=event
-            ).execute()
+            ).execute(http=self._http(), num_retries=MAX_RETRIES)
             return True
 
         except HttpError:
@@ -113,37 +324,84 @@ class CalendarSync:
     def delete_work_schedule(self, event_id: str) -> bool:
         """Delete a work schedule event"""
         try:
-            if not self.service:
-                if not self.authenticate():
-                    return False
+            if not self.authenticate():
+                return False
 
             self.service.events().delete(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ).execute(http=self._http(), num_retries=MAX_RETRIES)
             return True
 
         except HttpError:
             return False
 
+    def _sync_events(self) -> None:
+        """Bring the local event cache up to date
+
+        The first call lists the whole calendar; after that only events changed since the
+        stored `syncToken` are fetched. An expired token (410) falls back to a full listing.
+        """
+        while True:
+            request = {'calendarId': 'primary', 'showDeleted': True}
+            if self._sync_token:
+                request['syncToken'] = self._sync_token
+            else:
+                self._events.clear()
+
+            try:
+                page_token = None
+                while True:
+                    result = self.service.events().list(
+                        **request, pageToken=page_token
+                    ).execute(http=self._http(), num_retries=MAX_RETRIES)
+
+                    for event in result.get('items', []):
+                        if event.get('status') == 'cancelled':
+                            self._events.pop(event['id'], None)
+                        else:
+                            self._events[event['id']] = event
+
+                    page_token = result.get('nextPageToken')
+                    if not page_token:
+                        self._sync_token = result.get('nextSyncToken')
+                        return
+
+            except HttpError as error:
+                if error.resp.status != GONE or not self._sync_token:
+                    raise
+                logger.info("Calendar sync token expired, doing a full sync")
+                self._sync_token = None
+
     def get_work_schedules(self, start_date: datetime,
                           end_date: datetime,
                           timezone_str: str = 'UTC') -> list[Dict[str, Any]]:
         """Get all work schedule events within a date range"""
         try:
-            if not self.service:
-                if not self.authenticate():
-                    return []
+            if not self.authenticate():
+                return []
 
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=start_date.isoformat(),
-                timeMax=end_date.isoformat(),
-                timeZone=timezone_str,
-                q='Work Schedule'
-            ).execute()
+            with self._events_lock:
+                self._sync_events()
+                events = list(self._events.values())
+
+        except HttpError as error:
+            logger.error(f'An error occurred: {error}')
+            return []
 
-            return events_result.get('items', [])
+        schedules = []
+        for event in events:
+            if event.get('summary') != 'Work Schedule' or 'dateTime' not in event.get('start', {}):
+                continue
 
-        except HttpError:
-            return []
\ No newline at end of file
+            start = parse_datetime(event['start']['dateTime'])
+            end = parse_datetime(event['end']['dateTime'])
+            if end > start_date and start < end_date:
+                schedules.append((start, event))
+
+        schedules.sort(key=lambda schedule: schedule[0])
+        return [event for _, event in schedules]
+
+    async def aget_work_schedules(self, start_date: datetime, end_date: datetime,
+                                  timezone_str: str = 'UTC') -> list[Dict[str, Any]]:
+        return await self._run(self.get_work_schedules, start_date, end_date, timezone_str)
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from timeclock import log
+from timeclock.metrics import Metrics
+
+__all__ = ("Cluster", "FileLease", "Lease", "MongoLease", "process_id")
+
+logger = log.get_logger(__name__)
+
+
+def process_id() -> str:
+    """Identifies this process among the cluster's: host and PID"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease(ABC):
+    """Leadership that one process of the cluster holds at a time"""
+
+    @abstractmethod
+    async def acquire(self) -> bool:
+        """Take the lease, or renew it if already held; False if another process holds it"""
+
+    @abstractmethod
+    async def release(self) -> None:
+        """Give the lease up if held, so another process can take it straight away"""
+
+
+class MongoLease(Lease):
+    """A lease document in MongoDB, held until `ttl` seconds after its last renewal
+
+    Taking or renewing the lease is one atomic update that matches only if this process holds
+    it or it has expired; when another process holds it, the upsert hits the unique `_id` and
+    fails. Expiry compares the clocks of the processes, so keep `ttl` well above their skew. A
+    TTL index removes leases of processes that are gone for good.
+    """
+
+    def __init__(self, collection, name: str, owner: str, ttl: float) -> None:
+        self.collection = collection
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self._indexed = False
+
+    async def acquire(self) -> bool:
+        if not self._indexed:
+            await self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            self._indexed = True
+
+        now = datetime.now(timezone.utc)
+        try:
+            lease = await self.collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}],
+                },
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        return lease is not None and lease["owner"] == self.owner
+
+    async def release(self) -> None:
+        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+
+class FileLease(Lease):
+    """An exclusive lock on a file, for processes on one host
+
+    The operating system drops the lock when the holding process exits, crashes included, so
+    another process takes over on its next attempt.
+    """
+
+    def __init__(self, path: str) -> None:
+        import fcntl  # not on Windows; use a MongoLease there
+
+        self._fcntl = fcntl
+        self.path = path
+        self._file = None
+
+    async def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+
+        file = open(self.path, "a")
+        try:
+            self._fcntl.flock(file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    async def release(self) -> None:
+        if self._file is not None:
+            self._fcntl.flock(self._file, self._fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class Cluster:
+    """Elects the leader among the bot's processes, which runs the cluster-wide jobs
+
+    Every process tries to take the `lease` every `renew` seconds; the holder renews it. A
+    leader that can't renew (the database is unreachable, say, or too slow to answer within
+    `renew`) steps down before its lease can expire, so two processes never both think they
+    lead; `renew` has to be well below `ttl / 2`. Without a lease the process is a cluster of
+    one and always leads. Callbacks added with `on_elected` run in the background each time
+    this process becomes the leader.
+    """
+
+    def __init__(
+        self,
+        lease: Optional[Lease],
+        *,
+        ttl: float,
+        renew: float,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.lease = lease
+        self.ttl = ttl
+        self.renew = renew
+        self.metrics = metrics or Metrics()
+        self.is_leader = lease is None
+        self._renewed = 0.0
+        self._elected: List[Callable[[], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._elected_task: Optional[asyncio.Task] = None
+
+        self.metrics.gauge("cluster.leader", lambda: int(self.is_leader))
+
+    def on_elected(self, callback: Callable[[], Awaitable[None]]) -> None:
+        self._elected.append(callback)
+
+    async def start(self) -> None:
+        """Take part in the election; the first attempt is made before this returns"""
+        if self.lease is None:
+            await self._run_elected()
+            return
+        await self._attempt()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew)
+            await self._attempt()
+
+    async def _attempt(self) -> None:
+        # the lease's expiry is counted from before the request
+        started = time.monotonic()
+        try:
+            held = await asyncio.wait_for(self.lease.acquire(), self.renew)
+        except Exception as e:
+            self.metrics.incr("cluster.lease_errors")
+            logger.warning(f"Failed to renew the cluster lease: {e}")
+            # give up while the lease is surely still ours: the check itself takes up to `renew`,
+            # and so does the next one
+            held = self.is_leader and time.monotonic() - self._renewed < self.ttl - 2 * self.renew
+
+        else:
+            if held:
+                self._renewed = started
+
+        if held and not self.is_leader:
+            self.is_leader = True
+            self.metrics.incr("cluster.elected")
+            logger.info(f"{process_id()} is now the cluster leader")
+            # renewals must not wait for the leader's jobs
+            self._elected_task = asyncio.create_task(self._run_elected())
+        elif not held and self.is_leader:
+            self.is_leader = False
+            self.metrics.incr("cluster.deposed")
+            logger.warning(f"{process_id()} is no longer the cluster leader")
+
+    async def _run_elected(self) -> None:
+        for callback in self._elected:
+            try:
+                await callback()
+            except Exception as e:
+                name = getattr(callback, "__qualname__", callback)
+                logger.error(f"Leader job {name} failed: {e}")
+
+    async def close(self) -> None:
+        """Stop taking part, handing the lease over straight away"""
+        for task in (self._task, self._elected_task):
+            if task is not None:
+                task.cancel()
+        self._task = self._elected_task = None
+        if self.lease is not None and self.is_leader:
+            self.is_leader = False
+            try:
+                await self.lease.release()
+            except Exception as e:
+                logger.warning(f"Failed to release the cluster lease: {e}")
@@ -3,10 +3,10 @@ from typing import List, Optional
 
 import disnake
 from disnake.ext import commands
-from thefuzz import process
 
 from timeclock import components, constants, log
 from timeclock.bot import TimeClockBot
+from timeclock.cache import CHANNEL_KINDS
 
 logger = log.get_logger(__name__)
 
@@ -166,6 +166,86 @@ class Admin(commands.Cog):
             ephemeral=True,
         )
 
+    @config.sub_command(name="set-channel")
+    async def config_set_channel(
+        self,
+        inter: disnake.GuildCommandInteraction,
+        kind: str = commands.Param(choices=list(CHANNEL_KINDS)),
+        channel: Optional[disnake.TextChannel] = None,
+    ) -> None:
+        """
+        Choose the channel for reports, overtime alerts or leave requests
+
+        Parameters
+        ----------
+        kind: :type:`str`
+            report: attendance reports, alert: overtime alerts, leave: leave requests
+        channel: :type:`disnake.TextChannel`
+            The channel to use. Leave empty to go back to picking one automatically
+        """
+        if channel and not channel.permissions_for(inter.guild.me).send_messages:
+            return await inter.response.send_message(
+                f"لا أملك صلاحية الإرسال في {channel.mention}", ephemeral=True
+            )
+
+        await self.bot.channel_cache.set(inter.guild.id, kind, channel.id if channel else None)
+        resolved = await self.bot.channel_cache.get(inter.guild, kind)
+        await inter.response.send_message(
+            f"قناة `{kind}`: {resolved.mention if resolved else 'لا توجد قناة متاحة'}",
+            ephemeral=True,
+        )
+
+    @config.sub_command(name="roster")
+    async def config_roster(self, inter: disnake.GuildCommandInteraction, enabled: bool) -> None:
+        """
+        Keep a live list of the members on duty in the Punch channel
+
+        Parameters
+        ----------
+        enabled: :type:`bool`
+            Set to False to remove the list
+        """
+        if not enabled:
+            await self.bot.roster.disable(inter.guild.id, delete=True)
+            return await inter.response.send_message("تم إيقاف قائمة الحضور المباشرة", ephemeral=True)
+
+        guild = await self.bot.ensure_guild(inter.guild.id)
+        channel = inter.guild.get_channel(guild.channel_id) if guild.channel_id else None
+        if not isinstance(channel, disnake.TextChannel):
+            return await inter.response.send_message(
+                "الرجاء إنشاء رسالة تسجيل الدخول أولاً باستخدام `/config edit-embed`",
+                ephemeral=True,
+            )
+        if not channel.permissions_for(inter.guild.me).send_messages:
+            return await inter.response.send_message(
+                f"لا أملك صلاحية الإرسال في {channel.mention}", ephemeral=True
+            )
+
+        await inter.response.defer(ephemeral=True)
+        message = await self.bot.roster.enable(inter.guild, channel)
+        await inter.followup.send(
+            f"تم تفعيل قائمة الحضور المباشرة. [اضغط هنا]({message.jump_url}) لعرضها", ephemeral=True
+        )
+
+    @config.sub_command(name="metrics")
+    async def config_metrics(self, inter: disnake.GuildCommandInteraction) -> None:
+        """View the bot's internal counters and latencies"""
+        snapshot = self.bot.metrics.snapshot()
+
+        embed = disnake.Embed(title="Bot Metrics")
+        sections = {
+            "Counters": [f"`{name}`: {value}" for name, value in sorted(snapshot["counters"].items())],
+            "Gauges": [f"`{name}`: {value}" for name, value in sorted(snapshot["gauges"].items())],
+            "Timings": [
+                f"`{name}`: n={t['count']} p50={t['p50_ms']:.1f}ms p99={t['p99_ms']:.1f}ms"
+                for name, t in sorted(snapshot["timings"].items())
+            ],
+        }
+        for name, lines in sections.items():
+            embed.add_field(name=name, value="\n".join(lines)[:1024] or "-", inline=False)
+
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
     @config.sub_command("remove-role")
     async def config_remove_role(self, inter: disnake.GuildCommandInteraction, role: str):
         """
@@ -212,14 +292,11 @@ class Admin(commands.Cog):
         string: :type:`str`
             The argument string as provided from discord via user input
         """
-        roles = await self.bot.get_guild_roles(inter.guild.id)
-        if not roles:
+        role_names = await self.bot.get_role_names(inter.guild)
+        if not role_names:
             return ["No roles have been configured"]
 
-        roles = [inter.guild.get_role(r.id) for r in roles]
-
-        response = process.extract(string, {str(r.id): r.name for r in roles}, limit=25)
-        return {r[0]: r[-1] for r in response}
+        return {name: str(role_id) for role_id, name in role_names.search(string)}
 
 
 def setup(bot: TimeClockBot) -> None:
@@ -1,9 +1,12 @@
 import disnake
 from disnake.ext import commands
 from datetime import datetime, timezone
+from types import SimpleNamespace
 
+from timeclock.admission import Workload
 from timeclock.bot import TimeClockBot
 from timeclock.analytics import PatternAnalyzer
+from timeclock.executor import ExecutorBusy
 from timeclock import log
 
 logger = log.get_logger(__name__)
@@ -15,7 +18,7 @@ class Analytics(commands.Cog):
         self.bot = bot
         self.analyzer = PatternAnalyzer()
 
-    @commands.slash_command(name="analyze-attendance")
+    @commands.slash_command(name="analyze-attendance", extras={"workload": Workload.HEAVY})
     async def analyze_attendance(self, inter: disnake.GuildCommandInteraction) -> None:
         """تحليل أنماط الحضور والانصراف"""
         await inter.response.defer()
@@ -26,7 +29,13 @@ class Analytics(commands.Cog):
                 await inter.edit_original_response(content="لم يتم العثور على سجلات حضور خاصة بك.")
                 return
 
-            pattern = self.analyzer.analyze_member(member)
+            # analysed in the process pool, from a picklable copy of the member's times
+            snapshot = SimpleNamespace(
+                times=[SimpleNamespace(punch_in=t.punch_in, punch_out=t.punch_out) for t in member.times]
+            )
+            pattern = await self.bot.executor.run_cpu(
+                self.analyzer.analyze_member, snapshot, deadline=inter.expires_at
+            )
             if not pattern:
                 await inter.edit_original_response(content="لا يوجد سجلات كافية للتحليل. يرجى المحاولة لاحقاً.")
                 return
@@ -34,7 +43,9 @@ class Analytics(commands.Cog):
             error_msg = f"Error analyzing attendance for user {inter.author.id}: {str(e)}"
             logger.error(error_msg)
             
-            if isinstance(e, ValueError):
+            if isinstance(e, ExecutorBusy):
+                await inter.edit_original_response(content="الخادم مشغول حالياً. يرجى المحاولة لاحقاً.")
+            elif isinstance(e, ValueError):
                 await inter.edit_original_response(content="خطأ في تنسيق البيانات. يرجى المحاولة لاحقاً.")
             elif isinstance(e, TimeoutError):
                 await inter.edit_original_response(content="انتهت مهلة تحليل البيانات. يرجى المحاولة لاحقاً.")
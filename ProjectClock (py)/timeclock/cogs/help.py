@@ -37,9 +37,9 @@ Message and User context commands do not inherently have a description, so these
 """
 from __future__ import annotations
 
-import copy
+from bisect import bisect_left
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import disnake
 from disnake.ext import commands
@@ -150,6 +150,49 @@ class MessageCommand(Command):
     type: str = "Message Command"
 
 
+@dataclass
+class HelpIndex:
+    """
+    A guild's walked commands, rendered help pages and autocomplete keys.
+
+    Attributes
+    ----------
+    sources : `Tuple[disnake.APIApplicationCommand, ...]`
+        The application commands the index was built from; a command sync replaces them.
+    commands : `Dict[str, Union[SlashCommand, UserCommand, MessageCommand]]`
+        The commands by name.
+    embeds : `List[disnake.Embed]`
+        The rendered help pages.
+    keys : `List[Tuple[str, str]]`
+        Sorted `(lowercase word onwards, command name)` pairs, one per word of every command
+        name, so autocomplete matches the start of any word with a binary search.
+    """
+
+    sources: Tuple[disnake.APIApplicationCommand, ...]
+    commands: Dict[str, Union[SlashCommand, UserCommand, MessageCommand]]
+    embeds: List[disnake.Embed]
+    keys: List[Tuple[str, str]]
+
+    def is_current(self, sources: Tuple[disnake.APIApplicationCommand, ...]) -> bool:
+        return len(sources) == len(self.sources) and all(
+            a is b for a, b in zip(sources, self.sources)
+        )
+
+    def complete(self, string: str, limit: int = 25) -> List[str]:
+        """Command names with a word starting with `string`, in alphabetical order"""
+        prefix = string.lower()
+        if not prefix:
+            return sorted(self.commands)[:limit]
+
+        names = []
+        for key, name in self.keys[bisect_left(self.keys, (prefix, "")) :]:
+            if not key.startswith(prefix) or len(names) == limit:
+                break
+            if name not in names:
+                names.append(name)
+        return names
+
+
 class Help(commands.Cog):
     """
     A cog class that adds a help command to provide information about all bot slash commands, message commands, user commands,
@@ -163,6 +206,59 @@ class Help(commands.Cog):
 
     def __init__(self, bot: commands.InteractionBot) -> None:
         self.bot = bot
+        self.bot.page_sources["help"] = self.help_pages
+        self.indexes: Dict[int, HelpIndex] = {}
+
+    def cog_unload(self) -> None:
+        self.bot.page_sources.pop("help", None)
+
+    def get_index(self, guild: disnake.Guild) -> HelpIndex:
+        """
+        Return the guild's help index, building it when missing or when commands were synced.
+
+        The index only depends on the guild's application commands and roles (for role checks),
+        so it is shared by everyone in the guild and dropped when a role changes.
+        """
+        sources = tuple(
+            self.bot.global_application_commands + self.bot.get_guild_application_commands(guild.id)
+        )
+        index = self.indexes.get(guild.id)
+        if index is not None and index.is_current(sources):
+            return index
+
+        all_commands = self._walk_app_commands(guild)
+        keys = sorted(
+            (command.name.lower()[i:], command.name)
+            for command in all_commands
+            for i, char in enumerate(command.name)
+            if i == 0 or command.name[i - 1] in " -_"
+        )
+        index = self.indexes[guild.id] = HelpIndex(
+            sources=sources,
+            commands={command.name: command for command in all_commands},
+            embeds=self._create_help_embeds(all_commands),
+            keys=keys,
+        )
+        return index
+
+    @commands.Cog.listener("on_guild_role_create")
+    @commands.Cog.listener("on_guild_role_delete")
+    async def drop_index(self, role: disnake.Role) -> None:
+        self.indexes.pop(role.guild.id, None)
+
+    @commands.Cog.listener("on_guild_role_update")
+    async def drop_index_on_update(self, before: disnake.Role, after: disnake.Role) -> None:
+        self.indexes.pop(after.guild.id, None)
+
+    @commands.Cog.listener("on_guild_remove")
+    async def drop_index_on_remove(self, guild: disnake.Guild) -> None:
+        self.indexes.pop(guild.id, None)
+
+    async def help_pages(
+        self, inter: disnake.MessageInteraction, params: Tuple[str, ...]
+    ) -> components.ListPageSource:
+        """The help pages for a page button click"""
+        return components.ListPageSource(self.get_index(inter.guild).embeds)
 
     @commands.slash_command(name="help")
     async def help_command(
@@ -179,48 +275,25 @@ class Help(commands.Cog):
             The name of a specific command to get information about. Defaults to None.
         """
 
-        all_commands = self._walk_app_commands(inter.guild)
+        index = self.get_index(inter.guild)
 
         if command:
-            specific_command = self._get_command_named(command, all_commands)
+            specific_command = index.commands.get(command)
             embed = self._create_command_detail_embed(specific_command)
             await inter.response.send_message(
                 embed=embed, components=components.TrashButton(inter.author.id)
             )
             return
 
-        embeds = self._create_help_embed(all_commands)
+        pages = components.ListPageSource(index.embeds)
 
-        if len(embeds) == 1:
+        if pages.page_count == 1:
             await inter.response.send_message(
-                embed=embeds[0], components=components.TrashButton(inter.author.id)
+                embed=await pages.render(0), components=components.TrashButton(inter.author.id)
             )
             return
 
-        await inter.response.send_message(
-            embed=embeds[0], view=components.Pagination(embeds, inter.author)
-        )
-
-    def _get_command_named(
-        self, name: str, commands: List[Union[SlashCommand, MessageCommand, UserCommand]]
-    ) -> Union[SlashCommand, UserCommand, MessageCommand]:
-        """
-        Retrieve a single command from the provided list of commands by its name.
-
-        Parameters
-        ----------
-        name : `str`
-            The name of the command to retrieve.
-        commands : `List[Union[SlashCommand, MessageCommand, UserCommand]]`
-            A list of commands to search through.
-
-        Returns
-        -------
-        `Union[SlashCommand, UserCommand, MessageCommand]`
-            The matched command object or None if not found.
-        """
-
-        return next((command for command in commands if name == command.name), None)
+        await components.Pagination("help", pages, inter.author).send(inter)
 
     def _parse_checks(
         self,
@@ -530,7 +603,7 @@ class Help(commands.Cog):
 
         return embed
 
-    def _create_help_embed(
+    def _create_help_embeds(
         self, commands: List[Union[SlashCommand, UserCommand, MessageCommand]]
     ) -> List[disnake.Embed]:
         command_sections = self._organize_commands(commands)
@@ -538,10 +611,14 @@ class Help(commands.Cog):
         embeds = []
         for name, command_lines in command_sections.items():
             if command_lines:
-                base_embed = self._create_base_embed(name)
                 chunked_section_content = self._chunk_section_content(command_lines)
-                embeds.extend(self._create_section_embeds(base_embed, chunked_section_content))
-        return embeds
+                for i in range(0, len(chunked_section_content), MAX_EMBED_FIELDS):
+                    embeds.append(
+                        self._create_section_embed(
+                            name, chunked_section_content[i : i + MAX_EMBED_FIELDS]
+                        )
+                    )
+        return embeds or [self._create_base_embed("Slash Commands")]
 
     def _create_base_embed(self, section_name) -> disnake.Embed:
         base_embed = disnake.Embed(
@@ -591,16 +668,11 @@ class Help(commands.Cog):
 
         return chunked_section_content
 
-    def _create_section_embeds(
-        self, base_embed: disnake.Embed, section_content: List[str]
-    ) -> List[disnake.Embed]:
-        embeds = []
-        for i, content in enumerate(section_content):
-            if i % MAX_EMBED_FIELDS == 0:
-                embed = copy.deepcopy(base_embed)
-                embeds.append(embed)
+    def _create_section_embed(self, section_name: str, section_content: List[str]) -> disnake.Embed:
+        embed = self._create_base_embed(section_name)
+        for content in section_content:
             embed.add_field(name=f"\u200b", value=content, inline=False)
-        return embeds
+        return embed
 
     @help_command.autocomplete("command")
     async def command_autocomplete(
@@ -621,8 +693,7 @@ class Help(commands.Cog):
         `List[str]`
             A list of matched command names.
         """
-        commands = self._walk_app_commands(inter.guild)
-        return [c.name for c in commands if string.lower() in c.name.lower()][:25]
+        return self.get_index(inter.guild).complete(string)
 
 
 def setup(bot: commands.InteractionBot) -> None:
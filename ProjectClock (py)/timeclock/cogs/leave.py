@@ -3,20 +3,20 @@ from disnake.ext import commands
 from datetime import datetime, timedelta
 from typing import Optional, List
 
+from timeclock import components
 from timeclock.bot import TimeClockBot
 from timeclock.database.config import GuildConfig
+from timeclock.database.leave import APPROVED, DENIED, Leave as LeaveRecord
+from timeclock.outbound import Priority
 
 class Leave(commands.Cog):
     """إدارة الإجازات والأذونات"""
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
-        self.guild_configs = {}
 
     def get_guild_config(self, guild_id: int) -> GuildConfig:
-        if guild_id not in self.guild_configs:
-            self.guild_configs[guild_id] = GuildConfig(guild_id)
-        return self.guild_configs[guild_id]
+        return self.bot.get_guild_config(guild_id)
 
     @commands.slash_command(name="leave")
     async def leave(self, inter: disnake.ApplicationCommandInteraction):
@@ -30,41 +30,78 @@ class Leave(commands.Cog):
         """تقديم طلب إجازة"""
         try:
             start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = start + timedelta(days=days)
+        except ValueError:
+            await inter.response.send_message("❌ صيغة التاريخ غير صحيحة. الرجاء استخدام الصيغة YYYY-MM-DD")
+            return
 
-            embed = disnake.Embed(
-                title="طلب إجازة جديد",
-                color=disnake.Color.blue()
+        end = start + timedelta(days=days)
+        leave, conflicts = await self.bot.leave_cache.request(
+            inter.guild.id, inter.author.id, start.date(), end.date(), reason
+        )
+        if not leave:
+            await inter.response.send_message(
+                f"❌ يتداخل هذا الطلب مع إجازة أخرى: {self._describe(conflicts[0])}", ephemeral=True
             )
-            embed.add_field(name="العضو", value=inter.author.mention, inline=False)
-            embed.add_field(name="تاريخ البداية", value=start.strftime("%d/%m/%Y"), inline=True)
-            embed.add_field(name="تاريخ النهاية", value=end.strftime("%d/%m/%Y"), inline=True)
-            embed.add_field(name="عدد الأيام", value=str(days), inline=True)
-            embed.add_field(name="السبب", value=reason, inline=False)
-
-            # Send to moderators/admins
-            for channel in inter.guild.text_channels:
-                if channel.permissions_for(inter.guild.me).send_messages:
-                    if "admin" in channel.name.lower() or "mod" in channel.name.lower():
-                        await channel.send(embed=embed)
-                        break
+            return
 
-            await inter.response.send_message("✅ تم إرسال طلب الإجازة بنجاح، سيتم إبلاغك بالرد قريباً.")
+        used = await self.bot.leave_cache.used_days(inter.guild.id, inter.author.id, start.year)
 
-        except ValueError:
-            await inter.response.send_message("❌ صيغة التاريخ غير صحيحة. الرجاء استخدام الصيغة YYYY-MM-DD")
+        embed = disnake.Embed(
+            title="طلب إجازة جديد",
+            color=disnake.Color.blue()
+        )
+        embed.add_field(name="رقم الطلب", value=str(leave.id), inline=False)
+        embed.add_field(name="العضو", value=inter.author.mention, inline=False)
+        embed.add_field(name="تاريخ البداية", value=start.strftime("%d/%m/%Y"), inline=True)
+        embed.add_field(name="تاريخ النهاية", value=end.strftime("%d/%m/%Y"), inline=True)
+        embed.add_field(name="عدد الأيام", value=str(days), inline=True)
+        embed.add_field(name="الرصيد المتبقي", value=f"{self.bot.leave_cache.annual_days - used} يوم", inline=True)
+        embed.add_field(name="السبب", value=reason, inline=False)
+
+        # Send to moderators/admins
+        channel = await self.bot.channel_cache.get(inter.guild, "leave")
+        if channel:
+            self.bot.outbound.send(channel, embed=embed, priority=Priority.INTERACTIVE)
+
+        await inter.response.send_message("✅ تم إرسال طلب الإجازة بنجاح، سيتم إبلاغك بالرد قريباً.")
+
+    @staticmethod
+    def _describe(leave: LeaveRecord) -> str:
+        status = "موافق عليها" if leave.status == APPROVED else "قيد المراجعة"
+        return f"#{leave.id} من {leave.start.strftime('%d/%m/%Y')} إلى {leave.end.strftime('%d/%m/%Y')} ({status})"
 
     @leave.sub_command(name="approve")
     @commands.has_permissions(administrator=True)
     async def approve_leave(self, inter: disnake.ApplicationCommandInteraction,
-                          member: disnake.Member,
-                          start_date: str,
+                          member: disnake.Member = components.MemberParam(),
+                          start_date: str = commands.Param(),
                           days: int = commands.Param(ge=1, le=30)):
         """الموافقة على طلب إجازة"""
         try:
             start = datetime.strptime(start_date, "%Y-%m-%d")
             end = start + timedelta(days=days)
 
+            # approve the member's pending request for these dates, or grant the leave directly
+            pending = [
+                leave for leave in await self.bot.leave_cache.pending(inter.guild.id, member.id)
+                if leave.start == start.date() and leave.end == end.date()
+            ]
+            if pending:
+                leave = await self.bot.leave_cache.decide(inter.guild.id, pending[0].id, APPROVED, inter.author.id)
+            else:
+                leave, conflicts = await self.bot.leave_cache.request(
+                    inter.guild.id, member.id, start.date(), end.date(), approved_by=inter.author.id
+                )
+                if conflicts:
+                    await inter.response.send_message(
+                        f"❌ يتداخل هذا الطلب مع إجازة أخرى: {self._describe(conflicts[0])}", ephemeral=True
+                    )
+                    return
+
+            if not leave:
+                await inter.response.send_message("❌ تمت معالجة هذا الطلب بالفعل", ephemeral=True)
+                return
+
             embed = disnake.Embed(
                 title="تمت الموافقة على طلب الإجازة",
                 color=disnake.Color.green()
@@ -76,10 +113,8 @@ class Leave(commands.Cog):
             embed.add_field(name="تمت الموافقة من قبل", value=inter.author.mention, inline=False)
 
             await inter.response.send_message(embed=embed)
-            try:
-                await member.send(embed=embed)
-            except:
-                pass
+            # DMs may be closed; the queue logs the failure
+            self.bot.outbound.send(member, embed=embed, priority=Priority.INTERACTIVE)
 
         except ValueError:
             await inter.response.send_message("❌ صيغة التاريخ غير صحيحة. الرجاء استخدام الصيغة YYYY-MM-DD")
@@ -87,33 +122,49 @@ class Leave(commands.Cog):
     @leave.sub_command(name="deny")
     @commands.has_permissions(administrator=True)
     async def deny_leave(self, inter: disnake.ApplicationCommandInteraction,
-                        member: disnake.Member,
-                        reason: str = commands.Param(description="سبب الرفض")):
+                        member: disnake.Member = components.MemberParam(),
+                        reason: str = commands.Param(description="سبب الرفض"),
+                        start_date: Optional[str] = commands.Param(None, description="تاريخ بداية الإجازة (اتركه فارغاً لأقدم طلب معلق)")):
         """رفض طلب إجازة"""
+        pending = await self.bot.leave_cache.pending(inter.guild.id, member.id)
+        if start_date:
+            try:
+                start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            except ValueError:
+                await inter.response.send_message("❌ صيغة التاريخ غير صحيحة. الرجاء استخدام الصيغة YYYY-MM-DD")
+                return
+            pending = [leave for leave in pending if leave.start == start]
+
+        leave = await self.bot.leave_cache.decide(
+            inter.guild.id, pending[0].id, DENIED, inter.author.id
+        ) if pending else None
+        if not leave:
+            await inter.response.send_message("❌ لا توجد طلبات إجازة معلقة لهذا العضو", ephemeral=True)
+            return
+
         embed = disnake.Embed(
             title="تم رفض طلب الإجازة",
             color=disnake.Color.red()
         )
         embed.add_field(name="العضو", value=member.mention, inline=False)
+        embed.add_field(name="الإجازة", value=self._describe(leave), inline=False)
         embed.add_field(name="سبب الرفض", value=reason, inline=False)
         embed.add_field(name="تم الرفض من قبل", value=inter.author.mention, inline=False)
 
         await inter.response.send_message(embed=embed)
-        try:
-            await member.send(embed=embed)
-        except:
-            pass
+        self.bot.outbound.send(member, embed=embed, priority=Priority.INTERACTIVE)
 
     @leave.sub_command(name="balance")
     async def leave_balance(self, inter: disnake.ApplicationCommandInteraction,
-                          member: Optional[disnake.Member] = None):
+                          member: Optional[disnake.Member] = components.MemberParam(None)):
         """عرض رصيد الإجازات المتبقي"""
         target = member or inter.author
         
-        # This is a placeholder. In a real implementation, you'd fetch this from a database
-        annual_leave = 30  # Example: 30 days per year
-        used_leave = 10    # Example: 10 days used
-        
+        annual_leave = self.bot.leave_cache.annual_days
+        used_leave = await self.bot.leave_cache.used_days(
+            inter.guild.id, target.id, datetime.utcnow().year
+        )
+
         embed = disnake.Embed(
             title="رصيد الإجازات",
             color=disnake.Color.blue()
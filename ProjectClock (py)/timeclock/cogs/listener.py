@@ -1,12 +1,17 @@
+import asyncio
+import time
 from datetime import datetime
-from typing import Union
+from typing import Dict, Optional, Set, Tuple, Union
 
 import disnake
 from disnake.ext import commands
 
-from timeclock import log
+from timeclock import components, log
+from timeclock.admission import Workload
 from timeclock.bot import TimeClockBot
-from timeclock.database import Member
+from timeclock.components.pages import PAGE_PREFIX
+from timeclock.constants import Punch
+from timeclock.locks import StripedLock
 
 logger = log.get_logger(__name__)
 
@@ -16,37 +21,84 @@ class Listeners(commands.Cog):
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
+        # background punch writes, referenced until they finish
+        self._pending: Set[asyncio.Task] = set()
+        self._punch_locks = StripedLock()
+        self.debounce = Punch.debounce_ms / 1000
+        # (guild_id, member_id) -> (decided at, timestamp, closed punch-in) of recent punches
+        self._recent: Dict[Tuple[int, int], Tuple[float, float, Optional[float]]] = {}
+        # (guild_id, member_id) -> the member's latest write
+        self._writes: Dict[Tuple[int, int], asyncio.Task] = {}
+
+        router = self.bot.router
+        router.register("punch", self.punch_in_out_click, workload=Workload.PUNCH)
+        router.register("trash", self.handle_trash_button, parse=lambda args: int(args[0]))
+        router.register(
+            PAGE_PREFIX,
+            self.handle_page_button,
+            parse=components.PageState.from_args,
+            owner=lambda state: state.author_id,
+        )
 
-    @commands.Cog.listener("on_button_click")
-    async def handle_trash_button(self, inter: disnake.MessageInteraction) -> None:
-        """Delete a message if the user has permission to do so"""
+    def cog_unload(self) -> None:
+        for route in ("punch", "trash", PAGE_PREFIX):
+            self.bot.router.unregister(route)
 
-        if not "trash" in inter.component.custom_id:
-            return
+    async def handle_trash_button(self, inter: disnake.MessageInteraction, owner_id: int) -> None:
+        """Delete a message if the user has permission to do so
 
-        mod_roles = await self.bot.get_guild_roles(inter.guild.id, is_mod=True)
+        The author and the channel permissions are checked first, so only other members' clicks
+        need the mod roles.
+        """
 
         if (
-            not str(inter.author.id) in inter.component.custom_id
+            owner_id != inter.author.id
             and not inter.channel.permissions_for(inter.author).manage_messages
-            and not any(role in mod_roles for role in inter.author.roles)
         ):
-            await inter.response.send_message(
-                "لا يمكنك حذف هذه الرسالة لأنها ليست لك.", ephemeral=True
-            )
-            return
+            mod_roles = await self.bot.get_mod_role_ids(inter.guild.id)
+            if not any(role.id in mod_roles for role in inter.author.roles):
+                await inter.response.send_message(
+                    "لا يمكنك حذف هذه الرسالة لأنها ليست لك.", ephemeral=True
+                )
+                return
 
         await inter.response.defer()
         await inter.delete_original_response()
 
-    @commands.Cog.listener("on_button_click")
-    async def punch_in_out_click(self, inter: disnake.MessageInteraction) -> None:
-        """A button click event listeners specifically listening for users that click on
-        the punch in/out button"""
+    async def handle_page_button(
+        self, inter: disnake.MessageInteraction, state: components.PageState
+    ) -> None:
+        """Render the page a stateless page button leads to; only its author gets here"""
 
-        if inter.component.custom_id != "punch":
+        factory = self.bot.page_sources.get(state.kind)
+        if factory is None:
+            await inter.response.send_message("هذه القائمة لم تعد متاحة.", ephemeral=True)
             return
 
+        await inter.response.defer()
+        source = await factory(inter, state.params)
+        # the data may have shrunk since the buttons were sent
+        index = max(0, min(state.page, source.page_count - 1))
+        await inter.edit_original_response(
+            embed=await source.render(index),
+            components=components.Pagination.buttons(
+                state.kind, index, source.page_count, state.author_id, state.params
+            ),
+        )
+
+    async def punch_in_out_click(
+        self, inter: disnake.MessageInteraction, args: Tuple[str, ...] = ()
+    ) -> None:
+        """A button click event listeners specifically listening for users that click on
+        the punch in/out button
+
+        The new state is decided from the in-memory on-duty index and acknowledged straight
+        away; the database write follows in the background and is rolled back or reconciled in
+        the index (with a followup to the member) if it fails or disagrees.
+        """
+
+        started = time.perf_counter()
+        metrics = self.bot.metrics
         allowed = await self.punch_allowed(inter.author)
 
         if not allowed:
@@ -54,17 +106,136 @@ class Listeners(commands.Cog):
                 "ليس لديك صلاحية تسجيل الدخول/الخروج", ephemeral=True
             )
 
-        timestamp = datetime.timestamp(disnake.utils.utcnow())
-        member = await self.bot.add_punch(inter.guild.id, inter.author.id, timestamp)
-        logger
+        key = (inter.guild.id, inter.author.id)
+        # a member's clicks are decided one at a time; other members don't wait. Only the
+        # decision is made under the lock, the member's next click needn't wait for the ack
+        async with self._punch_locks(key):
+            now = time.monotonic()
+            self._expire_recent(now)
+            recent = self._recent.get(key)
+            if recent is None:
+                timestamp = datetime.timestamp(disnake.utils.utcnow())
+                punch_in = await self.bot.on_duty.toggle(inter.guild.id, inter.author.id, timestamp)
+                decision = self._recent[key] = (now, timestamp, punch_in)
+                metrics.observe("punch.decide", time.perf_counter() - started)
+
+                # writes of a member run in the order their punches were decided, each once
+                # its punch is acknowledged
+                acked = asyncio.get_running_loop().create_future()
+                task = asyncio.create_task(
+                    self._persist_punch(inter, timestamp, punch_in, self._writes.get(key), acked)
+                )
+                self._writes[key] = task
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+                task.add_done_callback(
+                    lambda t: self._writes.get(key) is t and self._writes.pop(key)
+                )
+
+        if recent is not None:
+            # a double click or a second device: answer with the punch it collapses into
+            metrics.incr("punch.debounced")
+            _, timestamp, punch_in = recent
+            await inter.response.send_message(
+                embed=self.create_punch_embed(inter.author, timestamp, punch_in),
+                ephemeral=True,
+                delete_after=5,
+            )
+            return
+
+        embed = self.create_punch_embed(inter.author, timestamp, punch_in)
+        try:
+            await inter.response.send_message(embed=embed, ephemeral=True, delete_after=5)
+        except disnake.HTTPException:
+            # the member saw "interaction failed" and will click again, so nothing happened,
+            # unless another click was already decided on top of this punch
+            metrics.incr("punch.ack_failed")
+            async with self._punch_locks(key):
+                undone = self._recent.get(key) is decision
+                if undone:
+                    self.bot.on_duty.set(inter.guild.id, inter.author.id, punch_in)
+                    del self._recent[key]
+            acked.set_result(not undone)
+            raise
+        finally:
+            if not acked.done():
+                acked.set_result(True)
+        metrics.observe("punch.ack", time.perf_counter() - started)
+        # includes the time the interaction took to reach us
+        metrics.observe(
+            "punch.ack_since_created",
+            (disnake.utils.utcnow() - inter.created_at).total_seconds(),
+        )
+
+    def _expire_recent(self, now: float) -> None:
+        """Forget punches older than the debounce window; entries are in decision order"""
+        while self._recent:
+            key, (decided_at, _, _) = next(iter(self._recent.items()))
+            if now - decided_at < self.debounce:
+                break
+            del self._recent[key]
+
+    async def _persist_punch(
+        self,
+        inter: disnake.MessageInteraction,
+        timestamp: float,
+        punch_in: Optional[float],
+        previous: Optional[asyncio.Task],
+        acked: "asyncio.Future[bool]",
+    ) -> None:
+        """Write a punch once it is acknowledged and the member's `previous` write is done, then
+        confirm, roll back or reconcile the on-duty index
+
+        `acked` is False if the punch was undone because its acknowledgement failed.
+        """
+        if not await acked:
+            return
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        started = time.perf_counter()
+        metrics = self.bot.metrics
+        guild_id, member_id = inter.guild.id, inter.author.id
+
+        try:
+            member = await self.bot.add_punch(guild_id, member_id, timestamp)
+        except Exception as e:
+            metrics.incr("punch.failed")
+            logger.error(f"Failed to save punch of {member_id} in {guild_id}: {e}")
+            # undo the toggle: back on duty since `punch_in`, or off duty again
+            self.bot.on_duty.set(guild_id, member_id, punch_in)
+            await self._followup(inter, content="⚠️ تعذر حفظ تسجيلك، الرجاء المحاولة مرة أخرى.")
+            return
+        finally:
+            metrics.observe("punch.persist", time.perf_counter() - started)
+
+        if member.on_duty == (punch_in is None):
+            metrics.incr("punch.confirmed")
+            return
 
-        embed = self.create_punch_embed(inter.author, member, timestamp)
+        # the database was in the other state and is the source of truth: tell the member what
+        # actually happened
+        metrics.incr("punch.reconciled")
+        last_punch_in = member.times[-1].punch_in
+        if member.on_duty:
+            self.bot.on_duty.set(guild_id, member_id, last_punch_in)
+            embed = self.create_punch_embed(inter.author, timestamp, None)
+        else:
+            self.bot.on_duty.set(guild_id, member_id, None)
+            embed = self.create_punch_embed(inter.author, timestamp, last_punch_in)
+        await self._followup(inter, embed=embed)
 
-        await inter.response.send_message(embed=embed, ephemeral=True, delete_after=5)
+    @staticmethod
+    async def _followup(inter: disnake.MessageInteraction, **kwargs) -> None:
+        try:
+            await inter.followup.send(ephemeral=True, **kwargs)
+        except disnake.HTTPException as e:
+            logger.warning(f"Failed to send punch followup to {inter.author.id}: {e}")
 
     def create_punch_embed(
-        self, member: disnake.Member, db_member: Member, timestamp: float
+        self, member: disnake.Member, timestamp: float, punch_in: Optional[float]
     ) -> disnake.Embed:
+        """`punch_in` is the punch-in closed by this punch, None if the member punched in"""
         embed = disnake.Embed()
         embed.set_author(
             name=member.display_name,
@@ -72,22 +243,20 @@ class Listeners(commands.Cog):
         )
 
         # member just clocked in
-        if db_member.on_duty:
+        if punch_in is None:
             embed.description = f"تم تسجيل دخولك في {disnake.utils.format_dt(timestamp, 't')}"
 
         # member clocked out
         else:
-            # get most recent clock in event time
-            event = [time for time in db_member.times][-1]
-            embed.description = f"تم تسجيل خروجك في {disnake.utils.format_dt(timestamp, 't')} بعد تسجيل دخولك {disnake.utils.format_dt(event.punch_in, 'R')}"
+            embed.description = f"تم تسجيل خروجك في {disnake.utils.format_dt(timestamp, 't')} بعد تسجيل دخولك {disnake.utils.format_dt(punch_in, 'R')}"
 
         return embed
 
     async def punch_allowed(self, member: disnake.Member) -> bool:
         """Check if the member is allowed to punch in or not"""
-        allowed_roles = await self.bot.get_guild_roles(member.guild.id, is_mod=True)
+        allowed_roles = await self.bot.get_mod_role_ids(member.guild.id)
         return (
-            any(role in allowed_roles for role in member.roles)
+            any(role.id in allowed_roles for role in member.roles)
             or member.guild_permissions.administrator
         )
 
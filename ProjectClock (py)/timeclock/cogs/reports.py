@@ -4,8 +4,12 @@ from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict
 
 from timeclock import log
+from timeclock.admission import Workload
+from timeclock.analytics import ComplianceEngine
 from timeclock.bot import TimeClockBot
 from timeclock.database import Member, Time
+from timeclock.embeds import EmbedLayout, pack_messages
+from timeclock.outbound import Priority
 
 logger = log.get_logger(__name__)
 
@@ -15,7 +19,6 @@ class Reports(commands.Cog):
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
-        self.guild_settings = None  # Will store guild-specific settings including work hours
         try:
             self.daily_report.start()
             self.weekly_report.start()
@@ -53,75 +56,71 @@ class Reports(commands.Cog):
     @tasks.loop(minutes=30)
     async def overtime_check(self):
         """Check for overtime and insufficient hours every 30 minutes"""
+        await self.bot.shard_tracker.run("overtime_check", self._check_overtime)
+
+    async def _check_overtime(self, guild: disnake.Guild):
+        """Alert the members of the guild who have been on duty for too long"""
         now = datetime.now(timezone.utc)
-        for guild in self.bot.guilds:
-            try:
-                members = await self.bot.get_members(guild.id)
-                if not members:
-                    continue
-
-                channel = next(
-                    (ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages),
-                    None
-                )
-                if not channel:
-                    continue
-
-                for member in members:
-                    if member.on_duty:
-                        latest_time = member.times[-1]
-                        punch_in = datetime.fromtimestamp(latest_time.punch_in, tz=timezone.utc)
-                        duration = now - punch_in
-                        hours = duration.total_seconds() / 3600
+        channel = await self.bot.channel_cache.get(guild, "alert")
+        if not channel:
+            return
 
-                        if hours >= self.standard_hours + 2:  # 2 hours overtime
-                            user = guild.get_member(member.id)
-                            if user:
-                                embed = disnake.Embed(
-                                    title="تنبيه ساعات العمل الإضافية",
-                                    description=f"⚠️ {user.mention} لديك {int(hours - self.standard_hours)} ساعات عمل إضافية اليوم",
-                                    color=disnake.Color.orange()
-                                )
-                                await channel.send(embed=embed)
+        members = await self.bot.get_members(guild.id)
+        if not members:
+            return
 
-            except Exception as e:
-                logger.error(f"Error checking overtime for guild {guild.id}: {str(e)}")
+        for member in members:
+            if member.on_duty:
+                latest_time = member.times[-1]
+                punch_in = datetime.fromtimestamp(latest_time.punch_in, tz=timezone.utc)
+                duration = now - punch_in
+                hours = duration.total_seconds() / 3600
+
+                if hours >= self.standard_hours + 2:  # 2 hours overtime
+                    user = guild.get_member(member.id)
+                    if user:
+                        embed = disnake.Embed(
+                            title="تنبيه ساعات العمل الإضافية",
+                            description=f"⚠️ {user.mention} لديك {int(hours - self.standard_hours)} ساعات عمل إضافية اليوم",
+                            color=disnake.Color.orange()
+                        )
+                        self.bot.outbound.send(channel, embed=embed, priority=Priority.ALERT)
 
     async def _generate_report(self, days: int, report_type: str):
         """Generate and send attendance report for the specified number of days"""
         logger.info(f"Generating {report_type} attendance report")
 
-        for guild in self.bot.guilds:
-            try:
-                members = await self.bot.get_members(guild.id)
-                if not members:
-                    continue
-
-                channel = next(
-                    (ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages),
-                    None
-                )
-                if not channel:
-                    logger.warning(f"No suitable channel found in guild {guild.name} ({guild.id})")
-                    continue
-
-                # Generate main report embeds
-                embeds = await self.create_report_embed(guild, members, days, report_type)
-                
-                # Add points statistics
-                points_embed = await self.create_points_statistics(guild, days)
-                if points_embed:
-                    await channel.send(embed=points_embed)
-                
-                # Send report embeds in chunks to respect Discord's limit
-                for i in range(0, len(embeds), 10):  # Discord allows max 10 embeds per message
-                    chunk = embeds[i:i + 10]
-                    await channel.send(embeds=chunk)
-                    
-                logger.info(f"{report_type.capitalize()} report sent to guild {guild.name} ({guild.id})")
-                    
-            except Exception as e:
-                logger.error(f"Error generating {report_type} report for guild {guild.id}: {str(e)}")
+        async def report(guild: disnake.Guild):
+            await self._send_report(guild, days, report_type)
+
+        await self.bot.shard_tracker.run(f"{days}d_report", report)
+
+    async def _send_report(self, guild: disnake.Guild, days: int, report_type: str):
+        """Generate and send one guild's attendance report"""
+        # one guild at a time through the heavy slots, so punches and commands go first
+        async with self.bot.admission.slot(Workload.HEAVY):
+            members = await self.bot.get_members(guild.id)
+            if not members:
+                return
+
+            channel = await self.bot.channel_cache.get(guild, "report")
+            if not channel:
+                logger.warning(f"No suitable channel found in guild {guild.name} ({guild.id})")
+                return
+
+            # Generate main report embeds
+            embeds = await self.create_report_embed(guild, members, days, report_type)
+
+            # Add points statistics
+            points_embed = await self.create_points_statistics(guild, days)
+        if points_embed:
+            embeds.insert(0, points_embed)
+
+        # as few messages as Discord's 10 embed / 6000 character limits allow
+        for message_embeds in pack_messages(embeds):
+            self.bot.outbound.send(channel, embeds=message_embeds)
+
+        logger.info(f"{report_type.capitalize()} report queued for guild {guild.name} ({guild.id})")
 
     async def create_points_statistics(self, guild: disnake.Guild, days: int) -> Optional[disnake.Embed]:
         """Create an embed containing points statistics for the specified period"""
@@ -169,16 +168,16 @@ class Reports(commands.Cog):
         start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-        embeds = []
-        current_embed = disnake.Embed(
-            title=f"تقرير الحضور {report_type} - {start_date.strftime('%d/%m/%Y')} إلى {end_date.strftime('%d/%m/%Y')}",
+        layout = EmbedLayout(
+            f"تقرير الحضور {report_type} - {start_date.strftime('%d/%m/%Y')} إلى {end_date.strftime('%d/%m/%Y')}",
+            continued_title=f"تقرير الحضور {report_type} (تابع)",
             color=disnake.Color.blue()
         )
 
         total_hours = 0
         total_members = 0
         details = []
-        attendance_stats = self._calculate_attendance_stats(members, start_date, end_date)
+        attendance_stats = await self._calculate_attendance_stats(guild.id, members, start_date, end_date)
 
         for member in members:
             member_times = []
@@ -208,86 +207,89 @@ class Reports(commands.Cog):
                     total_hours_member = daily_total.total_seconds() / 3600
                     total_minutes_member = (total_hours_member % 1) * 60
                     member_details.append(f"المجموع: {int(total_hours_member)} ساعة و {int(total_minutes_member)} دقيقة\n")
-                    
-                    # Check if adding this member's details would exceed Discord's character limit
-                    potential_description = "\n".join(details + member_details)
-                    if len(potential_description) > 4096:  # Discord's embed description limit
-                        # Finalize current embed
-                        current_embed.description = "\n".join(details)
-                        embeds.append(current_embed)
-                        
-                        # Create new embed
-                        current_embed = disnake.Embed(
-                            title=f"تقرير الحضور {report_type} (تابع)",
-                            color=disnake.Color.blue()
-                        )
-                        details = member_details
-                    else:
-                        details.extend(member_details)
-                    
+
+                    # one row per member, so a member is only split when their times alone
+                    # don't fit in one embed
+                    details.append("\n".join(member_details))
                     total_hours += daily_total.total_seconds() / 3600
 
-        if details:  # Add the last set of details
-            avg_hours_per_member = total_hours / total_members
-            current_embed.description = "\n".join(details)
-            
-            # Add statistical analysis
-            stats_text = f"📊 **إحصائيات الحضور**\n"
-            stats_text += f"• متوسط ساعات العمل اليومية: {attendance_stats['avg_daily_hours']:.1f} ساعة\n"
-            stats_text += f"• نسبة الالتزام بساعات العمل: {attendance_stats['compliance_rate']:.0%}\n"
-            stats_text += f"• عدد ساعات العمل الإضافية: {attendance_stats['total_overtime']:.1f} ساعة\n"
-            stats_text += f"• معدل الحضور: {attendance_stats['attendance_rate']:.0%}\n\n"
-            
-            current_embed.add_field(name="التحليل الإحصائي", value=stats_text, inline=False)
-            
-            total_minutes = (total_hours % 1) * 60
-            footer_text = f"مجموع الساعات: {int(total_hours)} ساعة و {int(total_minutes)} دقيقة\n"
-            footer_text += f"متوسط الساعات لكل عضو: {int(avg_hours_per_member)} ساعة و {int((avg_hours_per_member % 1) * 60)} دقيقة"
-            current_embed.set_footer(text=footer_text)
-            embeds.append(current_embed)
-        else:
-            current_embed.description = f"لا توجد سجلات حضور خلال الفترة المحددة."
-            embeds.append(current_embed)
+        if not details:
+            return layout.build([f"لا توجد سجلات حضور خلال الفترة المحددة."])
 
-        return embeds
+        avg_hours_per_member = total_hours / total_members
 
-    def _calculate_attendance_stats(self, members: List[Member], start_date: datetime, end_date: datetime) -> Dict:
+        # Add statistical analysis
+        stats_text = f"📊 **إحصائيات الحضور**\n"
+        stats_text += f"• متوسط ساعات العمل اليومية: {attendance_stats['avg_daily_hours']:.1f} ساعة\n"
+        stats_text += f"• نسبة الالتزام بساعات العمل: {attendance_stats['compliance_rate']:.0%}\n"
+        stats_text += f"• عدد ساعات العمل الإضافية: {attendance_stats['total_overtime']:.1f} ساعة\n"
+        stats_text += f"• دقائق التأخير: {attendance_stats['late_minutes']:.0f} دقيقة\n"
+        stats_text += f"• دقائق الانصراف المبكر: {attendance_stats['early_minutes']:.0f} دقيقة\n"
+        stats_text += f"• معدل الحضور (باستثناء أيام الإجازات): {attendance_stats['attendance_rate']:.0%}\n"
+        stats_text += f"• أعضاء في إجازة اليوم: {attendance_stats['on_leave_today']}\n\n"
+
+        total_minutes = (total_hours % 1) * 60
+        footer_text = f"مجموع الساعات: {int(total_hours)} ساعة و {int(total_minutes)} دقيقة\n"
+        footer_text += f"متوسط الساعات لكل عضو: {int(avg_hours_per_member)} ساعة و {int((avg_hours_per_member % 1) * 60)} دقيقة"
+
+        return layout.build(
+            details, [("التحليل الإحصائي", stats_text, False)], footer=footer_text
+        )
+
+    async def _calculate_attendance_stats(self, guild_id: int, members: List[Member], start_date: datetime, end_date: datetime) -> Dict:
         """Calculate attendance statistics for the given period"""
         total_hours = 0
         total_days = (end_date - start_date).days + 1
-        total_expected_hours = 0
         attendance_days = set()
-        overtime_hours = 0
+        member_sessions = {}
+        # member-days on approved leave are neither expected attendance nor scheduled time
+        leave_days = await self.bot.leave_cache.leave_days(
+            guild_id, start_date.date(), end_date.date() + timedelta(days=1)
+        )
+        attended_member_days = expected_member_days = 0
 
         for member in members:
             member_days = set()
+            sessions = member_sessions.setdefault(member.id, [])
             for time in member.times:
                 punch_in = datetime.fromtimestamp(time.punch_in, tz=timezone.utc)
                 if start_date <= punch_in <= end_date:
                     punch_out = datetime.fromtimestamp(time.punch_out, tz=timezone.utc) if time.punch_out else None
                     if punch_out:
                         duration = punch_out - punch_in
-                        hours = duration.total_seconds() / 3600
-                        total_hours += hours
+                        total_hours += duration.total_seconds() / 3600
                         member_days.add(punch_in.date())
-                        
-                        # Calculate overtime based on configured work hours
-                        if self.guild_settings:
-                            work_hours = self.guild_settings.get_work_hours(punch_in.weekday())
-                            if work_hours:
-                                start_time, end_time = work_hours
-                                expected_hours = (end_time.hour + end_time.minute/60) - (start_time.hour + start_time.minute/60)
-                                if hours > expected_hours:
-                                    overtime_hours += hours - expected_hours
-                                total_expected_hours += expected_hours
+                        sessions.append((time.punch_in, time.punch_out))
 
             attendance_days.update(member_days)
+            on_leave = leave_days.get(member.id, set())
+            attended_member_days += len(member_days - on_leave)
+            expected_member_days += total_days - len(on_leave)
+
+        # Exact in-schedule coverage, lateness and overtime against configured work hours
+        config = self.bot.get_guild_config(guild_id)
+        if config.work_hours:
+            engine = ComplianceEngine(config)
+            # a scheduled report waits for the pool instead of being dropped
+            summary = await self.bot.executor.run_cpu(
+                engine.summarize_guild,
+                member_sessions,
+                start_date,
+                end_date,
+                skip_days=leave_days,
+                wait=True,
+            )
+        else:
+            summary = None
 
         return {
             'avg_daily_hours': total_hours / max(len(attendance_days), 1),
-            'compliance_rate': min(total_hours / total_expected_hours if total_expected_hours > 0 else 1, 1),
-            'total_overtime': overtime_hours,
-            'attendance_rate': len(attendance_days) / total_days if total_days > 0 else 0
+            'compliance_rate': summary.compliance_rate if summary else 1,
+            'total_overtime': summary.overtime_hours if summary else 0,
+            'late_minutes': summary.late_minutes if summary else 0,
+            'early_minutes': summary.early_minutes if summary else 0,
+            'attendance_rate': attended_member_days / expected_member_days if expected_member_days > 0 else 0,
+            'on_leave_today': len(await self.bot.leave_cache.on_leave(guild_id, datetime.now(timezone.utc).date()))
         }
 
     @overtime_check.before_loop
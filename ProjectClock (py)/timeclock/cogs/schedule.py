@@ -1,17 +1,58 @@
+import io
 import disnake
 from disnake.ext import commands
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from timeclock.bot import TimeClockBot
-from timeclock.calendar_sync import CalendarSync
+from timeclock.calendar_sync import CalendarSync, parse_datetime
+from timeclock.constants import Ics
+from timeclock.ics import IcsFeed, IcsFeedCache, IcsServer, feed_token
+
+# sessions sent on a member's first sync; later syncs send everything after the watermark
+INITIAL_SYNC_SESSIONS = 10
 
 class Schedule(commands.Cog):
     """إدارة جداول العمل والمواعيد"""
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
-        self.calendar = CalendarSync()
+        self.calendar = CalendarSync(bot.executor)
+        self.feeds = IcsFeedCache(bot.db)
+        self.feed_server = IcsServer(self._resolve_feed, Ics.secret, Ics.host, Ics.port) if Ics.secret else None
+
+    async def cog_load(self) -> None:
+        if self.feed_server:
+            await self.feed_server.start()
+
+    def cog_unload(self) -> None:
+        if self.feed_server:
+            self.bot.loop.create_task(self.feed_server.stop())
+
+    async def _resolve_feed(self, guild_id: int, kind: str, target_id: int) -> Optional[IcsFeed]:
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return None
+
+        if kind == "team":
+            team = await self.bot.team_cache.get_team(guild_id, target_id)
+            if not team:
+                return None
+            name, member_ids = f"{guild.name} - {team.name}", team.members
+        else:
+            member = guild.get_member(target_id)
+            if not member:
+                return None
+            name, member_ids = f"{guild.name} - {member.display_name}", {target_id}
+
+        names = {}
+        for member_id in member_ids:
+            member = guild.get_member(member_id)
+            names[member_id] = member.display_name if member else str(member_id)
+
+        return await self.feeds.get_feed(
+            (guild_id, kind, target_id), name, names, self.bot.get_guild_config(guild_id)
+        )
 
     @commands.slash_command(name="schedule")
     async def schedule(self, inter: disnake.ApplicationCommandInteraction):
@@ -22,41 +63,81 @@ class Schedule(commands.Cog):
         """مزامنة جدول العمل مع تقويم Google"""
         await inter.response.defer()
 
-        if not self.calendar.authenticate():
+        if not await self.calendar.aauthenticate():
             await inter.edit_original_response(
                 content="⚠️ يرجى إعداد مصادقة Google Calendar أولاً. راجع المشرف للحصول على المساعدة."
             )
             return
 
-        member = await self.bot.get_members(inter.guild.id, member_id=inter.author.id)
-        if not member:
-            await inter.edit_original_response(
-                content="❌ لم يتم العثور على سجلات دوام خاصة بك."
-            )
-            return
+        guild_id, member_id = inter.guild.id, inter.author.id
+        watermark = await self.bot.db.get_calendar_watermark(guild_id, member_id)
+
+        # only sessions from the last synced one onwards are read; sessions before it can't change
+        times = [
+            time async for time in self.bot.db.iter_member_times(guild_id, [member_id], start=watermark)
+        ]
+        times.sort(key=lambda time: time["punch_in"])
+        if watermark is None:
+            times = times[-INITIAL_SYNC_SESSIONS:]
 
-        recent_times = [time for time in member.times[-10:]]
-        if not recent_times:
+        if not times:
             await inter.edit_original_response(
                 content="❌ لا توجد سجلات دوام حديثة لمزامنتها."
             )
             return
 
-        synced_events = 0
-        for time in recent_times:
-            start_time = datetime.fromtimestamp(time.punch_in, tz=timezone.utc)
-            if time.punch_out:
-                end_time = datetime.fromtimestamp(time.punch_out, tz=timezone.utc)
-                description = f"سجل الدوام - {inter.guild.name}"
-                
-                event_id = self.calendar.add_work_schedule(
-                    start_time, end_time, description
-                )
-                if event_id:
-                    synced_events += 1
+        synced = await self.bot.db.get_calendar_events(guild_id, member_id, since=times[0]["punch_in"])
+        description = f"سجل الدوام - {inter.guild.name}"
+        inserts, patches = [], []
+        for time in times:
+            if not time.get("punch_out"):
+                continue
+
+            event = synced.get(time["punch_in"])
+            if event is None:
+                inserts.append(time)
+            elif event["punch_out"] != time["punch_out"]:
+                patches.append((time, event["event_id"]))
+
+        if not inserts and not patches:
+            await inter.edit_original_response(content="✅ تقويم Google محدث بالفعل.")
+            return
+
+        def span(time: dict):
+            return (
+                datetime.fromtimestamp(time["punch_in"], tz=timezone.utc),
+                datetime.fromtimestamp(time["punch_out"], tz=timezone.utc),
+            )
+
+        event_ids = await self.calendar.aadd_work_schedules(
+            [(*span(time), description) for time in inserts],
+            event_ids=[self.calendar.event_id(guild_id, member_id, time["punch_in"]) for time in inserts]
+        ) if inserts else []
+        patched = await self.calendar.apatch_work_schedules(
+            [(event_id, *span(time), description) for time, event_id in patches]
+        ) if patches else []
+
+        saved = {}
+        for time, event_id in zip(inserts, event_ids):
+            if event_id:
+                saved[time["punch_in"]] = {**time, "event_id": event_id}
+        for (time, event_id), ok in zip(patches, patched):
+            if ok:
+                saved[time["punch_in"]] = {**time, "event_id": event_id}
+
+        # the watermark stops before the first open or failed session so the next sync retries it
+        failed = {time["punch_in"] for time in inserts} | {time["punch_in"] for time, _ in patches}
+        failed.difference_update(saved)
+        new_watermark = None
+        for time in times:
+            if not time.get("punch_out") or time["punch_in"] in failed:
+                break
+            new_watermark = time["punch_in"]
+
+        await self.bot.db.save_calendar_events(guild_id, member_id, saved.values(), new_watermark)
 
         await inter.edit_original_response(
-            content=f"✅ تمت مزامنة {synced_events} من سجلات الدوام مع تقويم Google."
+            content=f"✅ تمت مزامنة {len(saved)} من سجلات الدوام مع تقويم Google."
         )
 
     @schedule.sub_command(name="view-schedule")
@@ -74,16 +155,16 @@ class Schedule(commands.Cog):
         """
         await inter.response.defer()
 
-        if not self.calendar.authenticate():
+        if not await self.calendar.aauthenticate():
             await inter.edit_original_response(
                 content="⚠️ يرجى إعداد مصادقة Google Calendar أولاً. راجع المشرف للحصول على المساعدة."
             )
             return
 
         start_date = datetime.now(timezone.utc)
-        end_date = start_date.replace(hour=23, minute=59, second=59)
+        end_date = start_date + timedelta(days=days)
 
-        events = self.calendar.get_work_schedules(start_date, end_date)
+        events = await self.calendar.aget_work_schedules(start_date, end_date)
         if not events:
             await inter.edit_original_response(
                 content="ℹ️ لا توجد مواعيد عمل مجدولة للفترة المحددة."
@@ -97,8 +178,8 @@ class Schedule(commands.Cog):
         )
 
         for event in events:
-            start = datetime.fromisoformat(event['start']['dateTime'])
-            end = datetime.fromisoformat(event['end']['dateTime'])
+            start = parse_datetime(event['start']['dateTime'])
+            end = parse_datetime(event['end']['dateTime'])
             duration = end - start
             hours = duration.total_seconds() / 3600
 
@@ -110,5 +191,40 @@ class Schedule(commands.Cog):
 
         await inter.edit_original_response(embed=embed)
 
+    @schedule.sub_command(name="ics-feed")
+    async def ics_feed(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        team_id: Optional[int] = commands.Param(None, description="رقم الفريق (اتركه فارغاً لتقويمك الشخصي)")
+    ):
+        """تقويم iCalendar لسجلات الدوام ومواعيد العمل، بدون الحاجة لحساب Google"""
+        await inter.response.defer(ephemeral=True)
+
+        kind, target_id = ("team", team_id) if team_id else ("member", inter.author.id)
+        # a team's feed, and the subscription link that outlives the command, go to its members
+        if (
+            kind == "team"
+            and not inter.author.guild_permissions.administrator
+            and inter.author.id not in await self.bot.team_cache.members_of_team(inter.guild.id, team_id)
+        ):
+            await inter.edit_original_response(content="❌ يمكنك فقط الحصول على تقويم فريق أنت عضو فيه")
+            return
+
+        feed = await self._resolve_feed(inter.guild.id, kind, target_id)
+        if not feed:
+            await inter.edit_original_response(content="❌ لم يتم العثور على الفريق")
+            return
+
+        content = f"📅 التقويم يحتوي على {feed.events} من سجلات الدوام."
+        if self.feed_server:
+            token = feed_token(Ics.secret, inter.guild.id, kind, target_id)
+            url = f"{Ics.base_url}/ics/{inter.guild.id}/{kind}/{target_id}.ics?token={token}"
+            content += f"\nرابط الاشتراك (يتحدث تلقائياً): <{url}>"
+
+        await inter.edit_original_response(
+            content=content,
+            file=disnake.File(io.BytesIO(feed.render()), filename=f"timeclock-{kind}-{target_id}.ics")
+        )
+
 def setup(bot: TimeClockBot) -> None:
     bot.add_cog(Schedule(bot))
\ No newline at end of file
@@ -1,25 +1,25 @@
-import csv
-import json
-from datetime import datetime, timezone
-from io import StringIO, BytesIO
+import time
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 import disnake
 from disnake.ext import commands
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
 
+from timeclock import components, export, log
+from timeclock.admission import Workload
 from timeclock.bot import TimeClockBot
-from timeclock.database.team import Team
+from timeclock.executor import ExecutorBusy
+
+logger = log.get_logger(__name__)
+
+MAX_LISTED_MEMBERS = 20
+EXPORT_BATCH_SIZE = 1000
 
 class Teams(commands.Cog):
     """إدارة الفرق والأقسام"""
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
-        self.teams = {}
 
     @commands.slash_command(name="team")
     @commands.has_permissions(administrator=True)
@@ -31,13 +31,11 @@ class Teams(commands.Cog):
                          name: str = commands.Param(description="اسم الفريق"),
                          leader: Optional[disnake.Member] = None):
         """إنشاء فريق جديد"""
-        team_id = len(self.teams) + 1
-        team = Team(team_id, name, inter.guild.id, leader.id if leader else None)
-        self.teams[team_id] = team
+        team = await self.bot.team_cache.create_team(inter.guild.id, name, leader.id if leader else None)
 
         embed = disnake.Embed(
             title="✅ تم إنشاء الفريق",
-            description=f"تم إنشاء فريق {name} بنجاح",
+            description=f"تم إنشاء فريق {name} بنجاح (ID: {team.id})",
             color=disnake.Color.green()
         )
         if leader:
@@ -48,130 +46,134 @@ class Teams(commands.Cog):
     @team.sub_command(name="add-member")
     async def add_team_member(self, inter: disnake.ApplicationCommandInteraction,
                             team_id: int = commands.Param(description="رقم الفريق"),
-                            member: disnake.Member = commands.Param(description="العضو المراد إضافته")):
+                            member: disnake.Member = components.MemberParam(description="العضو المراد إضافته")):
         """إضافة عضو إلى الفريق"""
-        if team_id not in self.teams:
+        team = await self.bot.team_cache.get_team(inter.guild.id, team_id)
+        if not team:
             await inter.response.send_message("❌ لم يتم العثور على الفريق المحدد", ephemeral=True)
             return
 
-        team = self.teams[team_id]
-        if team.add_member(member.id):
+        if await self.bot.team_cache.add_member(inter.guild.id, team_id, member.id):
             await inter.response.send_message(f"✅ تمت إضافة {member.mention} إلى الفريق {team.name}")
         else:
             await inter.response.send_message("❌ العضو موجود بالفعل في الفريق", ephemeral=True)
 
-    @team.sub_command(name="export")
+    @add_team_member.autocomplete("team_id")
+    async def team_autocomplete(self, inter: disnake.ApplicationCommandInteraction, string: str):
+        """اقتراح الفرق بالاسم"""
+        names = await self.bot.team_cache.names(inter.guild.id)
+        return {f"{name} ({team_id})": team_id for team_id, name in names.search(string)}
+
+    @team.sub_command(name="export", extras={"workload": Workload.HEAVY})
     async def export_team_data(self, inter: disnake.ApplicationCommandInteraction,
                              team_id: Optional[int] = commands.Param(None, description="رقم الفريق (اتركه فارغاً لتصدير بيانات جميع الفرق)"),
-                             format: str = commands.Param(choices=["csv", "json", "xlsx", "pdf"], description="صيغة التصدير")):
+                             format: str = commands.Param(choices=list(export.FORMATS), description="صيغة التصدير"),
+                             start_date: Optional[str] = commands.Param(None, description="من تاريخ (YYYY-MM-DD)"),
+                             end_date: Optional[str] = commands.Param(None, description="إلى تاريخ (YYYY-MM-DD)")):
         """تصدير بيانات الحضور للفريق"""
         await inter.response.defer()
 
-        if team_id and team_id not in self.teams:
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() if start_date else None
+            end = (datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)).timestamp() if end_date else None
+        except ValueError:
+            await inter.followup.send("❌ صيغة التاريخ غير صحيحة. الرجاء استخدام الصيغة YYYY-MM-DD", ephemeral=True)
+            return
+
+        team = await self.bot.team_cache.get_team(inter.guild.id, team_id) if team_id else None
+        if team_id and not team:
             await inter.followup.send("❌ لم يتم العثور على الفريق المحدد", ephemeral=True)
             return
 
-        data = []
-        teams_to_export = [self.teams[team_id]] if team_id else self.teams.values()
+        teams_to_export = [team] if team else await self.bot.team_cache.get_teams(inter.guild.id)
 
+        # a member can be in several of the exported teams, and gets one row per team
+        member_teams = {}
         for team in teams_to_export:
             for member_id in team.members:
-                member_data = await self.bot.get_members(inter.guild.id, member_id=member_id)
-                if member_data:
-                    user = inter.guild.get_member(member_id)
-                    if user:
-                        for time in member_data.times:
-                            data.append({
-                                'team_name': team.name,
-                                'member_name': user.display_name,
-                                'punch_in': datetime.fromtimestamp(time.punch_in, tz=timezone.utc).isoformat(),
-                                'punch_out': datetime.fromtimestamp(time.punch_out, tz=timezone.utc).isoformat() if time.punch_out else None,
-                                'duration': time.as_seconds() / 3600 if time.punch_out else None
-                            })
-
-        if not data:
-            await inter.followup.send("❌ لا توجد بيانات للتصدير", ephemeral=True)
+                member_teams.setdefault(member_id, []).append(team.name)
+
+        started = time.perf_counter()
+        writer = export.open_writer(format)
+        executor = self.bot.executor
+        batch = []
+
+        try:
+            entries = self.bot.db.iter_member_times(
+                inter.guild.id, list(member_teams), start=start, end=end
+            )
+            async for entry in entries:
+                user = inter.guild.get_member(entry["member_id"])
+                if not user:
+                    continue
+
+                for team_name in member_teams[entry["member_id"]]:
+                    batch.append((
+                        team_name,
+                        user.id,
+                        user.display_name,
+                        entry["punch_in"],
+                        entry.get("punch_out")
+                    ))
+
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    await writer.awrite_rows(batch, executor, deadline=inter.expires_at)
+                    batch = []
+
+            if batch:
+                await writer.awrite_rows(batch, executor, deadline=inter.expires_at)
+
+            if not writer.rows:
+                await writer.aabort(executor)
+                await inter.followup.send("❌ لا توجد بيانات للتصدير", ephemeral=True)
+                return
+
+            output = await writer.aclose(executor, deadline=inter.expires_at)
+
+        except (ExecutorBusy, TimeoutError) as e:
+            await writer.aabort(executor)
+            logger.warning(f"Export for guild {inter.guild.id} was not completed: {e}")
+            await inter.followup.send("⏳ الخادم مشغول حالياً، يرجى المحاولة لاحقاً", ephemeral=True)
             return
+        except Exception:
+            await writer.aabort(executor)
+            raise
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Exported {writer.rows} rows as {format} for guild {inter.guild.id} in {elapsed:.2f}s "
+            f"({writer.rows / max(elapsed, 1e-9):.0f} rows/s)"
+        )
 
-        if format == "json":
-            file_content = json.dumps(data, ensure_ascii=False, indent=2)
-            file = disnake.File(StringIO(file_content), filename="attendance_data.json")
-        elif format == "csv":
-            output = StringIO()
-            writer = csv.DictWriter(output, fieldnames=['team_name', 'member_name', 'punch_in', 'punch_out', 'duration'])
-            writer.writeheader()
-            writer.writerows(data)
-            file = disnake.File(StringIO(output.getvalue()), filename="attendance_data.csv")
-        elif format == "xlsx":
-            df = pd.DataFrame(data)
-            df['duration'] = df['duration'].apply(lambda x: f"{x:.2f}" if x is not None else "")
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Attendance Data', index=False)
-                workbook = writer.book
-                worksheet = writer.sheets['Attendance Data']
-                header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                worksheet.set_column('A:E', 20)
-            output.seek(0)
-            file = disnake.File(output, filename="attendance_data.xlsx")
-        else:  # PDF
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            elements = []
-
-            table_data = [["Team Name", "Member Name", "Punch In", "Punch Out", "Duration (Hours)"]]
-            for item in data:
-                table_data.append([
-                    item['team_name'],
-                    item['member_name'],
-                    item['punch_in'],
-                    item['punch_out'] or "",
-                    f"{item['duration']:.2f}" if item['duration'] else ""
-                ])
-
-            table = Table(table_data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 12),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(table)
-            doc.build(elements)
-            buffer.seek(0)
-            file = disnake.File(buffer, filename="attendance_data.pdf")
-
-        await inter.followup.send("✅ تم تصدير البيانات بنجاح", file=file)
+        with output:
+            file = disnake.File(output, filename=f"attendance_data.{writer.extension}")
+            await inter.followup.send("✅ تم تصدير البيانات بنجاح", file=file)
 
     @team.sub_command(name="list")
     async def list_teams(self, inter: disnake.ApplicationCommandInteraction):
         """عرض قائمة الفرق"""
-        if not self.teams:
+        teams = await self.bot.team_cache.get_teams(inter.guild.id)
+        if not teams:
             await inter.response.send_message("لا توجد فرق حالياً", ephemeral=True)
             return
 
+        aggregates = await self.bot.team_cache.get_aggregates(inter.guild.id)
+
         embed = disnake.Embed(
             title="📋 قائمة الفرق",
             color=disnake.Color.blue()
         )
 
-        for team in self.teams.values():
-            members = [inter.guild.get_member(mid).mention for mid in team.members if inter.guild.get_member(mid)]
-            leader = inter.guild.get_member(team.leader_id) if team.leader_id else None
-            
-            value = f"القائد: {leader.mention if leader else 'لا يوجد'}\n"
-            value += f"الأعضاء: {', '.join(members) if members else 'لا يوجد'}"
-            
+        for team in teams[:25]:
+            aggregate = aggregates[team.id]
+            members = [f"<@{mid}>" for mid in sorted(team.members)[:MAX_LISTED_MEMBERS]]
+            if len(team.members) > MAX_LISTED_MEMBERS:
+                members.append(f"+{len(team.members) - MAX_LISTED_MEMBERS}")
+
+            value = f"القائد: {f'<@{team.leader_id}>' if team.leader_id else 'لا يوجد'}\n"
+            value += f"الأعضاء ({aggregate.member_count}): {', '.join(members) if members else 'لا يوجد'}\n"
+            value += f"على رأس العمل: {aggregate.on_duty} | ساعات هذا الأسبوع: {aggregate.hours_this_week:.1f}"
+
             embed.add_field(
                 name=f"{team.name} (ID: {team.id})",
                 value=value,
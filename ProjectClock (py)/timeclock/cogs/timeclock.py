@@ -1,11 +1,24 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import disnake
 from disnake.ext import commands
 
 from timeclock import components
+from timeclock.admission import Workload
 from timeclock.bot import TimeClockBot
 from timeclock.database import Member
+from timeclock.embeds import EmbedLayout
+from timeclock.roster import render_roster, roster_rows
+
+# members per page of the all members timesheet
+TIMESHEET_PAGE_ROWS = 20
+# members per page of the on duty roster
+ROSTER_PAGE_ROWS = 25
+
+
+def timesheet_workload(inter: disnake.ApplicationCommandInteraction) -> Workload:
+    """The all members timesheet loads every member's history"""
+    return Workload.HEAVY if inter.options.get("all_members") else Workload.READ
 
 
 class TimeClock(commands.Cog):
@@ -13,6 +26,31 @@ class TimeClock(commands.Cog):
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
+        self.bot.page_sources["ts"] = self.timesheet_pages
+        self.bot.page_sources["duty"] = self.on_duty_pages
+
+    def cog_unload(self) -> None:
+        self.bot.page_sources.pop("ts", None)
+        self.bot.page_sources.pop("duty", None)
+
+    async def timesheet_pages(
+        self, inter: disnake.MessageInteraction, params: Tuple[str, ...]
+    ) -> components.RowPageSource:
+        """Rebuild the all members timesheet pages for a page button click"""
+        members = await self.bot.get_members(inter.guild.id)
+        return self.create_all_member_timesheet_pages(inter.guild, members or [], int(params[0]))
+
+    async def on_duty_pages(
+        self, inter: disnake.Interaction, params: Tuple[str, ...] = ()
+    ) -> components.RowPageSource:
+        """The guild's on duty roster, straight from the on-duty index"""
+        guild = inter.guild
+        rows = roster_rows(await self.bot.on_duty.get(guild.id))
+        return components.RowPageSource(
+            rows,
+            lambda page, index: render_roster(guild, page, len(rows), index),
+            per_page=ROSTER_PAGE_ROWS,
+        )
 
     async def check_member_permissions(self, inter: disnake.GuildCommandInteraction) -> bool:
         """Checks if the member contains any of the mod_roles or has the administrator permissions
@@ -39,13 +77,13 @@ class TimeClock(commands.Cog):
             f"{int(days)} يوم, {int(hours)} ساعة, {int(minutes)} دقيقة, {int(seconds)} ثانية"
         )
 
-    def create_all_member_timesheet_embed(
+    def create_all_member_timesheet_pages(
         self, guild: disnake.Guild, members: List[Member], limit: int
-    ) -> List[disnake.Embed]:
+    ) -> components.RowPageSource:
         """
-        Creates and returns a list of embeds that display all members with punch time, their
-        current on_duty status, and total on duty time. The content is split into multiple embeds
-        if the description exceeds 1000 characters. Embeds after the first one have a title like
+        Creates and returns a page source that displays all members with punch time, their
+        current on_duty status, and total on duty time, `TIMESHEET_PAGE_ROWS` members per page.
+        Pages are rendered when they are shown; pages after the first one have a title like
         title="Member Time Totals (continued)".
 
         Parameters
@@ -59,48 +97,38 @@ class TimeClock(commands.Cog):
 
         Returns
         -------
-        List[disnake.Embed]
-            The list of created embeds
+        components.RowPageSource
+            The page source for a `components.Pagination` view
         """
 
-        def create_embed(title, description):
-            embed = disnake.Embed(title=title, description=description)
-            embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
-            embed.set_footer(text="🟢 On Duty | 🔴 Off Duty")
-            return embed
-
-        total_time = 0
-        for member in members:
-            total_time += sum(time.as_seconds() for time in member.limit_history(limit))
-
-        total_time_as_string = self.calculate_time_totals(total_time)
-        descriptions = [
-            f"**Total On Duty time for the last {limit} days**\n{total_time_as_string}\n\n"
-        ]
-        current_description = descriptions[0]
-
-        for member in members:
-            line = f"{member.as_string(guild)}\n"
-            if len(current_description + line) > 1000:
-                descriptions.append(line)
-                current_description = descriptions[-1]  # Change to the last description in the list
-            else:
-                current_description += line
-                descriptions[-1] = current_description  # Update the last description in the list
-
-        embeds = [
-            create_embed("Member Time Totals" if i == 0 else "Member Time Totals (continued)", desc)
-            for i, desc in enumerate(descriptions)
-        ]
-        return embeds
-
-    @commands.slash_command(name="timesheet")
+        def render(rows: List[Member], index: int) -> disnake.Embed:
+            lines = [member.as_string(guild) for member in rows]
+            if index == 0:
+                total_time = 0
+                for member in members:
+                    total_time += sum(time.as_seconds() for time in member.limit_history(limit))
+
+                total_time_as_string = self.calculate_time_totals(total_time)
+                lines.insert(
+                    0, f"**Total On Duty time for the last {limit} days**\n{total_time_as_string}\n"
+                )
+
+            layout = EmbedLayout(
+                "Member Time Totals" if index == 0 else "Member Time Totals (continued)",
+                footer="🟢 On Duty | 🔴 Off Duty",
+                thumbnail=guild.icon.url if guild.icon else None,
+            )
+            return layout.build(lines)[0]
+
+        return components.RowPageSource(members, render, per_page=TIMESHEET_PAGE_ROWS)
+
+    @commands.slash_command(name="timesheet", extras={"workload": timesheet_workload})
     async def timesheet(
         self,
         inter: disnake.GuildCommandInteraction,
         history: int = commands.Param(7, ge=1, le=31),
         all_members: Optional[bool] = False,
-        member: Optional[disnake.Member] = None,
+        member: Optional[disnake.Member] = components.MemberParam(None),
     ) -> None:
         """View your timesheet (Only admins are allowed to pass a specific member)
 
@@ -141,16 +169,14 @@ class TimeClock(commands.Cog):
                         "No members have clocked in yet!", ephemeral=True
                     )
 
-                embeds = self.create_all_member_timesheet_embed(inter.guild, all_members, history)
-                if len(embeds) == 1:
+                pages = self.create_all_member_timesheet_pages(inter.guild, all_members, history)
+                if pages.page_count == 1:
                     await inter.followup.send(
-                        embed=embeds[0], components=components.TrashButton(inter.author.id)
+                        embed=await pages.render(0), components=components.TrashButton(inter.author.id)
                     )
                     return
 
-                await inter.followup.send(
-                    embed=embeds[0], view=components.Pagination(embeds, inter.author)
-                )
+                await components.Pagination("ts", pages, inter.author, (str(history),)).send(inter)
                 return
 
         member = member or inter.author
@@ -167,5 +193,18 @@ class TimeClock(commands.Cog):
         await inter.followup.send(embed=embed, components=components.TrashButton(inter.author.id))
 
 
+    @commands.slash_command(name="onduty")
+    async def on_duty(self, inter: disnake.GuildCommandInteraction) -> None:
+        """View who is on duty right now, and since when"""
+        pages = await self.on_duty_pages(inter)
+        if pages.page_count == 1:
+            await inter.response.send_message(
+                embed=await pages.render(0), components=components.TrashButton(inter.author.id)
+            )
+            return
+
+        await components.Pagination("duty", pages, inter.author).send(inter)
+
+
 def setup(bot: TimeClockBot) -> None:
     bot.add_cog(TimeClock(bot))
@@ -11,12 +11,9 @@ class WorkHours(commands.Cog):
 
     def __init__(self, bot: TimeClockBot) -> None:
         self.bot = bot
-        self.guild_configs = {}
 
     def get_guild_config(self, guild_id: int) -> GuildConfig:
-        if guild_id not in self.guild_configs:
-            self.guild_configs[guild_id] = GuildConfig(guild_id)
-        return self.guild_configs[guild_id]
+        return self.bot.get_guild_config(guild_id)
 
     @commands.slash_command(name="workhours")
     @commands.has_permissions(administrator=True)
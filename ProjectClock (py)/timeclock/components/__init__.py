@@ -1,6 +1,8 @@
 from .buttons import TrashButton
 from .default import default_embed
 from .modal import EditEmbed
+from .params import MemberParam
+from .pages import ListPageSource, PageSource, PageState, RowPageSource
 from .views import EditEmbedButtons, Pagination
 
 __all__ = (
@@ -9,4 +11,9 @@ __all__ = (
     "EmbedEmbed",
     "EditEmbedButtons",
     "Pagination",
+    "PageSource",
+    "ListPageSource",
+    "RowPageSource",
+    "PageState",
+    "MemberParam",
 )
@@ -0,0 +1,119 @@
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar, Union
+
+import disnake
+
+__all__ = ("PageSource", "ListPageSource", "RowPageSource", "PageState")
+
+# custom_id prefix of page buttons, and Discord's custom_id length limit
+PAGE_PREFIX = "pg"
+MAX_CUSTOM_ID = 100
+
+T = TypeVar("T")
+
+PageRenderer = Callable[[Sequence[T], int], Union[disnake.Embed, Awaitable[disnake.Embed]]]
+
+
+class PageSource(ABC):
+    """Renders the pages of a `Pagination` on demand"""
+
+    @property
+    @abstractmethod
+    def page_count(self) -> int:
+        """The number of pages, at least one"""
+
+    @abstractmethod
+    async def render(self, index: int) -> disnake.Embed:
+        """The embed of page `index`, counted from zero"""
+
+
+class ListPageSource(PageSource):
+    """Pages that are already rendered"""
+
+    def __init__(self, embeds: List[disnake.Embed]) -> None:
+        self.embeds = embeds
+
+    @property
+    def page_count(self) -> int:
+        return len(self.embeds)
+
+    async def render(self, index: int) -> disnake.Embed:
+        return self.embeds[index]
+
+
+class RowPageSource(PageSource, Generic[T]):
+    """Splits rows into pages of `per_page` rows; `render(rows, index)` builds a page's embed
+
+    Only the rows are kept, so a page costs nothing until it is shown.
+    """
+
+    def __init__(self, rows: Sequence[T], render: PageRenderer, *, per_page: int) -> None:
+        self.rows = rows
+        self.per_page = per_page
+        self._render = render
+
+    @property
+    def page_count(self) -> int:
+        return max(1, math.ceil(len(self.rows) / self.per_page))
+
+    async def render(self, index: int) -> disnake.Embed:
+        start = index * self.per_page
+        return await disnake.utils.maybe_coroutine(
+            self._render, self.rows[start : start + self.per_page], index
+        )
+
+
+@dataclass(frozen=True)
+class PageState:
+    """Everything needed to render a page again, encoded into a button's custom_id
+
+    `pg:<kind>:<button>:<page>:<author>:<params...>` with the page and author ID in base 36.
+    `button` only keeps the custom_ids of buttons leading to the same page unique.
+    """
+
+    kind: str
+    page: int
+    author_id: int
+    params: Tuple[str, ...] = ()
+
+    def custom_id(self, button: str) -> str:
+        parts = (
+            PAGE_PREFIX, self.kind, button, _base36(self.page), _base36(self.author_id), *self.params
+        )
+        if any(":" in part for part in parts):
+            raise ValueError(f"Page state parts can't contain ':': {parts}")
+
+        custom_id = ":".join(parts)
+        if len(custom_id) > MAX_CUSTOM_ID:
+            raise ValueError(f"Page state doesn't fit in a custom_id: {custom_id}")
+        return custom_id
+
+    @classmethod
+    def parse(cls, custom_id: str) -> Optional["PageState"]:
+        """The state encoded in `custom_id`, or None if it isn't a page button"""
+        parts = custom_id.split(":")
+        if parts[0] != PAGE_PREFIX:
+            return None
+        try:
+            return cls.from_args(tuple(parts[1:]))
+        except ValueError:
+            return None
+
+    @classmethod
+    def from_args(cls, args: Tuple[str, ...]) -> "PageState":
+        """The state from the parts of a custom_id after `pg:`; raises ValueError if invalid"""
+        if len(args) < 4:
+            raise ValueError(f"Not enough page state parts: {args}")
+        return cls(args[0], int(args[2], 36), int(args[3], 36), tuple(args[4:]))
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        number, digit = divmod(number, 36)
+        encoded = digits[digit] + encoded
+        if number == 0:
+            return encoded
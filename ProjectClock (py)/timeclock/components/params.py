@@ -0,0 +1,33 @@
+from typing import Any, Dict, Optional
+
+import disnake
+from disnake.ext import commands
+
+__all__ = ("MemberParam",)
+
+
+async def member_converter(inter: disnake.ApplicationCommandInteraction, value: str) -> disnake.Member:
+    member = await inter.bot.member_names.resolve(inter.guild, value)
+    if member is None:
+        raise commands.MemberNotFound(value)
+    return member
+
+
+async def member_autocomplete(
+    inter: disnake.ApplicationCommandInteraction, string: str
+) -> Dict[str, str]:
+    return await inter.bot.member_names.autocomplete(inter.guild, string)
+
+
+def MemberParam(default: Any = ..., *, description: Optional[str] = None) -> Any:
+    """A member option autocompleted from the members with timeclock records
+
+    Unlike a `disnake.Member` option it searches display names, usernames and nicknames, so it
+    works in guilds too large for Discord's own member picker. Resolves to a `disnake.Member`.
+    """
+    return commands.Param(
+        default,
+        description=description,
+        converter=member_converter,
+        autocomplete=member_autocomplete,
+    )
@@ -1,79 +1,74 @@
-from typing import Union
+from typing import List, Sequence, Union
 
 import disnake
 
 from timeclock import log
 from timeclock.bot import TimeClockBot
+from timeclock.outbound import Priority
 
 from .buttons import TrashButton
 from .modal import EditEmbed
+from .pages import PageSource, PageState
 
 logger = log.get_logger(__name__)
 
 
-class Pagination(disnake.ui.View):
-    def __init__(
-        self, embeds: list[disnake.Embed], author: Union[disnake.Member, disnake.User]
-    ) -> None:
-        super().__init__(timeout=None)
-        self.author = author
-        self.embeds = embeds
-        self.index = 0
-        self.add_item(TrashButton(author.id))
-
-        self._update_state()
-
-    def _update_state(self) -> None:
-        self.first_page.disabled = self.prev_page.disabled = self.index == 0
-        self.last_page.disabled = self.next_page.disabled = self.index == len(self.embeds) - 1
-        self.page_num.label = f"[{self.index+1}/{len(self.embeds)}]"
-        self.page_num.disabled = True
+class Pagination:
+    """Page buttons that carry their own state
 
-    async def inter_check(self, inter: disnake.MessageInteraction) -> bool:
-        if "trash" in inter.component.custom_id:
-            return False
+    Every button's custom_id holds a `PageState`: the kind of pages, the page it leads to, the
+    author and the params the pages are rebuilt from. Nothing is kept in memory, so the buttons
+    keep working after a restart and on any process. The listener cog routes clicks to the
+    factory registered for the kind in `bot.page_sources`, which renders only the requested page.
+    """
 
-        if self.author.id == inter.author.id:
-            return True
-
-        await inter.response.send_message(
-            "Sorry. This is not your message to control", ephemeral=True
-        )
-        return False
-
-    @disnake.ui.button(label="First Page", style=disnake.ButtonStyle.primary)
-    async def first_page(
-        self, button: disnake.ui.Button, inter: disnake.MessageInteraction
+    def __init__(
+        self,
+        kind: str,
+        source: PageSource,
+        author: Union[disnake.Member, disnake.User],
+        params: Sequence[str] = (),
     ) -> None:
-        self.index = 0
-        self._update_state()
-
-        await inter.response.edit_message(embed=self.embeds[self.index], view=self)
-
-    @disnake.ui.button(label="Previous", style=disnake.ButtonStyle.secondary)
-    async def prev_page(self, button: disnake.ui.Button, inter: disnake.MessageInteraction) -> None:
-        self.index -= 1
-        self._update_state()
-
-        await inter.response.edit_message(embed=self.embeds[self.index], view=self)
-
-    @disnake.ui.button(label="1", style=disnake.ButtonStyle.secondary, disabled=True)
-    async def page_num(self, button: disnake.ui.Button, inter: disnake.MessageInteraction):
-        """Just a button that acts as a display to show current page/total pages. Not clickable"""
-
-    @disnake.ui.button(label="Next", style=disnake.ButtonStyle.secondary)
-    async def next_page(self, button: disnake.ui.Button, inter: disnake.MessageInteraction):
-        self.index += 1
-        self._update_state()
-
-        await inter.response.edit_message(embed=self.embeds[self.index], view=self)
-
-    @disnake.ui.button(label="Last Page", style=disnake.ButtonStyle.primary)
-    async def last_page(self, button: disnake.ui.Button, inter: disnake.MessageInteraction):
-        self.index = len(self.embeds) - 1
-        self._update_state()
-
-        await inter.response.edit_message(embed=self.embeds[self.index], view=self)
+        self.kind = kind
+        self.source = source
+        self.author = author
+        self.params = tuple(params)
+
+    @staticmethod
+    def buttons(
+        kind: str, index: int, page_count: int, author_id: int, params: Sequence[str] = ()
+    ) -> List[disnake.ui.ActionRow]:
+        """The navigation and trash buttons for page `index`"""
+
+        def button(key: str, label: str, page: int, style: disnake.ButtonStyle, disabled: bool):
+            return disnake.ui.Button(
+                label=label,
+                style=style,
+                custom_id=PageState(kind, page, author_id, tuple(params)).custom_id(key),
+                disabled=disabled,
+            )
+
+        first, last = index == 0, index == page_count - 1
+        primary, secondary = disnake.ButtonStyle.primary, disnake.ButtonStyle.secondary
+        return [
+            disnake.ui.ActionRow(
+                button("f", "First Page", 0, primary, first),
+                button("p", "Previous", max(index - 1, 0), secondary, first),
+                button("c", f"[{index+1}/{page_count}]", index, secondary, True),
+                button("n", "Next", min(index + 1, page_count - 1), secondary, last),
+                button("l", "Last Page", page_count - 1, primary, last),
+            ),
+            disnake.ui.ActionRow(TrashButton(author_id)),
+        ]
+
+    async def send(self, inter: disnake.Interaction) -> None:
+        """Send the first page as the interaction's response, or as a followup once deferred"""
+        embed = await self.source.render(0)
+        components = self.buttons(self.kind, 0, self.source.page_count, self.author.id, self.params)
+        if inter.response.is_done():
+            await inter.followup.send(embed=embed, components=components)
+        else:
+            await inter.response.send_message(embed=embed, components=components)
 
 
 class EditEmbedButtons(disnake.ui.View):
@@ -95,7 +90,9 @@ class EditEmbedButtons(disnake.ui.View):
     async def send_embed(
         self, channel: disnake.TextChannel, embed: disnake.Embed
     ) -> disnake.Message:
-        message = await channel.send(
+        message = await self.bot.outbound.send(
+            channel,
+            priority=Priority.INTERACTIVE,
             embed=embed,
             components=[
                 disnake.ui.Button(
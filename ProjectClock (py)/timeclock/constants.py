@@ -1,4 +1,5 @@
 import os
+from typing import List, Optional
 
 import disnake
 
@@ -26,6 +27,80 @@ class Database:
     database_name = "timeclock"
 
 
+class Calendar:
+    # point the Google Calendar client at another server, e.g. a local fake for testing
+    api_endpoint = os.getenv("TIMECLOCK_CALENDAR_API_ENDPOINT")
+
+
+class Leaves:
+    annual_days = int(os.getenv("TIMECLOCK_ANNUAL_LEAVE_DAYS", 30))
+
+
+class Ics:
+    # feeds are only served over HTTP when a secret for signing feed links is set
+    secret = os.getenv("TIMECLOCK_ICS_SECRET")
+    host = os.getenv("TIMECLOCK_ICS_HOST", "0.0.0.0")
+    port = int(os.getenv("TIMECLOCK_ICS_PORT", 8080))
+    base_url = os.getenv("TIMECLOCK_ICS_BASE_URL", f"http://localhost:{port}")
+
+
+class Punch:
+    # repeated punch clicks from a member within this window count as one
+    debounce_ms = int(os.getenv("TIMECLOCK_PUNCH_DEBOUNCE_MS", 1500))
+
+
+class Roster:
+    # the live roster message of a guild is edited at most once per this many seconds
+    interval = float(os.getenv("TIMECLOCK_ROSTER_INTERVAL", 10))
+
+
+def _shard_ids(value: Optional[str]) -> Optional[List[int]]:
+    """"0-3,8" -> [0, 1, 2, 3, 8]"""
+    if not value:
+        return None
+
+    shard_ids = []
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        shard_ids.extend(range(int(start), int(end or start) + 1))
+    return shard_ids
+
+
+class Sharding:
+    # shards run by this process, e.g. "0-3"; the others run in other processes of the cluster
+    shard_ids = _shard_ids(os.getenv("TIMECLOCK_SHARD_IDS"))
+    # run the bot as an AutoShardedInteractionBot
+    enabled = os.getenv("TIMECLOCK_SHARDED", "").lower() in ("1", "true", "yes") or bool(shard_ids)
+    # unset uses the shard count Discord recommends; required with shard_ids
+    shard_count = int(os.getenv("TIMECLOCK_SHARD_COUNT") or 0) or None
+
+
+class Leader:
+    # how the processes of a cluster elect the one running cluster-wide jobs: "mongo" for a lease
+    # document, "file" for a lock file on a single host; unset for a single process
+    lease = os.getenv("TIMECLOCK_CLUSTER_LEASE")
+    lock_file = os.getenv("TIMECLOCK_CLUSTER_LOCK_FILE", "timeclock-leader.lock")
+    # a leader that stops renewing is replaced within about this many seconds
+    ttl = float(os.getenv("TIMECLOCK_CLUSTER_LEASE_TTL", 6))
+
+
+class Admission:
+    # slots shared by all interaction work; punches take them first and never wait
+    capacity = int(os.getenv("TIMECLOCK_ADMISSION_CAPACITY", 32))
+    read_limit = int(os.getenv("TIMECLOCK_ADMISSION_READ_LIMIT", 24))
+    heavy_limit = int(os.getenv("TIMECLOCK_ADMISSION_HEAVY_LIMIT", 2))
+    # longest wait for a slot once an interaction has been answered or deferred
+    max_wait = float(os.getenv("TIMECLOCK_ADMISSION_MAX_WAIT", 10))
+    # time kept to answer an interaction after its work is admitted
+    margin_ms = int(os.getenv("TIMECLOCK_ADMISSION_MARGIN_MS", 500))
+
+
+class Executor:
+    cpu_workers = int(os.getenv("TIMECLOCK_CPU_WORKERS", 2))
+    io_workers = int(os.getenv("TIMECLOCK_IO_WORKERS", 8))
+    max_queued = int(os.getenv("TIMECLOCK_EXECUTOR_MAX_QUEUED", 16))
+
+
 def default_embed():
     """Create and return a default embed"""
     embed = disnake.Embed(
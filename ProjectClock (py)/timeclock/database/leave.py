@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from typing import Dict, Optional
+
+PENDING = "pending"
+APPROVED = "approved"
+DENIED = "denied"
+
+
+class Leave:
+    """A leave request covering the days `start` up to (not including) `end`"""
+
+    def __init__(self, id: int, guild_id: int, member_id: int, start: date, end: date,
+                 reason: Optional[str] = None, status: str = PENDING):
+        self.id = id
+        self.guild_id = guild_id
+        self.member_id = member_id
+        self.start = start
+        self.end = end
+        self.reason = reason
+        self.status = status
+        self.decided_by: Optional[int] = None
+        self.created_at = datetime.utcnow()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Leave':
+        """Build a leave from its stored document"""
+        leave = cls(
+            data['id'],
+            data['guild_id'],
+            data['member_id'],
+            date.fromisoformat(data['start']),
+            date.fromisoformat(data['end']),
+            data.get('reason'),
+            data.get('status', PENDING),
+        )
+        leave.decided_by = data.get('decided_by')
+        if data.get('created_at'):
+            leave.created_at = datetime.fromisoformat(data['created_at'])
+        return leave
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days
+
+    def days_per_year(self) -> Dict[int, int]:
+        """Number of leave days falling in each calendar year"""
+        years: Dict[int, int] = {}
+        day = self.start
+        while day < self.end:
+            year_end = min(date(day.year + 1, 1, 1), self.end)
+            years[day.year] = (year_end - day).days
+            day = year_end
+        return years
+
+    def overlaps(self, start: date, end: date) -> bool:
+        return self.start < end and start < self.end
+
+    def to_dict(self) -> dict:
+        """Convert leave data to dictionary format"""
+        return {
+            'id': self.id,
+            'guild_id': self.guild_id,
+            'member_id': self.member_id,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'reason': self.reason,
+            'status': self.status,
+            'decided_by': self.decided_by,
+            'created_at': self.created_at.isoformat()
+        }
@@ -4,6 +4,8 @@ import disnake
 from sqlalchemy import BigInteger, Boolean, Column
 from sqlalchemy.orm import Mapped, relationship
 
+from timeclock.embeds import DESCRIPTION, truncate
+
 from .base import Base
 from .time import Time
 
@@ -124,7 +126,9 @@ class Member(Base):
 
         embed = disnake.Embed(
             title=f"Timesheet for {name}",
-            description=f"Total On Duty time for last {history} days\n{total}\n\n{timesheet}",
+            description=truncate(
+                f"Total On Duty time for last {history} days\n{total}\n\n{timesheet}", DESCRIPTION
+            ),
         )
         embed.set_footer(text=self.status)
 
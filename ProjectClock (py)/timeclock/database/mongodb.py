@@ -1,7 +1,8 @@
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Iterable, Optional, List, Tuple
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo import ASCENDING
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 
 class MongoDB:
@@ -13,7 +14,27 @@ class MongoDB:
         # إنشاء الفهارس الضرورية
         await self.db.guilds.create_index([("id", ASCENDING)], unique=True)
         await self.db.members.create_index([("id", ASCENDING), ("guild_id", ASCENDING)], unique=True)
+        await self.db.members.create_index([("on_duty", ASCENDING), ("guild_id", ASCENDING)])
         await self.db.roles.create_index([("id", ASCENDING), ("guild_id", ASCENDING)], unique=True)
+        await self.db.teams.create_index([("guild_id", ASCENDING), ("id", ASCENDING)], unique=True)
+        await self.db.team_members.create_index(
+            [("guild_id", ASCENDING), ("team_id", ASCENDING), ("member_id", ASCENDING)], unique=True
+        )
+        await self.db.team_members.create_index([("guild_id", ASCENDING), ("member_id", ASCENDING)])
+        await self.db.calendar_events.create_index(
+            [("guild_id", ASCENDING), ("member_id", ASCENDING), ("punch_in", ASCENDING)], unique=True
+        )
+        await self.db.calendar_sync.create_index(
+            [("guild_id", ASCENDING), ("member_id", ASCENDING)], unique=True
+        )
+        await self.db.leaves.create_index([("guild_id", ASCENDING), ("id", ASCENDING)], unique=True)
+        await self.db.leaves.create_index(
+            [("guild_id", ASCENDING), ("member_id", ASCENDING), ("start", ASCENDING)]
+        )
+        await self.db.leaves.create_index([("guild_id", ASCENDING), ("status", ASCENDING)])
+        await self.db.leave_balances.create_index(
+            [("guild_id", ASCENDING), ("member_id", ASCENDING), ("year", ASCENDING)], unique=True
+        )
 
     async def get_guild(self, guild_id: int) -> Optional[dict]:
         return await self.db.guilds.find_one({"id": guild_id})
@@ -41,6 +62,25 @@ class MongoDB:
                 guild.update(update)
         return guild
 
+    async def set_guild_channel(self, guild_id: int, kind: str, channel_id: Optional[int]) -> None:
+        await self.db.guilds.update_one(
+            {"id": guild_id}, {"$set": {f"channels.{kind}": channel_id}}, upsert=True
+        )
+
+    async def set_guild_roster(
+        self, guild_id: int, channel_id: Optional[int], message_id: Optional[int]
+    ) -> None:
+        roster = {"channel_id": channel_id, "message_id": message_id} if message_id else None
+        await self.db.guilds.update_one({"id": guild_id}, {"$set": {"roster": roster}}, upsert=True)
+
+    async def get_guild_rosters(self) -> Dict[int, Tuple[int, int]]:
+        """guild_id -> (channel_id, message_id) of every guild with a live roster message"""
+        cursor = self.db.guilds.find({"roster": {"$ne": None}}, {"id": 1, "roster": 1})
+        return {
+            doc["id"]: (doc["roster"]["channel_id"], doc["roster"]["message_id"])
+            async for doc in cursor
+        }
+
     async def get_guild_roles(self, guild_id: int, **filters) -> List[dict]:
         query = {"guild_id": guild_id}
         if "is_mod" in filters:
@@ -113,9 +153,214 @@ class MongoDB:
         
         return member
 
+    async def _get_on_duty(self, query: dict) -> Dict[int, Dict[int, float]]:
+        # only the open session of each member is read, not their history
+        cursor = self.db.members.find(
+            {"on_duty": True, **query}, {"id": 1, "guild_id": 1, "times": {"$slice": -1}}
+        )
+        on_duty: Dict[int, Dict[int, float]] = {}
+        async for member in cursor:
+            if member.get("times"):
+                punch_in = member["times"][-1]["punch_in"]
+                on_duty.setdefault(member["guild_id"], {})[member["id"]] = punch_in
+        return on_duty
+
+    async def get_on_duty(self, guild_id: int) -> Dict[int, float]:
+        """member_id -> open punch-in timestamp of the guild's members on duty"""
+        return (await self._get_on_duty({"guild_id": guild_id})).get(guild_id, {})
+
+    async def get_all_on_duty(self) -> Dict[int, Dict[int, float]]:
+        """`get_on_duty` of every guild, in one query"""
+        return await self._get_on_duty({})
+
+    async def get_member_ids(self, guild_id: int) -> List[int]:
+        """IDs of the guild's members with timeclock records"""
+        return await self.db.members.distinct("id", {"guild_id": guild_id})
+
     async def get_members(self, guild_id: int, member_id: Optional[int] = None) -> List[dict]:
         query = {"guild_id": guild_id}
         if member_id:
             query["id"] = member_id
             return await self.db.members.find_one(query)
-        return await self.db.members.find(query).to_list(None)
\ No newline at end of file
+        return await self.db.members.find(query).to_list(None)
+
+    async def get_members_activity(
+        self, guild_id: int, member_ids: List[int], since: float
+    ) -> List[dict]:
+        """Return `id`, `on_duty` and only the times punched in after `since` for the given
+        members, in a single query"""
+        pipeline = [
+            {"$match": {"guild_id": guild_id, "id": {"$in": member_ids}}},
+            {
+                "$project": {
+                    "_id": 0,
+                    "id": 1,
+                    "on_duty": 1,
+                    "times": {
+                        "$filter": {
+                            "input": "$times",
+                            "as": "time",
+                            "cond": {"$gte": ["$$time.punch_in", since]},
+                        }
+                    },
+                }
+            },
+        ]
+        return await self.db.members.aggregate(pipeline).to_list(None)
+
+    async def iter_member_times(
+        self,
+        guild_id: int,
+        member_ids: List[int],
+        *,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict]:
+        """Stream `member_id`, `punch_in` and `punch_out` for every time entry of the given
+        members from a single cursor, optionally limited to punches in `start`..`end`"""
+        pipeline = [
+            {"$match": {"guild_id": guild_id, "id": {"$in": member_ids}}},
+            {"$project": {"_id": 0, "id": 1, "times": 1}},
+            {"$unwind": "$times"},
+        ]
+
+        punch_range = {}
+        if start is not None:
+            punch_range["$gte"] = start
+        if end is not None:
+            punch_range["$lt"] = end
+        if punch_range:
+            pipeline.append({"$match": {"times.punch_in": punch_range}})
+
+        pipeline.append(
+            {
+                "$project": {
+                    "member_id": "$id",
+                    "punch_in": "$times.punch_in",
+                    "punch_out": "$times.punch_out",
+                }
+            }
+        )
+
+        cursor = self.db.members.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        async for doc in cursor:
+            yield doc
+
+    async def get_teams(self, guild_id: int) -> List[dict]:
+        return await self.db.teams.find({"guild_id": guild_id}).sort("id", ASCENDING).to_list(None)
+
+    async def get_team_members(self, guild_id: int) -> List[dict]:
+        return await self.db.team_members.find({"guild_id": guild_id}).to_list(None)
+
+    async def create_team(self, guild_id: int, name: str, leader_id: Optional[int] = None) -> dict:
+        # team IDs are sequential per guild
+        counter = await self.db.counters.find_one_and_update(
+            {"_id": f"team:{guild_id}"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        team = {
+            "id": counter["seq"],
+            "guild_id": guild_id,
+            "name": name,
+            "leader_id": leader_id,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        await self.db.teams.insert_one(team)
+        return team
+
+    async def add_team_member(self, guild_id: int, team_id: int, member_id: int) -> bool:
+        try:
+            await self.db.team_members.insert_one(
+                {"guild_id": guild_id, "team_id": team_id, "member_id": member_id}
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def remove_team_member(self, guild_id: int, team_id: int, member_id: int) -> bool:
+        result = await self.db.team_members.delete_one(
+            {"guild_id": guild_id, "team_id": team_id, "member_id": member_id}
+        )
+        return result.deleted_count > 0
+
+    async def get_calendar_watermark(self, guild_id: int, member_id: int) -> Optional[float]:
+        """Return the punch in of the latest session synced to the calendar, if any"""
+        state = await self.db.calendar_sync.find_one({"guild_id": guild_id, "member_id": member_id})
+        return state["watermark"] if state else None
+
+    async def get_calendar_events(
+        self, guild_id: int, member_id: int, since: Optional[float] = None
+    ) -> Dict[float, dict]:
+        """Return the synced calendar events of a member keyed by session punch in"""
+        query = {"guild_id": guild_id, "member_id": member_id}
+        if since is not None:
+            query["punch_in"] = {"$gte": since}
+        events = await self.db.calendar_events.find(query).to_list(None)
+        return {event["punch_in"]: event for event in events}
+
+    async def save_calendar_events(
+        self, guild_id: int, member_id: int, events: Iterable[dict], watermark: Optional[float]
+    ) -> None:
+        """Upsert `punch_in`/`punch_out`/`event_id` mappings and move the member's watermark"""
+        operations = [
+            UpdateOne(
+                {"guild_id": guild_id, "member_id": member_id, "punch_in": event["punch_in"]},
+                {"$set": {"punch_out": event["punch_out"], "event_id": event["event_id"]}},
+                upsert=True,
+            )
+            for event in events
+        ]
+        if operations:
+            await self.db.calendar_events.bulk_write(operations, ordered=False)
+
+        if watermark is not None:
+            await self.db.calendar_sync.update_one(
+                {"guild_id": guild_id, "member_id": member_id},
+                {"$max": {"watermark": watermark}},
+                upsert=True,
+            )
+
+    async def create_leave(self, leave: dict) -> dict:
+        """Insert a leave document, giving it the guild's next sequential leave ID"""
+        counter = await self.db.counters.find_one_and_update(
+            {"_id": f"leave:{leave['guild_id']}"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        leave = {**leave, "id": counter["seq"]}
+        await self.db.leaves.insert_one(leave)
+        return leave
+
+    async def get_leaves(self, guild_id: int, statuses: Iterable[str]) -> List[dict]:
+        return await self.db.leaves.find(
+            {"guild_id": guild_id, "status": {"$in": list(statuses)}}
+        ).to_list(None)
+
+    async def set_leave_status(
+        self, guild_id: int, leave_id: int, status: str, decided_by: int, *, current: str
+    ) -> Optional[dict]:
+        """Move a leave from `current` to `status`; None if it isn't in `current` anymore"""
+        return await self.db.leaves.find_one_and_update(
+            {"guild_id": guild_id, "id": leave_id, "status": current},
+            {"$set": {"status": status, "decided_by": decided_by}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def get_leave_balances(self, guild_id: int) -> List[dict]:
+        return await self.db.leave_balances.find({"guild_id": guild_id}).to_list(None)
+
+    async def add_leave_days(self, guild_id: int, member_id: int, days_per_year: Dict[int, int]) -> None:
+        operations = [
+            UpdateOne(
+                {"guild_id": guild_id, "member_id": member_id, "year": year},
+                {"$inc": {"used_days": days}},
+                upsert=True,
+            )
+            for year, days in days_per_year.items()
+        ]
+        if operations:
+            await self.db.leave_balances.bulk_write(operations, ordered=False)
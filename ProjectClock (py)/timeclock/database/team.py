@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Optional, Set
 
 class Team:
     """Represents a team/department in the organization"""
@@ -9,20 +9,29 @@ class Team:
         self.name = name
         self.guild_id = guild_id
         self.leader_id = leader_id
-        self.members: List[int] = []
+        self.members: Set[int] = set()
         self.created_at = datetime.utcnow()
 
+    @classmethod
+    def from_dict(cls, data: dict, members: Optional[Set[int]] = None) -> 'Team':
+        """Build a team from its stored document and the member IDs from the membership index"""
+        team = cls(data['id'], data['name'], data['guild_id'], data.get('leader_id'))
+        team.members = set(members or ())
+        if data.get('created_at'):
+            team.created_at = datetime.fromisoformat(data['created_at'])
+        return team
+
     def add_member(self, member_id: int) -> bool:
         """Add a member to the team"""
         if member_id not in self.members:
-            self.members.append(member_id)
+            self.members.add(member_id)
             return True
         return False
 
     def remove_member(self, member_id: int) -> bool:
         """Remove a member from the team"""
         if member_id in self.members:
-            self.members.remove(member_id)
+            self.members.discard(member_id)
             return True
         return False
 
@@ -41,6 +50,6 @@ class Team:
             'name': self.name,
             'guild_id': self.guild_id,
             'leader_id': self.leader_id,
-            'members': self.members,
+            'members': sorted(self.members),
             'created_at': self.created_at.isoformat()
         }
\ No newline at end of file
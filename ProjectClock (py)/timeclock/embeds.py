@@ -0,0 +1,165 @@
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import disnake
+
+__all__ = (
+    "EmbedLayout",
+    "embed_length",
+    "pack_lines",
+    "pack_messages",
+    "truncate",
+)
+
+# Discord's embed limits, in characters unless noted
+TITLE = 256
+DESCRIPTION = 4096
+FIELDS = 25  # fields per embed
+FIELD_NAME = 256
+FIELD_VALUE = 1024
+FOOTER = 2048
+AUTHOR = 256
+TOTAL = 6000  # all of the above, summed over every embed of a message
+EMBEDS_PER_MESSAGE = 10
+
+# name of the fields a long field value continues in
+CONTINUED = "\u200b"
+
+Field = Tuple[str, str, bool]
+
+
+def truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def embed_length(embed: disnake.Embed) -> int:
+    """Characters counted towards the 6000 character limit"""
+    return len(embed)
+
+
+def pack_lines(lines: Iterable[str], limit: int, separator: str = "\n") -> List[str]:
+    """Join `lines` into as few chunks of at most `limit` characters as possible, in order
+
+    Greedy next-fit: a line goes into the current chunk if it fits, otherwise it starts a new
+    one. When the order has to be kept this is optimal, since closing a chunk early can never
+    let a later chunk hold more. A row longer than `limit` is split across chunks.
+    """
+    chunks: List[str] = []
+    current: Optional[str] = None
+
+    for line in lines:
+        if len(line) > limit:
+            # a multi-line row is broken at its line breaks first, anything else mid-line
+            if current is not None:
+                chunks.append(current)
+            parts = line.split(separator)
+            if len(parts) > 1:
+                chunks.extend(pack_lines(parts, limit, separator))
+            else:
+                chunks.extend(line[i:i + limit] for i in range(0, len(line), limit))
+            # the last piece stays open for the rows that follow
+            current = chunks.pop()
+            continue
+
+        if current is None:
+            current = line
+        elif len(current) + len(separator) + len(line) <= limit:
+            current += separator + line
+        else:
+            chunks.append(current)
+            current = line
+
+    if current is not None:
+        chunks.append(current)
+    return chunks
+
+
+def pack_messages(embeds: Sequence[disnake.Embed]) -> List[List[disnake.Embed]]:
+    """Group embeds, in order, into as few messages as the 10 embed / 6000 character limits allow"""
+    messages: List[List[disnake.Embed]] = []
+    size = 0
+
+    for embed in embeds:
+        length = embed_length(embed)
+        if messages and len(messages[-1]) < EMBEDS_PER_MESSAGE and size + length <= TOTAL:
+            messages[-1].append(embed)
+            size += length
+        else:
+            messages.append([embed])
+            size = length
+    return messages
+
+
+class EmbedLayout:
+    """Lays rows of text out over as few embeds as Discord's limits allow
+
+    Rows are packed into descriptions, then `fields` are appended to the last embed, moving on
+    to new embeds when one runs out of fields or characters. Every embed shares the style given
+    here; embeds after the first get `continued_title`.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        *,
+        continued_title: Optional[str] = None,
+        color: Optional[disnake.Color] = None,
+        footer: Optional[str] = None,
+        thumbnail: Optional[str] = None,
+    ) -> None:
+        self.title = truncate(title, TITLE)
+        self.continued_title = truncate(continued_title or title, TITLE)
+        self.color = color
+        self.footer = truncate(footer, FOOTER) if footer else None
+        self.thumbnail = thumbnail
+
+    def _new_embed(self, first: bool, footer: Optional[str]) -> disnake.Embed:
+        embed = disnake.Embed(title=self.title if first else self.continued_title, color=self.color)
+        if footer:
+            embed.set_footer(text=footer)
+        if self.thumbnail:
+            embed.set_thumbnail(url=self.thumbnail)
+        return embed
+
+    def build(
+        self, lines: Iterable[str], fields: Sequence[Field] = (), *, footer: Optional[str] = None
+    ) -> List[disnake.Embed]:
+        """Embeds holding `lines`, then `fields`; `footer` replaces the shared one on the last embed"""
+        closing = truncate(footer, FOOTER) if footer is not None else self.footer
+        # size every embed for the longer footer, so any of them can end up last
+        sizing = max(self.footer or "", closing or "", key=len)
+
+        embeds: List[disnake.Embed] = []
+        budget = TOTAL - max(len(self.title), len(self.continued_title)) - len(sizing)
+        for description in pack_lines(lines, min(DESCRIPTION, budget)):
+            embed = self._new_embed(not embeds, sizing)
+            embed.description = description
+            embeds.append(embed)
+
+        for name, value, inline in fields:
+            name = truncate(name, FIELD_NAME)
+            for index, chunk in enumerate(pack_lines(value.splitlines() or [""], FIELD_VALUE)):
+                self._add_field(embeds, name if index == 0 else CONTINUED, chunk or CONTINUED, inline, sizing)
+
+        if not embeds:
+            embeds.append(self._new_embed(True, sizing))
+
+        for index, embed in enumerate(embeds):
+            text = closing if index == len(embeds) - 1 else self.footer
+            if text:
+                embed.set_footer(text=text)
+            else:
+                embed.remove_footer()
+        return embeds
+
+    def _add_field(
+        self, embeds: List[disnake.Embed], name: str, value: str, inline: bool, footer: str
+    ) -> None:
+        embed = embeds[-1] if embeds else None
+        if (
+            embed is None
+            or len(embed.fields) >= FIELDS
+            or embed_length(embed) + len(name) + len(value) > TOTAL
+        ):
+            embed = self._new_embed(not embeds, footer)
+            embeds.append(embed)
+        embed.add_field(name=name, value=value, inline=inline)
@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, TypeVar
+
+from timeclock import log
+from timeclock.metrics import Metrics
+
+__all__ = ("ExecutorBusy", "ExecutorService")
+
+logger = log.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class ExecutorBusy(Exception):
+    """Raised when a pool already has its maximum amount of queued and running work"""
+
+
+class _Pool:
+    def __init__(self, name: str, factory: Callable[[], Executor], workers: int, max_pending: int):
+        self.name = name
+        self.factory = factory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executor: Optional[Executor] = None
+        # notified whenever a job leaves the pool; created in the event loop on first use
+        self.freed: Optional[asyncio.Condition] = None
+
+    def get(self) -> Executor:
+        # pools are created on first use so the bot doesn't start idle worker processes
+        if self.executor is None:
+            self.executor = self.factory()
+        return self.executor
+
+
+class ExecutorService:
+    """Shared pools for work that must not run on the event loop
+
+    `run_cpu` sends work to a bounded process pool, so CPU-heavy work (PDF layout, analysis)
+    can't hold the GIL while the gateway heartbeats. Functions and arguments sent there must be
+    picklable. `run_io` uses a thread pool for blocking I/O and C-extension work.
+
+    Each pool accepts at most `workers + max_queued` jobs at once and raises `ExecutorBusy`
+    past that, unless `wait` is set: background jobs, which nobody is waiting on and which must
+    not be dropped, wait for a free place instead. A `deadline`, usually the interaction's
+    expiry, cancels work that has not finished in time and raises `TimeoutError`.
+    """
+
+    def __init__(
+        self,
+        *,
+        cpu_workers: int = 2,
+        io_workers: int = 8,
+        max_queued: int = 16,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.metrics = metrics or Metrics()
+        self.cpu = _Pool(
+            "cpu",
+            lambda: ProcessPoolExecutor(
+                max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn")
+            ),
+            cpu_workers,
+            cpu_workers + max_queued,
+        )
+        self.io = _Pool(
+            "io",
+            lambda: ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="timeclock-io"),
+            io_workers,
+            io_workers + max_queued,
+        )
+
+        for pool in (self.cpu, self.io):
+            self.metrics.gauge(f"executor.{pool.name}.pending", lambda pool=pool: pool.pending)
+
+    async def run_cpu(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        deadline: Optional[datetime] = None,
+        wait: bool = False,
+        **kwargs: Any,
+    ) -> T:
+        """Run `func` in the process pool"""
+        return await self._run(self.cpu, func, args, kwargs, deadline, wait)
+
+    async def run_io(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        deadline: Optional[datetime] = None,
+        wait: bool = False,
+        **kwargs: Any,
+    ) -> T:
+        """Run `func` in the thread pool"""
+        return await self._run(self.io, func, args, kwargs, deadline, wait)
+
+    async def _run(
+        self,
+        pool: _Pool,
+        func: Callable[..., T],
+        args: tuple,
+        kwargs: dict,
+        deadline: Optional[datetime],
+        wait: bool,
+    ) -> T:
+        prefix = f"executor.{pool.name}"
+
+        if pool.pending >= pool.max_pending:
+            if not wait:
+                self.metrics.incr(f"{prefix}.rejected")
+                raise ExecutorBusy(f"The {pool.name} pool is full ({pool.pending} jobs)")
+
+            self.metrics.incr(f"{prefix}.waited")
+            if pool.freed is None:
+                pool.freed = asyncio.Condition()
+            async with pool.freed:
+                await pool.freed.wait_for(lambda: pool.pending < pool.max_pending)
+
+        timeout = None
+        if deadline is not None:
+            timeout = (deadline - datetime.now(timezone.utc)).total_seconds()
+            if timeout <= 0:
+                self.metrics.incr(f"{prefix}.expired")
+                raise TimeoutError("Deadline passed before the job was submitted")
+
+        loop = asyncio.get_running_loop()
+        pool.pending += 1
+        self.metrics.incr(f"{prefix}.submitted")
+        started = time.perf_counter()
+
+        try:
+            future = loop.run_in_executor(pool.get(), functools.partial(func, *args, **kwargs))
+            result = await asyncio.wait_for(future, timeout)
+
+        except asyncio.TimeoutError:
+            # pending jobs are dropped from the queue; running ones finish and are discarded
+            self.metrics.incr(f"{prefix}.cancelled")
+            logger.warning(f"{getattr(func, '__qualname__', func)} missed its deadline and was cancelled")
+            raise TimeoutError(f"{pool.name} job did not finish before its deadline") from None
+
+        except asyncio.CancelledError:
+            self.metrics.incr(f"{prefix}.cancelled")
+            raise
+
+        finally:
+            pool.pending -= 1
+            self.metrics.observe(prefix, time.perf_counter() - started)
+            if pool.freed is not None:
+                async with pool.freed:
+                    pool.freed.notify()
+
+        self.metrics.incr(f"{prefix}.completed")
+        return result
+
+    def shutdown(self) -> None:
+        for pool in (self.cpu, self.io):
+            if pool.executor is not None:
+                pool.executor.shutdown(wait=False, cancel_futures=True)
+                pool.executor = None
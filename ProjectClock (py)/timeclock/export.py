@@ -0,0 +1,390 @@
+import csv
+import io
+import json
+import textwrap
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from tempfile import SpooledTemporaryFile
+from typing import IO, TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import xlsxwriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    pa = pq = None
+
+if TYPE_CHECKING:
+    from timeclock.executor import ExecutorService
+
+__all__ = ("FIELDNAMES", "FORMATS", "ExportWriter", "open_writer", "render_pdf")
+
+FIELDNAMES = ("team_name", "member_name", "punch_in", "punch_out", "duration")
+# the columnar formats are only offered when pyarrow is installed
+FORMATS = ("csv", "json", "xlsx", "pdf") + (("parquet", "feather") if pa else ())
+
+# exports stay in memory up to this size before spilling to a temporary file on disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# rows per reportlab table, so a long PDF is laid out in pieces instead of one huge table
+PDF_TABLE_ROWS = 500
+# rows per parquet row group / arrow record batch
+ARROW_BATCH_ROWS = 65536
+
+# (team_name, member_id, member_name, punch_in, punch_out), timestamps in epoch seconds
+Row = Tuple[str, int, str, float, Optional[float]]
+FormattedRow = Tuple[str, str, str, Optional[str], Optional[float]]
+
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 12),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def format_row(row: Row) -> FormattedRow:
+    """Return a row as it appears in the row-oriented formats: ISO timestamps, hours worked"""
+    team_name, _, member_name, punch_in, punch_out = row
+    return (
+        team_name,
+        member_name,
+        datetime.fromtimestamp(punch_in, tz=timezone.utc).isoformat(),
+        datetime.fromtimestamp(punch_out, tz=timezone.utc).isoformat() if punch_out else None,
+        (punch_out - punch_in) / 3600 if punch_out else None,
+    )
+
+
+class ExportWriter(ABC):
+    """Streams export rows into a `SpooledTemporaryFile`
+
+    Rows are written as they arrive so memory stays bounded by `SPOOL_MAX_SIZE`, no matter
+    how many rows are exported. Call `close` to finish the file and get it back rewound, or
+    `abort` to drop the export. The blocking methods hold a lock, as the `a`-prefixed ones run
+    them on pool threads that outlive a missed deadline: `abort` waits for a write still in
+    progress instead of closing the file under it.
+    """
+
+    extension: str
+
+    def __init__(self) -> None:
+        self.file: IO[bytes] = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+        self.rows = 0
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def write_rows(self, rows: Iterable[Row]) -> None:
+        with self._lock:
+            if self.file.closed:
+                # a write that missed its deadline, started after the export was aborted
+                return
+            for row in rows:
+                self._write_row(row)
+                self.rows += 1
+
+    @abstractmethod
+    def _write_row(self, row: Row) -> None:
+        """Write one row to the file, or buffer it until `_finish`"""
+
+    def _finish(self) -> None:
+        pass
+
+    def _abort(self) -> None:
+        pass
+
+    def close(self) -> IO[bytes]:
+        with self._lock:
+            self._finish()
+            self.finished = True
+            self.file.seek(0)
+            return self.file
+
+    def abort(self) -> None:
+        """Drop an unfinished export, releasing what the format holds along with the file"""
+        with self._lock:
+            if self.file.closed:
+                return
+            try:
+                if not self.finished:
+                    self._abort()
+            finally:
+                self.file.close()
+
+    async def awrite_rows(
+        self, rows: List[Row], executor: "ExecutorService", *, deadline: Optional[datetime] = None
+    ) -> None:
+        """`write_rows` on the executor's thread pool"""
+        await executor.run_io(self.write_rows, rows, deadline=deadline)
+
+    async def aclose(
+        self, executor: "ExecutorService", *, deadline: Optional[datetime] = None
+    ) -> IO[bytes]:
+        """`close` on the executor's thread pool"""
+        return await executor.run_io(self.close, deadline=deadline)
+
+    async def aabort(self, executor: "ExecutorService") -> None:
+        """`abort` on the executor's thread pool, waiting for room in it if need be"""
+        await executor.run_io(self.abort, wait=True)
+
+
+class _TextExportWriter(ExportWriter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.text = io.TextIOWrapper(self.file, encoding="utf-8", newline="")
+
+    def _finish(self) -> None:
+        self.text.flush()
+        self.text.detach()
+
+    def _abort(self) -> None:
+        # so the wrapper doesn't flush into the closed file when it is collected
+        self.text.detach()
+
+
+class CsvExportWriter(_TextExportWriter):
+    extension = "csv"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(FIELDNAMES)
+
+    def _write_row(self, row: Row) -> None:
+        self.writer.writerow(format_row(row))
+
+
+class JsonExportWriter(_TextExportWriter):
+    """Writes the same document as `json.dumps(rows, indent=2)`, one object at a time"""
+
+    extension = "json"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.text.write("[")
+
+    def _write_row(self, row: Row) -> None:
+        item = json.dumps(dict(zip(FIELDNAMES, format_row(row))), ensure_ascii=False, indent=2)
+        self.text.write(("," if self.rows else "") + "\n" + textwrap.indent(item, "  "))
+
+    def _finish(self) -> None:
+        self.text.write("\n]" if self.rows else "]")
+        super()._finish()
+
+
+class XlsxExportWriter(ExportWriter):
+    """Uses xlsxwriter's `constant_memory` mode, which flushes each row as it is written"""
+
+    extension = "xlsx"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.workbook = xlsxwriter.Workbook(self.file, {"constant_memory": True})
+        self.worksheet = self.workbook.add_worksheet("Attendance Data")
+        self.worksheet.set_column("A:E", 20)
+
+        header_format = self.workbook.add_format({"bold": True, "bg_color": "#D3D3D3"})
+        self.worksheet.write_row(0, 0, FIELDNAMES, header_format)
+
+    def _write_row(self, row: Row) -> None:
+        *values, duration = format_row(row)
+        self.worksheet.write_row(
+            self.rows + 1, 0, [*values, f"{duration:.2f}" if duration is not None else ""]
+        )
+
+    def _finish(self) -> None:
+        self.workbook.close()
+
+    def _abort(self) -> None:
+        # constant_memory keeps every worksheet in a temporary file, removed on close
+        self.workbook.close()
+
+
+class PdfExportWriter(ExportWriter):
+    """reportlab lays out the whole document on `build`, so rows are kept until `close`.
+    They are split into several tables so no single table has to be laid out at once."""
+
+    extension = "pdf"
+    header = ["Team Name", "Member Name", "Punch In", "Punch Out", "Duration (Hours)"]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tables: List[list] = []
+
+    def _write_row(self, row: Row) -> None:
+        if self.rows % PDF_TABLE_ROWS == 0:
+            self.tables.append([self.header])
+
+        team_name, member_name, punch_in, punch_out, duration = format_row(row)
+        self.tables[-1].append([
+            team_name,
+            member_name,
+            punch_in,
+            punch_out or "",
+            f"{duration:.2f}" if duration else ""
+        ])
+
+    def _finish(self) -> None:
+        self.file.write(render_pdf(self.tables or [[self.header]]))
+        self.tables.clear()
+
+    def _abort(self) -> None:
+        self.tables.clear()
+
+    async def aclose(
+        self, executor: "ExecutorService", *, deadline: Optional[datetime] = None
+    ) -> IO[bytes]:
+        """Lays the document out in the executor's process pool"""
+        pdf = await executor.run_cpu(render_pdf, self.tables or [[self.header]], deadline=deadline)
+        self.tables.clear()
+        self.finished = True
+        self.file.write(pdf)
+        self.file.seek(0)
+        return self.file
+
+
+class _ArrowExportWriter(ExportWriter):
+    """Buffers rows column by column and writes them out every `ARROW_BATCH_ROWS` rows
+
+    Timestamps are stored as int64 milliseconds (`timestamp[ms, UTC]`) and team and member
+    names are dictionary encoded. The dictionaries only ever grow, so each batch extends the
+    previous one and the IPC writer can emit deltas instead of replacing it.
+    """
+
+    @staticmethod
+    def schema() -> "pa.Schema":
+        names = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema([
+            ("team_name", names),
+            ("member_id", pa.int64()),
+            ("member_name", names),
+            ("punch_in", pa.timestamp("ms", tz="UTC")),
+            ("punch_out", pa.timestamp("ms", tz="UTC")),
+            ("duration", pa.float64()),
+        ])
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._dictionaries: Dict[str, Dict[str, int]] = {"team_name": {}, "member_name": {}}
+        self._columns: Dict[str, list] = {name: [] for name in self.schema().names}
+
+    def _encode(self, column: str, value: str) -> int:
+        dictionary = self._dictionaries[column]
+        if value not in dictionary:
+            dictionary[value] = len(dictionary)
+        return dictionary[value]
+
+    def _write_row(self, row: Row) -> None:
+        team_name, member_id, member_name, punch_in, punch_out = row
+        columns = self._columns
+        columns["team_name"].append(self._encode("team_name", team_name))
+        columns["member_id"].append(member_id)
+        columns["member_name"].append(self._encode("member_name", member_name))
+        columns["punch_in"].append(int(punch_in * 1000))
+        columns["punch_out"].append(int(punch_out * 1000) if punch_out else None)
+        columns["duration"].append((punch_out - punch_in) / 3600 if punch_out else None)
+
+        if len(columns["member_id"]) >= ARROW_BATCH_ROWS:
+            self._flush()
+
+    def _record_batch(self) -> "pa.RecordBatch":
+        schema = self.schema()
+        arrays = []
+        for field in schema:
+            values = self._columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                dictionary = pa.array(list(self._dictionaries[field.name]), pa.string())
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(pa.array(values, pa.int32()), dictionary)
+                )
+            else:
+                arrays.append(pa.array(values, field.type))
+            values.clear()
+        return pa.record_batch(arrays, schema=schema)
+
+    @abstractmethod
+    def _flush(self) -> None:
+        """Write the buffered columns out as one batch"""
+
+    def _finish(self) -> None:
+        if self._columns["member_id"] or not self.rows:
+            self._flush()
+
+
+class ParquetExportWriter(_ArrowExportWriter):
+    extension = "parquet"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writer = pq.ParquetWriter(self.file, self.schema(), compression="zstd")
+
+    def _flush(self) -> None:
+        batch = self._record_batch()
+        self.writer.write_table(pa.Table.from_batches([batch]), row_group_size=ARROW_BATCH_ROWS)
+
+    def _finish(self) -> None:
+        super()._finish()
+        self.writer.close()
+
+    def _abort(self) -> None:
+        self.writer.close()
+
+
+class FeatherExportWriter(_ArrowExportWriter):
+    """Arrow IPC file format (Feather v2)"""
+
+    extension = "feather"
+
+    def __init__(self) -> None:
+        super().__init__()
+        options = pa.ipc.IpcWriteOptions(compression="zstd", emit_dictionary_deltas=True)
+        self.writer = pa.ipc.new_file(self.file, self.schema(), options=options)
+
+    def _flush(self) -> None:
+        self.writer.write_batch(self._record_batch())
+
+    def _finish(self) -> None:
+        super()._finish()
+        self.writer.close()
+
+    def _abort(self) -> None:
+        self.writer.close()
+
+
+def render_pdf(tables: List[list]) -> bytes:
+    """Render table data (header row first) to a PDF document"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+    for table_data in tables:
+        table = Table(table_data, repeatRows=1)
+        table.setStyle(PDF_TABLE_STYLE)
+        elements.append(table)
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+_WRITERS = {
+    "csv": CsvExportWriter,
+    "json": JsonExportWriter,
+    "xlsx": XlsxExportWriter,
+    "pdf": PdfExportWriter,
+    "parquet": ParquetExportWriter,
+    "feather": FeatherExportWriter,
+}
+
+
+def open_writer(format: str) -> ExportWriter:
+    """Return a new streaming writer for one of `FORMATS`"""
+    return _WRITERS[format]()
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from aiohttp import web
+
+from timeclock import log
+from timeclock.database.config import GuildConfig
+
+if TYPE_CHECKING:
+    from timeclock.database.mongodb import MongoDB
+
+__all__ = ("IcsFeed", "IcsFeedCache", "IcsServer", "feed_token")
+
+logger = log.get_logger(__name__)
+
+PRODID = "-//ProjectClock//TimeClock//AR"
+# a Monday, used as the first occurrence of the weekly schedule events
+SCHEDULE_ANCHOR = date(2024, 1, 1)
+
+# (guild_id, "member" | "team", member or team ID)
+FeedKey = Tuple[int, str, int]
+FeedResolver = Callable[[int, str, int], Awaitable[Optional["IcsFeed"]]]
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 3.1) without splitting a UTF-8 character"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # back off to the start of a character; continuation bytes are 0b10xxxxxx
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74  # continuation lines start with a space
+
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event(uid: str, start: datetime, end: datetime, summary: str, rrule: Optional[str] = None) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_stamp(start)}",
+        f"DTSTART:{_stamp(start)}",
+        f"DTEND:{_stamp(end)}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def session_event(guild_id: int, member_id: int, punch_in: float, punch_out: float, summary: str) -> str:
+    """VEVENT for one closed work session; the UID is stable so re-adding it updates it"""
+    return _event(
+        f"{guild_id}-{member_id}-{int(punch_in * 1000)}@timeclock",
+        datetime.fromtimestamp(punch_in, tz=timezone.utc),
+        datetime.fromtimestamp(punch_out, tz=timezone.utc),
+        summary,
+    )
+
+
+def schedule_events(config: GuildConfig, summary: str) -> List[str]:
+    """Weekly recurring VEVENTs for the guild's configured work hours (UTC)"""
+    events = []
+    for day in range(7):
+        hours = config.get_work_hours(day)
+        if not hours:
+            continue
+
+        first = SCHEDULE_ANCHOR + timedelta(days=day)
+        start = datetime.combine(first, hours[0], tzinfo=timezone.utc)
+        end = datetime.combine(first, hours[1], tzinfo=timezone.utc)
+        if end <= start:
+            end += timedelta(days=1)
+
+        events.append(
+            _event(f"{config.guild_id}-schedule-{day}@timeclock", start, end, summary, "FREQ=WEEKLY")
+        )
+    return events
+
+
+def feed_token(secret: str, guild_id: int, kind: str, target_id: int) -> str:
+    """Token that authorises reading one feed over HTTP"""
+    message = f"{guild_id}:{kind}:{target_id}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+class IcsFeed:
+    """A serialized iCalendar feed that only ever has new sessions appended to it
+
+    Session VEVENTs are kept as encoded bytes and the ETag hash is updated as they are
+    appended, so bringing the feed up to date costs O(new sessions) instead of re-rendering
+    the whole history.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.header = (
+            "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+            f"PRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n"
+            + _fold(f"X-WR-CALNAME:{_escape(name)}")
+        ).encode()
+        self.footer = b"END:VCALENDAR\r\n"
+        self.schedule = b""
+        self.body = bytearray()
+        self.events = 0
+        # punch in of each member's latest session in the feed
+        self.watermarks: Dict[int, float] = {}
+        # where the next read starts for each member: their open session, or the last read
+        self.resume: Dict[int, float] = {}
+        self._hash = hashlib.sha256()
+        self._rendered: Optional[bytes] = None
+
+    def set_schedule(self, events: Iterable[str]) -> None:
+        schedule = "".join(events).encode()
+        if schedule != self.schedule:
+            self.schedule = schedule
+            self._rendered = None
+
+    def append(self, events: Iterable[str]) -> None:
+        for event in events:
+            encoded = event.encode()
+            self.body += encoded
+            self._hash.update(encoded)
+            self.events += 1
+            self._rendered = None
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.sha256(self._hash.digest() + self.header + self.schedule).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def render(self) -> bytes:
+        if self._rendered is None:
+            self._rendered = self.header + self.schedule + bytes(self.body) + self.footer
+        return self._rendered
+
+
+class IcsFeedCache:
+    """Per-member and per-team feeds kept in memory and brought up to date on read"""
+
+    def __init__(self, db: "MongoDB") -> None:
+        self.db = db
+        self._feeds: Dict[FeedKey, IcsFeed] = {}
+        self._locks: Dict[FeedKey, asyncio.Lock] = {}
+
+    async def get_feed(
+        self,
+        key: FeedKey,
+        name: str,
+        member_names: Mapping[int, str],
+        config: GuildConfig,
+    ) -> IcsFeed:
+        """Return the feed for `key` with every closed session of `member_names` in it
+
+        Only sessions punched in after each member's watermark are read. The feed is rebuilt
+        when a member leaves the set (e.g. removed from a team).
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            feed = self._feeds.get(key)
+            members = set(member_names)
+            if feed is None or feed.name != name or not set(feed.resume) <= members:
+                feed = self._feeds[key] = IcsFeed(name)
+
+            feed.set_schedule(schedule_events(config, "موعد العمل"))
+            if not members:
+                return feed
+
+            # a member that hasn't been read yet needs a full read
+            start = None
+            if members <= set(feed.resume):
+                start = min(feed.resume[member_id] for member_id in members)
+            read_at = time.time()
+
+            guild_id = key[0]
+            new_sessions = []
+            open_sessions = {}
+            async for session in self.db.iter_member_times(guild_id, list(members), start=start):
+                member_id, punch_in = session["member_id"], session["punch_in"]
+                if not session.get("punch_out"):
+                    open_sessions[member_id] = punch_in
+                    continue
+
+                watermark = feed.watermarks.get(member_id)
+                if watermark is None or punch_in > watermark:
+                    new_sessions.append((punch_in, member_id, session["punch_out"]))
+
+            new_sessions.sort()
+            feed.append(
+                session_event(
+                    guild_id, member_id, punch_in, punch_out, f"دوام - {member_names[member_id]}"
+                )
+                for punch_in, member_id, punch_out in new_sessions
+            )
+            for punch_in, member_id, _ in new_sessions:
+                feed.watermarks[member_id] = punch_in
+            for member_id in members:
+                feed.resume[member_id] = open_sessions.get(member_id, read_at)
+
+            return feed
+
+    def invalidate(self, guild_id: int) -> None:
+        for key in [key for key in self._feeds if key[0] == guild_id]:
+            del self._feeds[key]
+
+
+class IcsServer:
+    """Serves feeds at `/ics/{guild_id}/{kind}/{target_id}.ics?token=...`
+
+    Responses carry the feed's ETag; a matching `If-None-Match` gets a 304 with no body.
+    """
+
+    def __init__(self, resolver: FeedResolver, secret: str, host: str, port: int) -> None:
+        self.resolver = resolver
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get(r"/ics/{guild_id:\d+}/{kind:member|team}/{target_id:\d+}.ics", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"ICS feeds served on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        guild_id = int(request.match_info["guild_id"])
+        kind = request.match_info["kind"]
+        target_id = int(request.match_info["target_id"])
+
+        expected = feed_token(self.secret, guild_id, kind, target_id)
+        if not hmac.compare_digest(request.query.get("token", ""), expected):
+            raise web.HTTPForbidden()
+
+        feed = await self.resolver(guild_id, kind, target_id)
+        if feed is None:
+            raise web.HTTPNotFound()
+
+        headers = {"ETag": feed.etag, "Cache-Control": "private, max-age=300"}
+        if feed.etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+
+        return web.Response(
+            body=feed.render(), content_type="text/calendar", charset="utf-8", headers=headers
+        )
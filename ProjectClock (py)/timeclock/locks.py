@@ -0,0 +1,19 @@
+import asyncio
+from typing import Hashable, List
+
+__all__ = ("StripedLock",)
+
+
+class StripedLock:
+    """A fixed table of asyncio locks, picked by hashing a key
+
+    Keys on different stripes never wait on each other, and the same key always gets the same
+    lock, so work for one key is serialised with constant memory however many keys there are.
+    Two keys can share a stripe; with enough stripes that only costs a little concurrency.
+    """
+
+    def __init__(self, stripes: int = 256) -> None:
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(stripes)]
+
+    def __call__(self, key: Hashable) -> asyncio.Lock:
+        return self._locks[hash(key) % len(self._locks)]
@@ -0,0 +1,55 @@
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Optional
+
+__all__ = ("Metrics",)
+
+
+class Metrics:
+    """In-process counters, gauges and latency samples
+
+    Timings keep the most recent `sample_size` observations per name, so percentiles describe
+    recent behaviour and memory stays constant.
+    """
+
+    def __init__(self, sample_size: int = 1024) -> None:
+        self.sample_size = sample_size
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.timings: Dict[str, Deque[float]] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=self.sample_size)
+        self.timings[name].append(seconds)
+
+    def gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """Register a callback that is read whenever a snapshot is taken"""
+        self.gauges[name] = callback
+
+    def percentile(self, name: str, percent: float) -> Optional[float]:
+        samples = self.timings.get(name)
+        if not samples:
+            return None
+
+        ordered = sorted(samples)
+        index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """Return all metrics as plain values, timings summarised as count/p50/p99 in ms"""
+        return {
+            "counters": dict(self.counters),
+            "gauges": {name: callback() for name, callback in self.gauges.items()},
+            "timings": {
+                name: {
+                    "count": len(samples),
+                    "p50_ms": self.percentile(name, 50) * 1000,
+                    "p99_ms": self.percentile(name, 99) * 1000,
+                }
+                for name, samples in self.timings.items()
+                if samples
+            },
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+import disnake
+
+from timeclock import log
+from timeclock.embeds import EMBEDS_PER_MESSAGE, TOTAL, embed_length
+from timeclock.metrics import Metrics
+
+__all__ = ("OutboundQueue", "Priority")
+
+logger = log.get_logger(__name__)
+
+Destination = disnake.abc.Messageable
+DestinationKey = Tuple[str, int]
+
+
+class Priority(IntEnum):
+    """Lower values are sent first"""
+
+    INTERACTIVE = 0  # a direct result of a user's command or button
+    ALERT = 1
+    BATCH = 2  # scheduled reports
+
+
+class TokenBucket:
+    """Allows `capacity` sends at once, refilled at `rate` per second"""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass(order=True)
+class _Item:
+    priority: Priority
+    seq: int
+    kwargs: Dict[str, Any] = field(compare=False)
+    future: "asyncio.Future[Optional[disnake.Message]]" = field(compare=False)
+    queued_at: float = field(default_factory=time.perf_counter, compare=False)
+
+    @property
+    def coalescable(self) -> bool:
+        return set(self.kwargs) == {"embeds"}
+
+
+@dataclass
+class _Channel:
+    target: Destination
+    bucket: TokenBucket
+    # heap of the queued items, by priority and then the order they were queued in
+    items: List[_Item] = field(default_factory=list)
+    sending: bool = False
+
+
+class OutboundQueue:
+    """Central queue for messages the bot sends on its own (reports, alerts, DMs)
+
+    Every destination has a token bucket and all sends share a global bucket, so bursts are
+    spread out before they reach Discord's rate limits instead of stalling in the library's
+    retries. The next send is picked by priority, then age, both among destinations and within
+    one: an interactive message overtakes the batch messages already queued for its channel.
+    Queued embed-only messages for the same destination are merged into one message of up to
+    10 embeds and 6000 characters. Messages of one priority to one destination keep their
+    order; different destinations are sent concurrently.
+    """
+
+    def __init__(
+        self,
+        *,
+        metrics: Optional[Metrics] = None,
+        channel_rate: float = 1.0,
+        channel_burst: int = 5,
+        global_rate: float = 40.0,
+        global_burst: int = 40,
+    ) -> None:
+        self.metrics = metrics or Metrics()
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._channels: Dict[DestinationKey, _Channel] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+
+        self.metrics.gauge("outbound.depth", self.depth)
+
+    def depth(self) -> int:
+        return sum(len(channel.items) for channel in self._channels.values())
+
+    @staticmethod
+    def _key(target: Destination) -> DestinationKey:
+        if isinstance(target, (disnake.User, disnake.Member)):
+            return ("user", target.id)
+        return ("channel", target.id)
+
+    def send(
+        self, target: Destination, *, priority: Priority = Priority.BATCH, **kwargs: Any
+    ) -> "asyncio.Future[Optional[disnake.Message]]":
+        """Queue a message with the same keyword arguments as `Messageable.send`
+
+        Returns a future for the sent message; awaiting it is optional. Failures are logged,
+        and raised from the future for callers that await it.
+        """
+        if "embed" in kwargs:
+            kwargs["embeds"] = [kwargs.pop("embed")]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # mark failures as retrieved so fire-and-forget callers don't get "never retrieved" noise
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        key = self._key(target)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(
+                target, TokenBucket(self.channel_rate, self.channel_burst)
+            )
+        heapq.heappush(channel.items, _Item(priority, next(self._seq), kwargs, future))
+        self.metrics.incr("outbound.queued")
+
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        self._wakeup.set()
+        return future
+
+    def _next(self, now: float) -> Tuple[Optional[_Channel], float]:
+        """The ready destination with the most urgent item, or how long until one is ready"""
+        best: Optional[_Channel] = None
+        best_head: Optional[_Item] = None
+        wait = float("inf")
+
+        for channel in self._channels.values():
+            if channel.sending or not channel.items:
+                continue
+
+            ready_in = channel.bucket.wait_time(now)
+            if ready_in > 0:
+                wait = min(wait, ready_in)
+                continue
+
+            head = channel.items[0]
+            if best_head is None or head < best_head:
+                best, best_head = channel, head
+
+        return best, wait
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            channel, wait = self._next(now)
+
+            if channel is not None:
+                global_wait = self.global_bucket.wait_time(now)
+                if global_wait > 0:
+                    await asyncio.sleep(global_wait)
+                    continue
+
+                self.global_bucket.take(now)
+                channel.bucket.take(now)
+                channel.sending = True
+                task = asyncio.create_task(self._send(channel, self._take_batch(channel)))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                continue
+
+            # forget idle destinations once their bucket has refilled, so dropping them can't
+            # hand out a fresh burst early
+            for key in [
+                key for key, c in self._channels.items()
+                if not c.items and not c.sending and c.bucket.wait_time(now) == 0
+                and c.bucket.tokens >= c.bucket.capacity
+            ]:
+                del self._channels[key]
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), None if wait == float("inf") else wait)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _take_batch(channel: _Channel) -> List[_Item]:
+        """Pop the most urgent item, plus the next embed-only items that fit in the same message"""
+        items = [heapq.heappop(channel.items)]
+        if not items[0].coalescable:
+            return items
+
+        embeds = list(items[0].kwargs["embeds"])
+        chars = sum(embed_length(embed) for embed in embeds)
+        while channel.items and channel.items[0].coalescable:
+            extra = channel.items[0].kwargs["embeds"]
+            extra_chars = sum(embed_length(embed) for embed in extra)
+            if len(embeds) + len(extra) > EMBEDS_PER_MESSAGE or chars + extra_chars > TOTAL:
+                break
+            items.append(heapq.heappop(channel.items))
+            embeds.extend(extra)
+            chars += extra_chars
+        return items
+
+    async def _send(self, channel: _Channel, items: List[_Item]) -> None:
+        started = time.perf_counter()
+        if len(items) > 1:
+            kwargs = {"embeds": [embed for item in items for embed in item.kwargs["embeds"]]}
+            self.metrics.incr("outbound.coalesced", len(items) - 1)
+        else:
+            kwargs = items[0].kwargs
+
+        try:
+            message = await channel.target.send(**kwargs)
+        except Exception as error:
+            self.metrics.incr("outbound.failed")
+            logger.warning(f"Failed to send queued message to {self._key(channel.target)}: {error}")
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(error)
+        else:
+            self.metrics.incr("outbound.sent")
+            for item in items:
+                self.metrics.observe("outbound.latency", time.perf_counter() - item.queued_at)
+                if not item.future.done():
+                    item.future.set_result(message)
+        finally:
+            self.metrics.observe("outbound.send", time.perf_counter() - started)
+            channel.sending = False
+            self._wakeup.set()
+
+    async def aclose(self) -> None:
+        """Stop sending; queued messages are dropped"""
+        if self._worker is not None:
+            self._worker.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        for channel in self._channels.values():
+            for item in channel.items:
+                item.future.cancel()
+        self._channels.clear()
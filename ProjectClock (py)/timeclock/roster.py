@@ -0,0 +1,172 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import disnake
+
+from timeclock import log
+from timeclock.embeds import EmbedLayout
+
+if TYPE_CHECKING:
+    from timeclock.bot import TimeClockBot
+
+__all__ = ("LiveRoster", "roster_rows", "render_roster")
+
+logger = log.get_logger(__name__)
+
+# members listed on the live roster message; `/onduty` pages through everyone
+ROSTER_ROWS = 50
+
+Row = Tuple[int, float]
+
+
+def roster_rows(on_duty: Dict[int, float]) -> List[Row]:
+    """(member ID, punch-in) of everyone on duty, longest on duty first"""
+    return sorted(on_duty.items(), key=lambda row: row[1])
+
+
+def render_roster(
+    guild: disnake.Guild, rows: Sequence[Row], total: int, index: int = 0, hidden: int = 0
+) -> disnake.Embed:
+    """Page `index` of the roster of the `total` members on duty, listing `rows` and noting
+    the `hidden` members left out"""
+    lines = [
+        f"🟢 <@{member_id}> منذ {disnake.utils.format_dt(punch_in, 'R')}"
+        for member_id, punch_in in rows
+    ]
+    if not total:
+        lines = ["لا يوجد أحد على رأس العمل حالياً"]
+    elif hidden:
+        lines.append(f"… و {hidden} آخرون")
+
+    layout = EmbedLayout(
+        f"On Duty ({total})" if index == 0 else f"On Duty ({total}) (continued)",
+        color=disnake.Color.green(),
+        thumbnail=guild.icon.url if guild.icon else None,
+    )
+    embed = layout.build(lines)[0]
+    embed.timestamp = disnake.utils.utcnow()
+    return embed
+
+
+class LiveRoster:
+    """Keeps a message in the punch channel listing who is on duty
+
+    `touch` is called on every change of a guild's roster. The first one schedules an edit for
+    `interval` seconds after the previous edit; every touch until then is coalesced into it, so
+    a guild's message is edited at most once per `interval` however many members punch, and
+    the edit always shows the latest roster.
+    """
+
+    def __init__(self, bot: "TimeClockBot", interval: float) -> None:
+        self.bot = bot
+        self.interval = interval
+        # guild_id -> (channel_id, message_id) of the roster message
+        self._messages: Dict[int, Tuple[int, int]] = {}
+        self._last_edit: Dict[int, float] = {}
+        self._scheduled: Dict[int, asyncio.Task] = {}
+
+    async def load(self) -> None:
+        """Load the roster messages of every guild and bring them up to date"""
+        self._messages = await self.bot.db.get_guild_rosters()
+        for guild_id in self._messages:
+            self.touch(guild_id)
+
+    def get(self, guild_id: int) -> Optional[Tuple[int, int]]:
+        return self._messages.get(guild_id)
+
+    def touch(self, guild_id: int) -> None:
+        """Schedule an edit of the guild's roster message, unless one is already pending"""
+        if guild_id not in self._messages:
+            return
+        if guild_id in self._scheduled:
+            self.bot.metrics.incr("roster.coalesced")
+            return
+
+        task = asyncio.create_task(self._edit_later(guild_id))
+        self._scheduled[guild_id] = task
+        task.add_done_callback(
+            lambda t: self._scheduled.get(guild_id) is t and self._scheduled.pop(guild_id)
+        )
+
+    async def _edit_later(self, guild_id: int) -> None:
+        delay = self._last_edit.get(guild_id, float("-inf")) + self.interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # changes from here on need another edit, as this one may render before them
+        del self._scheduled[guild_id]
+        try:
+            await self.refresh(guild_id)
+        except Exception as e:
+            logger.error(f"Failed to update the roster message in {guild_id}: {e}")
+
+    async def _render(self, guild: disnake.Guild) -> disnake.Embed:
+        on_duty = await self.bot.on_duty.get(guild.id)
+        rows = roster_rows(on_duty)[:ROSTER_ROWS]
+        return render_roster(guild, rows, len(on_duty), hidden=len(on_duty) - len(rows))
+
+    async def refresh(self, guild_id: int) -> None:
+        """Edit the guild's roster message now"""
+        location = self._messages.get(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        if location is None or guild is None:
+            return
+
+        channel_id, message_id = location
+        channel = guild.get_channel(channel_id)
+        if not isinstance(channel, disnake.TextChannel):
+            await self.disable(guild_id)
+            return
+
+        embed = await self._render(guild)
+
+        started = time.perf_counter()
+        self._last_edit[guild_id] = time.monotonic()
+        try:
+            await channel.get_partial_message(message_id).edit(embed=embed)
+        except (disnake.NotFound, disnake.Forbidden):
+            logger.info(f"Roster message `{message_id}` in `{guild_id}` is gone, disabling it")
+            await self.disable(guild_id)
+            return
+        finally:
+            self.bot.metrics.observe("roster.edit", time.perf_counter() - started)
+        self.bot.metrics.incr("roster.edits")
+
+    async def enable(self, guild: disnake.Guild, channel: disnake.TextChannel) -> disnake.Message:
+        """Post a roster message in `channel`, replacing the guild's previous one"""
+        await self.disable(guild.id, delete=True)
+
+        message = await channel.send(embed=await self._render(guild))
+        self._last_edit[guild.id] = time.monotonic()
+        self._messages[guild.id] = (channel.id, message.id)
+        await self.bot.db.set_guild_roster(guild.id, channel.id, message.id)
+        return message
+
+    async def disable(self, guild_id: int, *, delete: bool = False) -> None:
+        """Stop updating the guild's roster message, deleting it if `delete`"""
+        location = self._messages.pop(guild_id, None)
+        self._last_edit.pop(guild_id, None)
+        if (task := self._scheduled.pop(guild_id, None)) is not None:
+            task.cancel()
+        if location is None:
+            return
+
+        await self.bot.db.set_guild_roster(guild_id, None, None)
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(location[0]) if guild else None
+        if delete and isinstance(channel, disnake.TextChannel):
+            try:
+                await channel.get_partial_message(location[1]).delete()
+            except disnake.HTTPException:
+                pass
+
+    def forget(self, guild_id: int) -> None:
+        """Cancel the pending edit of a guild the bot left; the message is kept should it return"""
+        if (task := self._scheduled.pop(guild_id, None)) is not None:
+            task.cancel()
+
+    def close(self) -> None:
+        for task in self._scheduled.values():
+            task.cancel()
+        self._scheduled.clear()
@@ -0,0 +1,106 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import disnake
+
+from timeclock import log
+from timeclock.admission import AdmissionController, Overloaded, Workload
+from timeclock.metrics import Metrics
+
+__all__ = ("ComponentRouter", "split_custom_id")
+
+logger = log.get_logger(__name__)
+
+Args = Tuple[str, ...]
+Handler = Callable[[disnake.MessageInteraction, Any], Awaitable[None]]
+
+# answer to a component click by someone the message doesn't belong to
+NOT_YOURS = "Sorry. This is not your message to control"
+
+
+def split_custom_id(custom_id: str) -> Tuple[str, Args]:
+    """`route:arg:arg...` -> (route, args)
+
+    Also reads the IDs of messages sent before routes existed: `<member_id>_trash`.
+    """
+    if custom_id.endswith("_trash"):
+        return "trash", (custom_id[: -len("_trash")],)
+
+    route, _, rest = custom_id.partition(":")
+    return route, tuple(rest.split(":")) if rest else ()
+
+
+@dataclass(frozen=True)
+class Route:
+    handler: Handler
+    parse: Callable[[Args], Any]
+    owner: Optional[Callable[[Any], int]]
+    workload: Workload
+
+
+class ComponentRouter:
+    """Sends every button click to the handler registered for its custom_id's route
+
+    The custom_id is split once and the route looked up in a dict, instead of every listener
+    inspecting every click. A route's `parse` turns the args into what its handler gets (a
+    ValueError or IndexError drops the click); if the route has an `owner`, clicks by anyone
+    else are answered right there, before the handler can touch the database. The handler
+    runs once `admission` admits the route's `workload`. Each route's latency is recorded as
+    `component.<route>`.
+    """
+
+    def __init__(self, metrics: Metrics, admission: AdmissionController) -> None:
+        self.metrics = metrics
+        self.admission = admission
+        self._routes: Dict[str, Route] = {}
+
+    def register(
+        self,
+        route: str,
+        handler: Handler,
+        *,
+        parse: Callable[[Args], Any] = lambda args: args,
+        owner: Optional[Callable[[Any], int]] = None,
+        workload: Workload = Workload.READ,
+    ) -> None:
+        """Route `route:...` clicks to `handler(inter, parse(args))`
+
+        `owner(parsed)` is the ID of the only member allowed to click.
+        """
+        if route in self._routes:
+            raise ValueError(f"Component route `{route}` is already registered")
+        self._routes[route] = Route(handler, parse, owner, workload)
+
+    def unregister(self, route: str) -> None:
+        self._routes.pop(route, None)
+
+    async def dispatch(self, inter: disnake.MessageInteraction) -> bool:
+        """Handle the click; False if no route matches, e.g. for components of a `View`"""
+        name, args = split_custom_id(inter.component.custom_id or "")
+        route = self._routes.get(name)
+        if route is None:
+            return False
+
+        started = time.perf_counter()
+        try:
+            try:
+                parsed = route.parse(args)
+            except (ValueError, IndexError):
+                self.metrics.incr(f"component.{name}.invalid")
+                logger.warning(f"Invalid custom_id `{inter.component.custom_id}`")
+                return True
+
+            if route.owner is not None and route.owner(parsed) != inter.author.id:
+                self.metrics.incr(f"component.{name}.denied")
+                await inter.response.send_message(NOT_YOURS, ephemeral=True)
+                return True
+
+            try:
+                async with self.admission.admit(route.workload, inter):
+                    await route.handler(inter, parsed)
+            except Overloaded:
+                await self.admission.shed(inter)
+            return True
+        finally:
+            self.metrics.observe(f"component.{name}", time.perf_counter() - started)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Set
+
+import disnake
+
+from timeclock import log
+
+if TYPE_CHECKING:
+    from timeclock.bot import TimeClockBot
+
+__all__ = ("ShardTracker",)
+
+logger = log.get_logger(__name__)
+
+
+class ShardTracker:
+    """Which of the bot's shards are connected, and the background jobs that run per shard
+
+    A job passed to `run` is run for the guilds of every connected shard: the shards
+    concurrently, each shard's guilds one after another. Guilds of a disconnected shard are
+    skipped until it is back, as their cache is going stale. An unsharded bot is shard 0.
+    Connections, disconnects, guild counts, latencies and job durations are recorded per shard
+    as `shard.<id>.*`.
+    """
+
+    def __init__(self, bot: "TimeClockBot") -> None:
+        self.bot = bot
+        self.ready: Set[int] = set()
+        self._known: Set[int] = set()
+
+    def _register(self, shard_id: int) -> None:
+        if shard_id in self._known:
+            return
+        self._known.add(shard_id)
+        metrics = self.bot.metrics
+        metrics.gauge(f"shard.{shard_id}.up", lambda: int(shard_id in self.ready))
+        metrics.gauge(f"shard.{shard_id}.latency_ms", lambda: self.latency(shard_id) * 1000)
+        metrics.gauge(
+            f"shard.{shard_id}.guilds",
+            lambda: sum(1 for guild in self.bot.guilds if guild.shard_id == shard_id),
+        )
+
+    def latency(self, shard_id: int) -> float:
+        if isinstance(self.bot, disnake.AutoShardedClient):
+            shard = self.bot.get_shard(shard_id)
+            return shard.latency if shard else float("nan")
+        return self.bot.latency
+
+    def connected(self, shard_id: int) -> None:
+        self._register(shard_id)
+        if shard_id not in self.ready:
+            self.ready.add(shard_id)
+            self.bot.metrics.incr(f"shard.{shard_id}.connects")
+            logger.info(f"Shard {shard_id} is ready")
+
+    def disconnected(self, shard_id: int) -> None:
+        if shard_id in self.ready:
+            self.ready.discard(shard_id)
+            self.bot.metrics.incr(f"shard.{shard_id}.disconnects")
+            logger.warning(f"Shard {shard_id} disconnected")
+
+    def partition(self) -> Dict[int, List[disnake.Guild]]:
+        """The guilds of each connected shard, in one pass over the bot's guilds"""
+        guilds: Dict[int, List[disnake.Guild]] = {shard_id: [] for shard_id in self.ready}
+        for guild in self.bot.guilds:
+            if guild.shard_id in guilds:
+                guilds[guild.shard_id].append(guild)
+        return guilds
+
+    async def run(self, name: str, job: Callable[[disnake.Guild], Awaitable[None]]) -> None:
+        """Run `job` for every guild of every connected shard; a guild's errors are logged"""
+        partition = self.partition()
+        if not partition:
+            logger.warning(f"No shard is connected, skipping {name}")
+            return
+        await asyncio.gather(
+            *(
+                self._run_shard(name, shard_id, guilds, job)
+                for shard_id, guilds in partition.items()
+            )
+        )
+
+    async def _run_shard(
+        self,
+        name: str,
+        shard_id: int,
+        guilds: List[disnake.Guild],
+        job: Callable[[disnake.Guild], Awaitable[None]],
+    ) -> None:
+        started = time.perf_counter()
+        metrics = self.bot.metrics
+        for guild in guilds:
+            if shard_id not in self.ready:
+                metrics.incr(f"shard.{shard_id}.{name}.interrupted")
+                logger.warning(f"Shard {shard_id} disconnected during {name}, stopping there")
+                break
+            try:
+                await job(guild)
+            except Exception as e:
+                metrics.incr(f"shard.{shard_id}.{name}.errors")
+                logger.error(f"Error running {name} for guild {guild.id}: {e}")
+        metrics.observe(f"shard.{shard_id}.{name}", time.perf_counter() - started)